@@ -0,0 +1,66 @@
+"""
+Gunicorn configuration for production serving
+Run from backend/: gunicorn -c gunicorn.conf.py main:app
+
+With RETRIEVAL_ENGINE=numpy the app is imported once in the master before
+forking (preload_app), so the knowledge base, retrievers and statute index
+are loaded a single time and the workers share those pages copy-on-write. The
+vector index is memory-mapped read-only, so its pages are shared through the
+page cache as well. Other engines are not preloaded: Chroma's client holds
+native threads and SQLite handles that must not cross a fork, so each worker
+imports the app itself. Per-request results are shared through the SQLite cache
+in services/shared_cache.py, and the upstream LLM quotas are split evenly
+between the workers.
+
+Each worker runs the FastAPI lifespan after the fork: warmup (upstream
+connections), the PDF job workers and the per-worker memory report.
+"""
+
+import logging
+import multiprocessing
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv(dotenv_path=Path(__file__).parent / ".env")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+# services/rate_limiter.py gives each worker 1/workers of OPENAI_* and
+# GEMINI_* RPM/TPM, so the provider quotas hold across all of them. Set the
+# count with WEB_CONCURRENCY rather than -w so the app sees the same number
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_class = "uvicorn.workers.UvicornWorker"
+retrieval_engine = os.getenv("RETRIEVAL_ENGINE", "chroma").lower()
+preload_app = retrieval_engine == "numpy"
+
+# LLM calls can take a while; a worker silent for longer than this is restarted
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+
+logger = logging.getLogger("gunicorn.error")
+
+
+def on_starting(server):
+    if not preload_app:
+        logger.warning(
+            f"RETRIEVAL_ENGINE is {retrieval_engine!r}, not 'numpy' - the app is not preloaded "
+            "and each worker loads its own copy of the knowledge base; set "
+            "RETRIEVAL_ENGINE=numpy for multi-worker serving"
+        )
+
+
+def when_ready(server):
+    from services.process_info import memory_usage
+
+    memory = memory_usage()
+    logger.info(
+        f"Serving on {bind} with {server.cfg.workers} {worker_class} workers "
+        f"(app {'preloaded' if preload_app else 'loaded per worker'}, "
+        f"master RSS {memory['rss_mb']} MB)"
+    )
@@ -0,0 +1,4 @@
+"""
+Knowledge Base Module
+On-disk formats shared by the ingest script and the backend services
+"""
@@ -0,0 +1,195 @@
+"""
+Pluggable Embedding Backends
+One place that decides how chunks and queries are embedded, shared by
+initialize_chromadb.py and rag_service.py so both sides always agree
+
+Backends (EMBEDDING_BACKEND):
+- openai   OpenAI text-embedding-3-small over the network (default)
+- hashing  Local CPU hashed word + character n-gram projection, no model files
+- local    A sentence-transformers model stored on disk (LOCAL_EMBEDDING_MODEL_PATH)
+
+Every backend has a fingerprint that the knowledge-base build records in
+kb_manifest.json; the service refuses to start against an index built by a
+different backend.
+"""
+
+import json
+import math
+import os
+import re
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_OPENAI_MODEL = "text-embedding-3-small"
+MANIFEST_FILE = "kb_manifest.json"
+
+
+class OpenAIBackend:
+    """OpenAI embeddings via LangChain"""
+
+    def __init__(self, model: str = DEFAULT_OPENAI_MODEL):
+        from langchain_openai import OpenAIEmbeddings
+
+        self.model = model
+        self.fingerprint = f"openai:{model}"
+        self._client = OpenAIEmbeddings(model=model)
+
+    def embed_documents(self, texts: list) -> list:
+        return self._client.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list:
+        return self._client.embed_query(text)
+
+
+class HashingBackend:
+    """
+    Feature-hashed bag of words and character n-grams
+
+    Deterministic, needs no model download and embeds a query in well under a
+    millisecond - lexical rather than semantic, which suits a small legal
+    corpus full of statute numbers and fixed phrasing.
+    """
+
+    _WORD_PATTERN = re.compile(r"[a-z0-9]+(?:\.[a-z0-9]+)*")
+
+    def __init__(self, dimension: int = 512, ngram_range: tuple = (3, 5)):
+        self.dimension = dimension
+        self.ngram_range = ngram_range
+        self.fingerprint = f"hashing:v1:dim={dimension}:ngrams={ngram_range[0]}-{ngram_range[1]}"
+
+    def _features(self, text: str):
+        low, high = self.ngram_range
+        for word in self._WORD_PATTERN.findall(text.lower()):
+            yield "w:" + word
+            padded = f"<{word}>"
+            for n in range(low, high + 1):
+                for i in range(len(padded) - n + 1):
+                    yield padded[i:i + n]
+
+    def _embed(self, text: str) -> list:
+        counts = {}
+        for feature in self._features(text):
+            counts[feature] = counts.get(feature, 0) + 1
+
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for feature, count in counts.items():
+            h = zlib.crc32(feature.encode("utf-8"))
+            sign = 1.0 if h & 0x80000000 else -1.0
+            vector[h % self.dimension] += sign * (1.0 + math.log(count))
+
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: list) -> list:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list:
+        return self._embed(text)
+
+
+class LocalModelBackend:
+    """A sentence-transformers model loaded from a local directory, run on CPU"""
+
+    def __init__(self, model_path: str):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "EMBEDDING_BACKEND=local requires sentence-transformers: pip install sentence-transformers"
+            ) from e
+
+        path = Path(model_path)
+        if not path.exists():
+            raise ValueError(f"LOCAL_EMBEDDING_MODEL_PATH does not exist: {model_path}")
+
+        self._model = SentenceTransformer(str(path), device="cpu")
+        self.dimension = self._model.get_sentence_embedding_dimension()
+        self.fingerprint = f"local:{path.name}:dim={self.dimension}"
+
+    def embed_documents(self, texts: list) -> list:
+        return self._model.encode(texts, normalize_embeddings=True).tolist()
+
+    def embed_query(self, text: str) -> list:
+        return self._model.encode([text], normalize_embeddings=True)[0].tolist()
+
+
+def get_embedding_backend(name: str = None):
+    """
+    Build the configured embedding backend
+
+    Args:
+        name: Backend name; defaults to the EMBEDDING_BACKEND env var, then "openai"
+
+    Returns:
+        Object with embed_documents, embed_query and fingerprint
+    """
+    name = (name or os.getenv("EMBEDDING_BACKEND", "openai")).lower()
+    if name == "openai":
+        return OpenAIBackend(os.getenv("OPENAI_EMBEDDING_MODEL", DEFAULT_OPENAI_MODEL))
+    if name == "hashing":
+        return HashingBackend(int(os.getenv("HASHING_EMBEDDING_DIM", "512")))
+    if name == "local":
+        model_path = os.getenv("LOCAL_EMBEDDING_MODEL_PATH")
+        if not model_path:
+            raise ValueError("EMBEDDING_BACKEND=local requires LOCAL_EMBEDDING_MODEL_PATH")
+        return LocalModelBackend(model_path)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND '{name}' (expected openai, hashing or local)")
+
+
+# ----------------------------------------------------------------------
+# Build manifest
+# ----------------------------------------------------------------------
+def write_manifest(kb_dir, backend, chunk_count: int) -> dict:
+    """Record which embedding backend produced the knowledge base"""
+    manifest = {
+        "embedding_backend": backend.fingerprint,
+        "chunks": chunk_count,
+        "built_at": datetime.now(timezone.utc).isoformat(),
+    }
+    path = Path(kb_dir) / MANIFEST_FILE
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+    return manifest
+
+
+def read_manifest(kb_dir):
+    """Load kb_manifest.json, or None if the knowledge base predates it"""
+    path = Path(kb_dir) / MANIFEST_FILE
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def check_manifest(kb_dir, backend):
+    """
+    Make sure the knowledge base was embedded by the same backend the service
+    will embed queries with
+
+    Raises:
+        RuntimeError: If the manifest names a different backend, or is missing
+            and the backend is not the original OpenAI default
+    """
+    manifest = read_manifest(kb_dir)
+    if manifest is None:
+        # Knowledge bases built before the manifest existed always used OpenAI
+        if backend.fingerprint == f"openai:{DEFAULT_OPENAI_MODEL}":
+            return None
+        raise RuntimeError(
+            f"No {MANIFEST_FILE} found - rebuild the knowledge base with "
+            f"EMBEDDING_BACKEND matching {backend.fingerprint}"
+        )
+
+    if manifest.get("embedding_backend") != backend.fingerprint:
+        raise RuntimeError(
+            f"Knowledge base was built with '{manifest.get('embedding_backend')}' but the service "
+            f"is configured for '{backend.fingerprint}' - rerun scripts.initialize_chromadb"
+        )
+    return manifest
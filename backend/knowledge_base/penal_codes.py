@@ -0,0 +1,160 @@
+"""
+Statute Normalization and Index
+Turns free-text statute references into canonical identifiers like
+"PC 1203.4", "PC 286(c)" or "VC 2800" so charges and chunks can be compared
+exactly, and maps each identifier to the knowledge base chunks that cite it
+"""
+
+import json
+import os
+import re
+from pathlib import Path
+
+# Full code names map to their abbreviation
+_CODE_NAMES = {
+    "penal": "PC",
+    "vehicle": "VC",
+    "health": "HS",
+}
+
+# Either a spelled-out code name, an upper-case abbreviation with up to two
+# stray OCR characters glued on (e.g. "BPC 1203.4" from a bullet glyph), or a
+# standalone lower-case abbreviation as typed by users. The abbreviation must
+# start a word and end one, so "MONTHS 6" is not HS 6
+_STATUTE_PATTERN = re.compile(
+    r"(?:(?P<name>(?i:penal|vehicle|health\s+(?:and|&)\s+safety))\s+(?i:code)"
+    r"|\b[A-Z]{0,2}(?P<abbr>PC|VC|HS)(?![A-Za-z])"
+    r"|\b(?P<lower>pc|vc|hs)\b)"
+    r"(?:\s+(?i:sections?)|\s*§+)?\s*"
+    r"(?P<number>\d+(?:\.\d+)?[a-z]?)"
+    r"(?P<subsections>(?:\s?\([a-z0-9]+\))*)"
+)
+
+
+def _format(match) -> str:
+    if match.group("name"):
+        family = _CODE_NAMES[match.group("name").split()[0].lower()]
+    else:
+        family = (match.group("abbr") or match.group("lower")).upper()
+    subsections = re.sub(r"\s", "", match.group("subsections")).lower()
+    return f"{family} {match.group('number')}{subsections}"
+
+
+def extract_statutes(text) -> list:
+    """
+    Extract normalized statute identifiers from text
+
+    Args:
+        text: Free text, a comma-separated penal_codes metadata string, or None
+
+    Returns:
+        Unique identifiers in order of first appearance
+    """
+    if not text:
+        return []
+    seen = {}
+    for match in _STATUTE_PATTERN.finditer(text):
+        seen.setdefault(_format(match), None)
+    return list(seen)
+
+
+def normalize_statute(text):
+    """Normalize a single statute reference, or None if none is found"""
+    statutes = extract_statutes(text)
+    return statutes[0] if statutes else None
+
+
+def base_statute(statute: str) -> str:
+    """Strip subsections: "PC 286(c)" -> "PC 286" """
+    return statute.split("(", 1)[0]
+
+
+# ----------------------------------------------------------------------
+# Inverted statute index: normalized statute -> knowledge base chunks
+# ----------------------------------------------------------------------
+def build_statute_index(chunks) -> dict:
+    """
+    Build the inverted index from ingest chunks
+
+    Args:
+        chunks: Iterable of {'id', 'text', 'metadata'} dicts as produced by
+            the chunkers in scripts/initialize_chromadb.py
+
+    Returns:
+        {"statutes": {statute: [chunk_id, ...]}, "chunks": {chunk_id: {"text", "metadata"}}}
+    """
+    statutes = {}
+    indexed_chunks = {}
+    for chunk in chunks:
+        found = extract_statutes(chunk['text'])
+        for statute in extract_statutes(chunk['metadata'].get('penal_codes')):
+            if statute not in found:
+                found.append(statute)
+        if not found:
+            continue
+        indexed_chunks[chunk['id']] = {"text": chunk['text'], "metadata": chunk['metadata']}
+        for statute in found:
+            statutes.setdefault(statute, []).append(chunk['id'])
+    return {"statutes": statutes, "chunks": indexed_chunks}
+
+
+def write_statute_index(path, index: dict):
+    """Atomically write an index built by build_statute_index"""
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp, path)
+
+
+class StatuteIndex:
+    """
+    In-memory view of statute_index.json
+
+    Lookups are dict hits - no embedding call and no vector search.
+    """
+
+    def __init__(self, index: dict):
+        self.statutes = index.get("statutes", {})
+        self.chunks = index.get("chunks", {})
+
+        # Parent sections ("PC 286") also resolve to their subsections ("PC 286(c)")
+        self.by_base = {}
+        for statute, chunk_ids in self.statutes.items():
+            base = base_statute(statute)
+            if base != statute:
+                self.by_base.setdefault(base, []).extend(chunk_ids)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def chunk_ids_for(self, statute: str) -> list:
+        return self.statutes.get(statute, []) + self.by_base.get(statute, [])
+
+    def lookup(self, charges, doc_types=None) -> list:
+        """
+        Fetch the chunks citing any statute in the user's charges
+
+        Args:
+            charges: violations_charged_with (list of strings or a single string)
+            doc_types: Optional collection of doc_type values to keep
+
+        Returns:
+            List of {"id", "text", "metadata", "statute"} dicts, one per chunk
+        """
+        if isinstance(charges, str):
+            charges = [charges]
+
+        results = {}
+        for charge in charges or []:
+            for statute in extract_statutes(charge):
+                for chunk_id in self.chunk_ids_for(statute):
+                    if chunk_id in results:
+                        continue
+                    chunk = self.chunks[chunk_id]
+                    if doc_types and chunk["metadata"].get("doc_type") not in doc_types:
+                        continue
+                    results[chunk_id] = {"id": chunk_id, "statute": statute, **chunk}
+        return list(results.values())
@@ -0,0 +1,169 @@
+"""
+In-process NumPy Vector Index
+Brute-force cosine search over a memory-mapped embedding matrix
+
+Layout of an index directory:
+- embeddings.npy  float32 matrix (n_chunks x dim), rows L2-normalized
+- metadata.json   {"ids": [...], "documents": [...], "metadatas": [...], "embedding_model": "..."}
+
+Row i of the matrix belongs to ids[i] / documents[i] / metadatas[i].
+"""
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+
+EMBEDDINGS_FILE = "embeddings.npy"
+METADATA_FILE = "metadata.json"
+
+
+def write_numpy_index(index_dir, ids, documents, metadatas, embeddings, embedding_model: str) -> int:
+    """
+    Write an index directory from the contents of a Chroma collection
+
+    Files are written to temporary names and swapped in, so a running server
+    never sees a half-written index.
+
+    Args:
+        index_dir: Directory to write to (created if missing)
+        ids, documents, metadatas: Parallel lists from collection.get()
+        embeddings: Matrix-like of chunk embeddings in the same order
+        embedding_model: Name of the model that produced the embeddings
+
+    Returns:
+        Number of chunks written
+    """
+    index_dir = Path(index_dir)
+    index_dir.mkdir(parents=True, exist_ok=True)
+
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.ndim != 2 or matrix.shape[0] != len(ids):
+        raise ValueError(f"Expected {len(ids)} embedding rows, got shape {matrix.shape}")
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix = matrix / norms
+
+    tmp_matrix = index_dir / (EMBEDDINGS_FILE + ".tmp")
+    with open(tmp_matrix, "wb") as f:
+        np.save(f, matrix)
+
+    tmp_meta = index_dir / (METADATA_FILE + ".tmp")
+    with open(tmp_meta, "w") as f:
+        json.dump({
+            "ids": list(ids),
+            "documents": list(documents),
+            "metadatas": [dict(m or {}) for m in metadatas],
+            "embedding_model": embedding_model,
+            "dimension": int(matrix.shape[1]),
+        }, f)
+
+    os.replace(tmp_matrix, index_dir / EMBEDDINGS_FILE)
+    os.replace(tmp_meta, index_dir / METADATA_FILE)
+    return len(ids)
+
+
+def matches_filter(metadata: dict, where: dict) -> bool:
+    """Evaluate a Chroma-style `where` filter against one metadata dict"""
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for op, operand in condition.items():
+                if op == "$eq" and value != operand:
+                    return False
+                if op == "$ne" and value == operand:
+                    return False
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$nin" and value in operand:
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+class NumpyVectorIndex:
+    """
+    Read-only vector index with the same search interface as the LangChain
+    Chroma vectorstore used by rag_service (similarity_search with k and filter)
+    """
+
+    def __init__(self, index_dir, embedding_function):
+        """
+        Args:
+            index_dir: Directory written by write_numpy_index
+            embedding_function: Object with embed_query(text) -> list[float]
+        """
+        index_dir = Path(index_dir)
+        with open(index_dir / METADATA_FILE) as f:
+            meta = json.load(f)
+
+        # Memory-mapped so the OS page cache holds a single shared copy
+        self.embeddings = np.load(index_dir / EMBEDDINGS_FILE, mmap_mode="r")
+        self.ids = meta["ids"]
+        self.documents = meta["documents"]
+        self.metadatas = meta["metadatas"]
+        self.embedding_model = meta.get("embedding_model")
+        self.embedding_function = embedding_function
+        self._mask_cache = {}
+
+        if self.embeddings.shape[0] != len(self.ids):
+            raise ValueError(f"Index at {index_dir} is inconsistent: "
+                             f"{self.embeddings.shape[0]} rows for {len(self.ids)} ids")
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def _filter_mask(self, filter: dict):
+        key = json.dumps(filter, sort_keys=True)
+        mask = self._mask_cache.get(key)
+        if mask is None:
+            mask = np.fromiter((matches_filter(m, filter) for m in self.metadatas), dtype=bool, count=len(self.metadatas))
+            self._mask_cache[key] = mask
+        return mask
+
+    def _document(self, row: int) -> Document:
+        return Document(id=self.ids[row], page_content=self.documents[row], metadata=dict(self.metadatas[row]))
+
+    def similarity_search_by_vector_with_score(self, embedding, k: int = 4, filter: dict = None):
+        """
+        Cosine top-k over the matrix
+
+        Returns:
+            List of (Document, cosine similarity) pairs, best first
+        """
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        scores = self.embeddings @ query
+        candidates = np.flatnonzero(self._filter_mask(filter)) if filter else np.arange(len(scores))
+        if len(candidates) == 0:
+            return []
+
+        k = min(k, len(candidates))
+        candidate_scores = scores[candidates]
+        top = np.argpartition(-candidate_scores, k - 1)[:k]
+        top = top[np.argsort(-candidate_scores[top])]
+        return [(self._document(int(candidates[i])), float(candidate_scores[i])) for i in top]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: dict = None):
+        embedding = self.embedding_function.embed_query(query)
+        return self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter)
+
+    def similarity_search_with_relevance_scores(self, query: str, k: int = 4, filter: dict = None):
+        """Same as similarity_search_with_score - cosine similarity is already a relevance score"""
+        return self.similarity_search_with_score(query, k=k, filter=filter)
+
+    def similarity_search(self, query: str, k: int = 4, filter: dict = None):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
@@ -3,27 +3,61 @@ California Expungement API - Unified Backend
 Combines PDF extraction and RAG eligibility checking in one FastAPI application
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, Request, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from contextlib import asynccontextmanager
 from typing import Optional
-import os
-import tempfile
-import shutil
+import asyncio
+import json
 import logging
-
-from services.pdf_service import extract_text_from_pdf, parse_with_gemini
-from services.rag_service import check_eligibility
+import time
+
+from services.job_queue import JobQueue
+from services.pdf_service import merge_parsed_documents, parse_pdf_document
+from services.process_info import memory_usage
+from services.rag_service import aget_pathway_to_eligibility, check_eligibility, likely_ineligible
+from services.rate_limiter import AdmissionRejected, gemini_limiter, openai_limiter
+from services.shared_cache import SharedCache
+from services.single_flight import SingleFlight, canonical_hash
+from services.voice_sessions import VoiceSessionStore, eligibility_input
+from services.warmup_service import run_warmup, warmup_state
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# PDF job queue, result cache and voice sessions, opened by the lifespan so
+# importing this module has no side effects (under gunicorn, each worker opens
+# its own after the fork)
+job_queue: Optional[JobQueue] = None
+shared_cache: Optional[SharedCache] = None
+voice_sessions: Optional[VoiceSessionStore] = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start warmup in the background so /health answers immediately while /ready waits"""
+    # Under gunicorn this runs once per worker, after the fork
+    memory = memory_usage()
+    logger.info(f"Worker {memory['pid']} started: RSS {memory['rss_mb']} MB ({memory['shared_mb']} MB shared)")
+    warmup_task = asyncio.create_task(asyncio.to_thread(run_warmup))
+    global job_queue, shared_cache, voice_sessions
+    shared_cache = await asyncio.to_thread(SharedCache.from_env)
+    voice_sessions = await asyncio.to_thread(VoiceSessionStore)
+    job_queue = await asyncio.to_thread(JobQueue.from_env)
+    job_queue.start()
+    yield
+    warmup_task.cancel()
+    await asyncio.to_thread(job_queue.stop)
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="California Expungement API",
     description="Unified API for PDF document extraction and expungement eligibility checking",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS configuration - allow frontend to call the API
@@ -36,75 +70,65 @@ app.add_middleware(
 )
 
 
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    """Upstream quota exhausted - fail fast and tell the client when to come back"""
+    logger.warning(f"Rejected {request.url.path}: {exc}")
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
+# Identical concurrent requests (double-clicks, retries) share one computation
+eligibility_flight = SingleFlight("check_eligibility")
+pathway_flight = SingleFlight("pathway")
+pdf_parse_flight = SingleFlight("pdf_parse")
+
+
 # ============================================================================
 # Helper Functions
 # ============================================================================
 
-def _parse_upload(file: UploadFile) -> dict:
+# Findings the RAG service substitutes when the LLM reply can't be parsed
+FALLBACK_FINDING_TITLES = {"Analysis Error", "Processing Error"}
+
+
+def _cacheable(result) -> bool:
+    """Only share real answers - parse failures should be retried, not replayed"""
+    if not isinstance(result, dict) or "error" in result:
+        return False
+    findings = result.get("key_findings") or []
+    return not any(finding.get("title") in FALLBACK_FINDING_TITLES for finding in findings)
+
+
+async def _cached(namespace: str, key: str, compute):
     """
-    Parse a single uploaded PDF file
-    
+    Look the result up in the cross-process cache before computing it
+
     Args:
-        file: Uploaded PDF file
-        
-    Returns:
-        Dictionary with parsed case information or error details
+        namespace: Cache namespace, one per operation
+        key: Canonical request key
+        compute: Zero-argument callable returning an awaitable
     """
-    suffix = os.path.splitext(file.filename)[1]
-    tmp_path = None
-    try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            shutil.copyfileobj(file.file, tmp)
-            tmp_path = tmp.name
-
-        raw_text = extract_text_from_pdf(tmp_path)
-        if len(raw_text) > 100_000:
-            raw_text = raw_text[:100_000] + "\n\n[TRUNCATED]"
-
-        result = parse_with_gemini(raw_text)
-
-        # === If Gemini failed or returned error ===
-        if "error" in result or "raw_response" in result:
-            return {
-                "city_or_county": None,
-                "case_number": None,
-                "name": None,
-                "date_to_appear": None,
-                "violations_charged_with": [],
-                "sentencing": None,
-                "fine": None,
-                "further_instruction": None,
-                "report_number": None,
-                "date_of_incident": None,
-                "officer": None,
-                "location_of_occurrence": None,
-                "error": f"Failed to parse {file.filename}: {result.get('error', 'Invalid JSON')}"
-            }
+    hit = await asyncio.to_thread(shared_cache.get, namespace, key)
+    if hit is not None:
+        return hit
+    result = await compute()
+    if _cacheable(result):
+        await asyncio.to_thread(shared_cache.set, namespace, key, result)
+    return result
 
-        return result
 
-    except Exception as e:
-        return {
-            "city_or_county": None,
-            "case_number": None,
-            "name": None,
-            "date_to_appear": None,
-            "violations_charged_with": [],
-            "sentencing": None,
-            "fine": None,
-            "further_instruction": None,
-            "report_number": None,
-            "date_of_incident": None,
-            "officer": None,
-            "location_of_occurrence": None,
-            "error": f"Crash in {file.filename}: {str(e)}"
-        }
-    finally:
-        if tmp_path and os.path.exists(tmp_path):
-            try:
-                os.unlink(tmp_path)
-            except:
-                pass  # ignore cleanup errors
+async def _parse_upload_coalesced(file: UploadFile) -> dict:
+    """Parse an upload, sharing the work with any concurrent upload of the same bytes"""
+    content = await file.read()
+    key = canonical_hash(content)
+    return await pdf_parse_flight.do(
+        key,
+        lambda: _cached("pdf_parse", key, lambda: asyncio.to_thread(parse_pdf_document, file.filename, content))
+    )
 
 
 # ============================================================================
@@ -119,8 +143,17 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "pdf_parser": "POST /pdf-parser",
+            "pdf_parser_jobs": "POST /pdf-parser/jobs",
+            "pdf_parser_job": "GET /pdf-parser/jobs/{job_id}",
+            "pdf_parser_job_events": "GET /pdf-parser/jobs/{job_id}/events",
+            "voice_sessions": "POST /voice-sessions",
+            "voice_session": "GET /voice-sessions/{session_id}",
+            "voice_session_events": "GET /voice-sessions/{session_id}/events",
+            "voice_room_events": "GET /voice-sessions/rooms/{room}/events",
             "check_eligibility": "POST /check-eligibility",
-            "health": "GET /health"
+            "health": "GET /health",
+            "ready": "GET /ready",
+            "stats": "GET /stats"
         }
     }
 
@@ -134,6 +167,63 @@ async def health_check():
     }
 
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness endpoint - 200 only after warmup has loaded the knowledge base,
+    run a probe query and opened upstream connections, 503 otherwise.
+    
+    **Returns:** warmup status with the duration of each warmup step
+    """
+    if warmup_state["ready"]:
+        status = "ready"
+    elif warmup_state["completed_at"] is None:
+        status = "warming_up"
+    else:
+        status = "warmup_failed"
+
+    return JSONResponse(
+        status_code=200 if warmup_state["ready"] else 503,
+        content={
+            "status": status,
+            "started_at": warmup_state["started_at"],
+            "completed_at": warmup_state["completed_at"],
+            "total_ms": warmup_state["total_ms"],
+            "steps": warmup_state["steps"],
+        }
+    )
+
+
+@app.get("/stats")
+async def stats():
+    """
+    Runtime counters
+    
+    **Returns:**
+    - single_flight: per operation, how many calls arrived, how many actually
+      executed and how many were saved by sharing an in-flight result
+    - rate_limits: per provider, queue depth, available quota and rejections
+    - pdf_jobs: job counts by status and the number of workers
+    - voice_sessions: ingested voice sessions by status
+    - shared_cache: hits/misses in this worker, entries shared by all workers
+    - process: pid and memory of the worker that answered
+    """
+    return {
+        "single_flight": {
+            flight.name: flight.stats()
+            for flight in (eligibility_flight, pathway_flight, pdf_parse_flight)
+        },
+        "rate_limits": {
+            limiter.provider: limiter.stats()
+            for limiter in (openai_limiter, gemini_limiter)
+        },
+        "pdf_jobs": await asyncio.to_thread(job_queue.stats),
+        "voice_sessions": await asyncio.to_thread(voice_sessions.stats),
+        "shared_cache": await asyncio.to_thread(shared_cache.stats),
+        "process": memory_usage()
+    }
+
+
 @app.post("/pdf-parser", response_class=JSONResponse)
 async def pdf_parser_endpoint(
     summons: Optional[UploadFile] = File(None),
@@ -154,54 +244,102 @@ async def pdf_parser_endpoint(
     """
     logger.info("PDF parser endpoint called")
     
-    raw = {}
-    if summons:     
-        logger.info(f"Processing summons: {summons.filename}")
-        raw["summons"] = _parse_upload(summons)
-    if sentencing:  
-        logger.info(f"Processing sentencing: {sentencing.filename}")
-        raw["sentencing"] = _parse_upload(sentencing)
-    if police:      
-        logger.info(f"Processing police report: {police.filename}")
-        raw["police"] = _parse_upload(police)
+    uploads = {"summons": summons, "sentencing": sentencing, "police": police}
+    uploads = {src: file for src, file in uploads.items() if file}
+    for src, file in uploads.items():
+        logger.info(f"Processing {src}: {file.filename}")
+
+    # Parse the documents concurrently
+    results = await asyncio.gather(*(_parse_upload_coalesced(file) for file in uploads.values()))
+    raw = dict(zip(uploads, results))
 
     if not raw:
         raise HTTPException(status_code=400, detail="At least one PDF is required.")
 
-    # === MERGE LOGIC ===
-    final = {}
-    sources = ["summons", "sentencing", "police"]
-    fields = [
-        "city_or_county", "case_number", "name", "date_to_appear",
-        "violations_charged_with", "sentencing", "fine", "further_instruction",
-        "report_number", "date_of_incident", "officer", "location_of_occurrence"
-    ]
-
-    for field in fields:
-        for src in sources:
-            val = raw.get(src, {}).get(field)
-            if val not in (None, "", [], {}) and val is not None:
-                final[field] = val
-                break
-        else:
-            final[field] = None
-
-    # Prefer sentencing's further_instruction
-    if raw.get("sentencing", {}).get("further_instruction"):
-        final["further_instruction"] = raw["sentencing"]["further_instruction"]
-
-    # === COLLECT ERRORS ===
-    errors = [v.get("error") for v in raw.values() if v.get("error")]
-    if errors:
-        final["parsing_errors"] = errors
+    final = merge_parsed_documents(raw)
 
     logger.info(f"PDF parsing complete. Case number: {final.get('case_number', 'Unknown')}")
     
     return final
 
 
+# Seconds between status checks on the job events stream
+JOB_EVENTS_POLL_SECONDS = 1.0
+
+
+@app.post("/pdf-parser/jobs", status_code=202)
+async def pdf_parser_submit_job(
+    summons: Optional[UploadFile] = File(None),
+    sentencing: Optional[UploadFile] = File(None),
+    police: Optional[UploadFile] = File(None),
+):
+    """
+    Queue the same work as /pdf-parser and return immediately.
+    
+    Jobs are persisted, so they survive a restart. They run at batch priority:
+    interactive /pdf-parser and /check-eligibility calls are admitted first
+    when the Gemini quota is tight.
+    
+    **Returns:** {"job_id": "...", "status": "queued"} - poll
+    GET /pdf-parser/jobs/{job_id} or stream GET /pdf-parser/jobs/{job_id}/events
+    """
+    uploads = {"summons": summons, "sentencing": sentencing, "police": police}
+    uploads = {src: (file.filename, await file.read()) for src, file in uploads.items() if file}
+
+    if not uploads:
+        raise HTTPException(status_code=400, detail="At least one PDF is required.")
+
+    job_id = await asyncio.to_thread(job_queue.submit, uploads)
+    logger.info(f"Queued PDF job {job_id}: {list(uploads)}")
+    return {"job_id": job_id, "status": "queued"}
+
+
+@app.get("/pdf-parser/jobs/{job_id}")
+async def pdf_parser_job_status(job_id: str):
+    """
+    Status of a queued PDF parsing job.
+    
+    **Returns:** job status (queued, running, done or failed), plus "result"
+    (the merged case document, same shape as /pdf-parser) once done, or
+    "error" if it failed
+    """
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job
+
+
+@app.get("/pdf-parser/jobs/{job_id}/events")
+async def pdf_parser_job_events(job_id: str):
+    """
+    Server-sent events for a PDF parsing job: one "status" event whenever the
+    status changes, ending with the full job once it is done or failed.
+    """
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+
+    async def events():
+        current = job
+        last_status = None
+        while True:
+            if current["status"] != last_status:
+                last_status = current["status"]
+                yield f"event: status\ndata: {json.dumps(current)}\n\n"
+            if last_status in ("done", "failed"):
+                return
+            await asyncio.sleep(JOB_EVENTS_POLL_SECONDS)
+            current = await asyncio.to_thread(job_queue.get, job_id)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
 @app.post("/check-eligibility")
-async def check_eligibility_endpoint(user_data: dict):
+async def check_eligibility_endpoint(user_data: dict, include_pathway: bool = False):
     """
     Check if a user is eligible for expungement based on their case information.
     
@@ -230,17 +368,61 @@ async def check_eligibility_endpoint(user_data: dict):
     
     - If ELIGIBLE: next_steps will be filing instructions
     - If INELIGIBLE: next_steps will be pathway to become eligible
+    
+    **Query parameters:**
+    - include_pathway: if true, an ineligible verdict also returns the
+      get_pathway_to_eligibility result under "pathway". When the inputs
+      already suggest ineligibility (probation not completed, pending charges,
+      excluded statute) the pathway call starts in parallel with the
+      eligibility call and is cancelled if the verdict is eligible.
     """
     try:
         logger.info("Checking eligibility for user")
         
-        # Call RAG service (handles both eligible and ineligible cases)
-        result = check_eligibility(user_data)
+        request_key = canonical_hash(user_data)
+        
+        def get_pathway():
+            return pathway_flight.do(
+                request_key,
+                lambda: _cached("pathway", request_key, lambda: aget_pathway_to_eligibility(user_data))
+            )
+        
+        pathway_task = None
+        if include_pathway and likely_ineligible(user_data):
+            pathway_task = asyncio.create_task(get_pathway())
+        
+        try:
+            # Call RAG service (handles both eligible and ineligible cases)
+            result = await eligibility_flight.do(
+                request_key,
+                lambda: _cached("eligibility", request_key, lambda: asyncio.to_thread(check_eligibility, user_data))
+            )
+        except BaseException:
+            if pathway_task:
+                pathway_task.cancel()
+            raise
         
         logger.info(f"Eligibility check complete: eligible={result['eligible']}")
         
+        if include_pathway:
+            if result.get('eligible') is True:
+                if pathway_task:
+                    pathway_task.cancel()
+                    logger.info("Verdict eligible - cancelled speculative pathway request")
+            else:
+                result['pathway_speculative'] = pathway_task is not None
+                try:
+                    result['pathway'] = await (pathway_task or get_pathway())
+                except Exception as e:
+                    # The verdict is still useful without the pathway
+                    logger.error(f"Error getting pathway: {str(e)}")
+                    result['pathway'] = None
+                    result['pathway_error'] = str(e)
+        
         return result
         
+    except AdmissionRejected:
+        raise  # handled by admission_rejected_handler
     except Exception as e:
         logger.error(f"Error checking eligibility: {str(e)}")
         raise HTTPException(
@@ -249,9 +431,172 @@ async def check_eligibility_endpoint(user_data: dict):
         )
 
 
+# ============================================================================
+# Voice Session Ingestion
+# ============================================================================
+
+# A rejected evaluation is retried this many times before it is marked failed
+VOICE_EVALUATION_ATTEMPTS = 3
+# Keep-alive comments on the push channel, in polls
+VOICE_EVENTS_KEEPALIVE_POLLS = 15
+# A room subscriber gives up if the agent hasn't pushed a session by then
+VOICE_ROOM_WAIT_SECONDS = 15 * 60
+# No push channel stays open longer than this
+VOICE_EVENTS_MAX_SECONDS = 60 * 60
+
+# Evaluations running in this process; referenced so they aren't collected
+_voice_evaluations = set()
+
+
+async def _evaluate_voice_session(session_id: str, user_data: dict, request_key: str):
+    """Background eligibility check for an ingested session; the verdict goes to the store"""
+    for attempt in range(1, VOICE_EVALUATION_ATTEMPTS + 1):
+        try:
+            result = await eligibility_flight.do(
+                request_key,
+                lambda: _cached("eligibility", request_key, lambda: asyncio.to_thread(check_eligibility, user_data))
+            )
+            await asyncio.to_thread(voice_sessions.finish, session_id, request_key, "done", result)
+            logger.info(f"Voice session {session_id} evaluated: eligible={result.get('eligible')}")
+            return
+        except AdmissionRejected as e:
+            if attempt == VOICE_EVALUATION_ATTEMPTS:
+                error = str(e)
+                break
+            logger.info(f"Voice session {session_id} deferred {e.retry_after}s: {e}")
+            await asyncio.sleep(e.retry_after)
+        except Exception as e:
+            error = str(e)
+            break
+    logger.error(f"Voice session {session_id} evaluation failed: {error}")
+    await asyncio.to_thread(voice_sessions.finish, session_id, request_key, "failed", None, error)
+
+
+@app.post("/voice-sessions", status_code=202)
+async def ingest_voice_session(payload: dict):
+    """
+    Ingest a session pushed by the voice agent and evaluate its eligibility.
+    
+    **Expected input:**
+    {
+        "session_id": "session_20240615_101500_room",
+        "room": "room",
+        "qa": {...},                # same keys as the agent's _qa.json
+        "qa_complete": true/false,  # all five questions answered
+        "facts": {...},             # facts extracted during the call
+        "started_at": "...", "ended_at": "..." (null while the call runs)
+    }
+    
+    Pushes are idempotent per session_id. A complete questionnaire is
+    evaluated in the background - only again if the answers or case facts
+    changed since the last push - and the verdict is delivered on
+    GET /voice-sessions/{session_id}/events and
+    GET /voice-sessions/rooms/{room}/events.
+    
+    **Returns:** the stored session with its status (incomplete, evaluating,
+    done or failed)
+    """
+    session_id = payload.get("session_id")
+    if not session_id or not isinstance(payload.get("qa", {}), dict):
+        raise HTTPException(status_code=400, detail="session_id and a qa object are required.")
+
+    user_data = None
+    request_key = None
+    if payload.get("qa_complete"):
+        user_data = eligibility_input(payload.get("qa") or {}, payload.get("facts") or {})
+        request_key = canonical_hash(user_data)
+
+    session, evaluate = await asyncio.to_thread(voice_sessions.ingest, payload, request_key)
+    if evaluate:
+        task = asyncio.create_task(_evaluate_voice_session(session_id, user_data, request_key))
+        _voice_evaluations.add(task)
+        task.add_done_callback(_voice_evaluations.discard)
+    logger.info(f"Ingested voice session {session_id}: {session['status']}")
+    return session
+
+
+@app.get("/voice-sessions/{session_id}")
+async def voice_session_status(session_id: str):
+    """
+    An ingested voice session.
+    
+    **Returns:** status, answers, facts and, once evaluated, "result" (the
+    /check-eligibility response) or "error"
+    """
+    session = await asyncio.to_thread(voice_sessions.get, session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Unknown voice session: {session_id}")
+    return session
+
+
+def _voice_session_stream(request: Request, lookup, first_push_seconds: float = None):
+    """
+    Server-sent "status" events for a voice session whenever its status
+    changes, ending once it is done, failed or incomplete after the call.
+
+    The stream also ends when the client disconnects, after
+    VOICE_EVENTS_MAX_SECONDS, or - with first_push_seconds - when no
+    session has turned up by then; the last two send a "timeout" event.
+    """
+    async def events():
+        last = None
+        polls = 0
+        started = time.monotonic()
+        while True:
+            if await request.is_disconnected():
+                return
+            elapsed = time.monotonic() - started
+            session = await asyncio.to_thread(lookup)
+            if session is None and first_push_seconds is not None and elapsed >= first_push_seconds:
+                yield f"event: timeout\ndata: {json.dumps({'reason': 'no session pushed'})}\n\n"
+                return
+            if elapsed >= VOICE_EVENTS_MAX_SECONDS:
+                yield f"event: timeout\ndata: {json.dumps({'reason': 'stream open too long'})}\n\n"
+                return
+            if session is not None:
+                state = (session["session_id"], session["status"], session["updated_at"])
+                if state != last:
+                    last = state
+                    yield f"event: status\ndata: {json.dumps(session)}\n\n"
+                if session["status"] in ("done", "failed") or \
+                        (session["status"] == "incomplete" and session["ended_at"]):
+                    return
+            polls += 1
+            if polls % VOICE_EVENTS_KEEPALIVE_POLLS == 0:
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(JOB_EVENTS_POLL_SECONDS)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
+@app.get("/voice-sessions/{session_id}/events")
+async def voice_session_events(request: Request, session_id: str):
+    """Push channel for one ingested voice session (see _voice_session_stream)"""
+    if await asyncio.to_thread(voice_sessions.get, session_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown voice session: {session_id}")
+    return _voice_session_stream(request, lambda: voice_sessions.get(session_id))
+
+
+@app.get("/voice-sessions/rooms/{room}/events")
+async def voice_room_events(request: Request, room: str):
+    """
+    Push channel for the frontend, which knows the room rather than the
+    session: waits up to VOICE_ROOM_WAIT_SECONDS for the agent's first push
+    from that room, then streams the session's status until its verdict is
+    in. A room that never pushes gets a "timeout" event and the stream ends.
+    """
+    return _voice_session_stream(request, lambda: voice_sessions.latest_for_room(room),
+                                 first_push_seconds=VOICE_ROOM_WAIT_SECONDS)
+
+
 # ============================================================================
 # Run with: uvicorn backend.main:app --reload --port 8000
 # Or from backend/: uvicorn main:app --reload --port 8000
+# Production (multiple workers, from backend/): gunicorn -c gunicorn.conf.py main:app
 # ============================================================================
 
 if __name__ == "__main__":
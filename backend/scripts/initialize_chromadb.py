@@ -6,12 +6,18 @@ Run this script ONCE before starting the backend server for the first time.
 """
 
 import chromadb
+from chromadb.api.types import EmbeddingFunction
 from chromadb.config import Settings
+import numpy as np
 import re
 from pathlib import Path
 import os
 from dotenv import load_dotenv
 
+from knowledge_base.embeddings import OpenAIBackend, get_embedding_backend, read_manifest, write_manifest
+from knowledge_base.penal_codes import build_statute_index, write_statute_index
+from knowledge_base.vector_index import write_numpy_index
+
 # Load environment variables from backend/.env
 env_path = Path(__file__).parent.parent / '.env'
 load_dotenv(dotenv_path=env_path)
@@ -20,16 +26,86 @@ load_dotenv(dotenv_path=env_path)
 chroma_db_path = Path(__file__).parent.parent / "chroma_db"
 chroma_client = chromadb.PersistentClient(path=str(chroma_db_path))
 
-# Create embedding function - MUST match what rag_service.py uses
-embedding_function = chromadb.utils.embedding_functions.OpenAIEmbeddingFunction(
-    api_key=os.getenv("OPENAI_API_KEY"),
-    model_name="text-embedding-3-small"
-)
+kb_path = Path(__file__).parent.parent
+
+
+class BackendEmbeddingFunction(EmbeddingFunction):
+    """Adapts a knowledge_base.embeddings backend to ChromaDB's embedding function interface"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def __call__(self, input):
+        return [np.asarray(vector, dtype=np.float32) for vector in self.backend.embed_documents(list(input))]
+
+
+# Create embedding function - the backend (EMBEDDING_BACKEND) is shared with
+# rag_service.py and recorded in kb_manifest.json so the two can never mismatch
+embedding_backend = get_embedding_backend()
+if isinstance(embedding_backend, OpenAIBackend):
+    embedding_function = chromadb.utils.embedding_functions.OpenAIEmbeddingFunction(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        model_name=embedding_backend.model
+    )
+else:
+    embedding_function = BackendEmbeddingFunction(embedding_backend)
+
+# A different backend means different vectors (and usually a different
+# dimension), so the old collection can't be reused. Without a manifest the
+# backend that built it is unknown, so it can't be kept either - recording
+# the current backend over someone else's vectors would defeat the manifest
+previous_manifest = read_manifest(kb_path)
+
+
+def existing_collection_mismatch():
+    """Why the existing collection can't be kept with embedding_backend, or None"""
+    existing_names = {getattr(c, "name", c) for c in chroma_client.list_collections()}
+    if "expungement_knowledge_base" not in existing_names:
+        return None
+    try:
+        existing = chroma_client.get_collection("expungement_knowledge_base",
+                                                embedding_function=embedding_function)
+    except Exception as e:
+        return f"it can't be opened with {embedding_backend.fingerprint} ({e})"
+    if existing.count() == 0:
+        return None
+
+    if previous_manifest is None:
+        return "it has no kb_manifest.json, so the backend that built it is unknown"
+    built_with = previous_manifest.get('embedding_backend')
+    if built_with != embedding_backend.fingerprint:
+        return f"embedding backend changed from {built_with} to {embedding_backend.fingerprint}"
+
+    stored = existing.get(limit=1, include=['embeddings'])['embeddings']
+    stored_dimension = len(stored[0]) if stored is not None and len(stored) else None
+    backend_dimension = len(embedding_backend.embed_query("dimension check"))
+    if stored_dimension is not None and stored_dimension != backend_dimension:
+        return (f"stored vectors have {stored_dimension} dimensions but "
+                f"{embedding_backend.fingerprint} produces {backend_dimension}")
+    return None
+
+
+rebuild_reason = existing_collection_mismatch()
+if rebuild_reason:
+    print(f"⚠️  Existing collection can't be kept: {rebuild_reason} - rebuilding it")
+    try:
+        chroma_client.delete_collection("expungement_knowledge_base")
+    except Exception:
+        pass  # collection may already be gone
+
+# Output directory for the NumPy retrieval engine (RETRIEVAL_ENGINE=numpy)
+vector_index_path = kb_path / "vector_index"
+
+# Inverted statute -> chunk index loaded by rag_service at startup
+statute_index_path = kb_path / "statute_index.json"
 
 # Create or get the expungement collection
 collection = chroma_client.get_or_create_collection(
     name="expungement_knowledge_base",
-    metadata={"description": "California expungement eligibility and process information"},
+    metadata={
+        "description": "California expungement eligibility and process information",
+        "embedding_backend": embedding_backend.fingerprint
+    },
     embedding_function=embedding_function
 )
 
@@ -250,6 +326,40 @@ def populate_knowledge_base():
     
     return len(all_chunks)
 
+def export_numpy_index():
+    """
+    Export the collection's stored embeddings to the memory-mapped NumPy index
+    so the backend can search without a database client
+    """
+    print("\n💾 Exporting NumPy vector index...")
+    data = collection.get(include=['embeddings', 'documents', 'metadatas'])
+    count = write_numpy_index(
+        vector_index_path,
+        ids=data['ids'],
+        documents=data['documents'],
+        metadatas=data['metadatas'],
+        embeddings=data['embeddings'],
+        embedding_model=embedding_backend.fingerprint
+    )
+    print(f"   ✓ Wrote {count} vectors to {vector_index_path}")
+    return count
+
+def export_statute_index():
+    """
+    Build the inverted index from normalized statute identifiers (e.g. "PC 1203.4",
+    "VC 2800") to the chunks that cite them, for O(1) lookup of a user's charges
+    """
+    print("\n💾 Building statute index...")
+    data = collection.get(include=['documents', 'metadatas'])
+    chunks = [
+        {'id': chunk_id, 'text': text, 'metadata': metadata or {}}
+        for chunk_id, text, metadata in zip(data['ids'], data['documents'], data['metadatas'])
+    ]
+    index = build_statute_index(chunks)
+    write_statute_index(statute_index_path, index)
+    print(f"   ✓ Indexed {len(index['statutes'])} statutes across {len(index['chunks'])} chunks")
+    return len(index['statutes'])
+
 def get_collection_stats():
     """Get statistics about the collection"""
     count = collection.count()
@@ -285,6 +395,14 @@ if __name__ == "__main__":
         else:
             print("   Keeping existing data.")
     
+    # Keep the NumPy index and statute index in sync with the collection
+    export_numpy_index()
+    export_statute_index()
+    
+    # Record which embedding backend produced this knowledge base
+    write_manifest(kb_path, embedding_backend, collection.count())
+    print(f"\n🔏 Embedding backend recorded: {embedding_backend.fingerprint}")
+    
     # Show collection stats
     get_collection_stats()
     
@@ -292,6 +410,7 @@ if __name__ == "__main__":
     print("✅ ChromaDB Initialization Complete!")
     print("\n💡 Next Steps:")
     print("   • Start the backend server: uvicorn backend.main:app --reload --port 8000")
+    print("   • Optional: set RETRIEVAL_ENGINE=numpy to search the exported NumPy index")
     print("   • Test the endpoints with sample data")
     print("="*70)
 
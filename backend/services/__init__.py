@@ -1,15 +1,28 @@
 """
 Backend Services Module
 Contains PDF extraction and RAG eligibility services
+
+The services below are loaded on first access, so importing a light module
+such as services.rate_limiter doesn't pull in the Gemini and LangChain SDKs
 """
 
-from .pdf_service import extract_text_from_pdf, parse_with_gemini
-from .rag_service import check_eligibility, get_pathway_to_eligibility
+import importlib
+
+_EXPORTS = {
+    'extract_text_from_pdf': 'pdf_service',
+    'parse_with_gemini': 'pdf_service',
+    'parse_pdf_document': 'pdf_service',
+    'merge_parsed_documents': 'pdf_service',
+    'check_eligibility': 'rag_service',
+    'get_pathway_to_eligibility': 'rag_service',
+    'aget_pathway_to_eligibility': 'rag_service',
+}
+
+__all__ = list(_EXPORTS)
 
-__all__ = [
-    'extract_text_from_pdf',
-    'parse_with_gemini',
-    'check_eligibility',
-    'get_pathway_to_eligibility'
-]
 
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(f".{module}", __name__), name)
@@ -0,0 +1,150 @@
+"""
+Hybrid Retrieval Service
+Combines BM25 over chunk text with the dense vector score, and boosts chunks
+whose penal_codes metadata matches the statutes the user was charged with
+"""
+
+import math
+import re
+from collections import Counter
+
+from langchain_core.documents import Document
+
+from knowledge_base.penal_codes import base_statute, extract_statutes
+from knowledge_base.vector_index import matches_filter
+
+# Keep statute numbers like "1203.4" together as one token
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:\.[a-z0-9]+)*")
+
+
+def tokenize(text: str) -> list:
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """Okapi BM25 over a small, fixed corpus"""
+
+    def __init__(self, texts: list, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(tokenize(text)) for text in texts]
+        self.lengths = [sum(tf.values()) for tf in self.term_freqs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+        doc_freq = Counter()
+        for tf in self.term_freqs:
+            doc_freq.update(tf.keys())
+        n = len(texts)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items()}
+
+    def score(self, query: str, row: int) -> float:
+        tf = self.term_freqs[row]
+        norm = self.k1 * (1 - self.b + self.b * self.lengths[row] / (self.avg_length or 1.0))
+        total = 0.0
+        for term in set(tokenize(query)):
+            freq = tf.get(term)
+            if freq:
+                total += self.idf[term] * freq * (self.k1 + 1) / (freq + norm)
+        return total
+
+
+def load_corpus(vectorstore) -> tuple:
+    """
+    Read every chunk from a vectorstore
+
+    Returns:
+        (ids, documents, metadatas) parallel lists
+    """
+    if hasattr(vectorstore, "documents"):
+        # NumpyVectorIndex keeps the corpus in memory already
+        return vectorstore.ids, vectorstore.documents, vectorstore.metadatas
+    data = vectorstore.get(include=["documents", "metadatas"])
+    return data["ids"], data["documents"], [m or {} for m in data["metadatas"]]
+
+
+class HybridRetriever:
+    """
+    Re-ranks the whole knowledge base with
+        vector_weight * dense relevance + (1 - vector_weight) * normalized BM25
+        + statute_boost for exact penal-code matches (half for a parent section match)
+    """
+
+    def __init__(self, vectorstore, vector_weight: float = 0.6, statute_boost: float = 0.5):
+        self.vectorstore = vectorstore
+        self.vector_weight = vector_weight
+        self.statute_boost = statute_boost
+
+        self.ids, self.documents, self.metadatas = load_corpus(vectorstore)
+        self.row_by_id = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+        self.bm25 = BM25Index(self.documents)
+        self.chunk_statutes = [set(extract_statutes(m.get("penal_codes"))) for m in self.metadatas]
+
+    def _statute_match(self, row: int, charged: set, charged_bases: set) -> float:
+        statutes = self.chunk_statutes[row]
+        if not statutes:
+            return 0.0
+        if statutes & charged:
+            return 1.0
+        if {base_statute(s) for s in statutes} & charged_bases:
+            return 0.5
+        return 0.0
+
+    def search(self, query: str, charges=None, k: int = 3, filter: dict = None) -> list:
+        """
+        Hybrid top-k search
+
+        Args:
+            query: Natural-language query
+            charges: violations_charged_with from the user's case (list or string)
+            k: Number of chunks to return
+            filter: Optional Chroma-style metadata filter, e.g. {"doc_type": "pathway"}
+
+        Returns:
+            List of Documents, best first, with the score breakdown in metadata
+        """
+        if isinstance(charges, str):
+            charges = [charges]
+        charges = [c for c in (charges or []) if c]
+
+        charged = set()
+        for charge in charges:
+            charged.update(extract_statutes(charge))
+        charged_bases = {base_statute(s) for s in charged}
+
+        candidates = [row for row, m in enumerate(self.metadatas) if not filter or matches_filter(m, filter)]
+        if not candidates:
+            return []
+
+        # Dense relevance for every candidate - the corpus is small enough to score it all
+        dense = {}
+        for doc, relevance in self.vectorstore.similarity_search_with_relevance_scores(
+            query, k=len(candidates), filter=filter
+        ):
+            row = self.row_by_id.get(doc.id)
+            if row is not None:
+                dense[row] = relevance
+
+        lexical_query = " ".join([query, *charges])
+        lexical = {row: self.bm25.score(lexical_query, row) for row in candidates}
+        top_lexical = max(lexical.values()) or 1.0
+
+        scored = []
+        for row in candidates:
+            vector_score = dense.get(row, 0.0)
+            bm25_score = lexical[row] / top_lexical
+            match = self._statute_match(row, charged, charged_bases) if charged else 0.0
+            score = (self.vector_weight * vector_score
+                     + (1 - self.vector_weight) * bm25_score
+                     + self.statute_boost * match)
+            scored.append((score, row, vector_score, bm25_score, match))
+
+        scored.sort(key=lambda item: item[0], reverse=True)
+        results = []
+        for score, row, vector_score, bm25_score, match in scored[:k]:
+            metadata = dict(self.metadatas[row])
+            metadata["hybrid_score"] = round(score, 4)
+            metadata["vector_score"] = round(vector_score, 4)
+            metadata["bm25_score"] = round(bm25_score, 4)
+            metadata["statute_match"] = match
+            results.append(Document(id=self.ids[row], page_content=self.documents[row], metadata=metadata))
+        return results
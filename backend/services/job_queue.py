@@ -0,0 +1,312 @@
+"""
+PDF Parsing Job Queue
+Persistent SQLite-backed queue drained by a pool of worker threads, so large
+uploads don't hold an HTTP connection open while Gemini works through them
+
+Uploaded files are written under backend/jobs/files/<job_id>/ and jobs are
+rows in backend/jobs/jobs.sqlite3 - both survive a process restart. Any
+number of server processes can share the queue.
+
+A running job is held under a lease that its process renews every
+LEASE_SECONDS / 3. If the process dies (or hangs) the lease runs out and any
+worker claims the job again - no reliance on process IDs, which the OS
+reuses. The queue is created by the app lifespan (JobQueue.from_env), not on
+import.
+"""
+
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from services.rate_limiter import PRIORITY_BATCH, AdmissionRejected, request_priority
+
+logger = logging.getLogger(__name__)
+
+JOBS_DIR = Path(__file__).parent.parent / "jobs"
+
+# A job is retried this many times if the worker crashes mid-job
+MAX_ATTEMPTS = 3
+
+# How long a claimed job stays claimed without a heartbeat
+LEASE_SECONDS = float(os.getenv("PDF_JOB_LEASE_SECONDS", "60"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,           -- queued | running | done | failed
+    sources TEXT NOT NULL,          -- JSON {source: filename}
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker_pid INTEGER,             -- process that claimed it (informational)
+    lease_owner TEXT,               -- claim token of the worker holding it
+    lease_until REAL,               -- running jobs past this are reclaimed
+    available_at REAL NOT NULL,     -- earliest time a worker may claim it
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    result TEXT,                    -- JSON merged case document
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, available_at, created_at);
+"""
+
+# Columns added after the first release, for existing databases
+MIGRATIONS = {
+    "lease_owner": "ALTER TABLE jobs ADD COLUMN lease_owner TEXT",
+    "lease_until": "ALTER TABLE jobs ADD COLUMN lease_until REAL",
+}
+
+
+class JobQueue:
+    """Durable PDF parsing queue with an in-process worker pool"""
+
+    def __init__(self, jobs_dir=JOBS_DIR, workers: int = 2):
+        self.jobs_dir = Path(jobs_dir)
+        self.files_dir = self.jobs_dir / "files"
+        self.db_path = self.jobs_dir / "jobs.sqlite3"
+        self.workers = workers
+        self._threads = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Condition()
+        # Jobs this process is running: {job_id: lease_owner}
+        self._held = {}
+        self._held_lock = threading.Lock()
+
+        self.files_dir.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, statement in MIGRATIONS.items():
+                if column not in columns:
+                    conn.execute(statement)
+
+    @classmethod
+    def from_env(cls) -> "JobQueue":
+        return cls(workers=int(os.getenv("PDF_JOB_WORKERS", "2")))
+
+    @contextmanager
+    def _connect(self):
+        # Autocommit connection, closed on exit
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Client side
+    # ------------------------------------------------------------------
+    def submit(self, uploads: dict) -> str:
+        """
+        Persist uploads and enqueue a parsing job
+
+        Args:
+            uploads: {source: (filename, content bytes)}, source being
+                summons, sentencing or police
+
+        Returns:
+            The new job ID
+        """
+        job_id = uuid.uuid4().hex
+        job_dir = self.files_dir / job_id
+        job_dir.mkdir(parents=True)
+        for source, (_, content) in uploads.items():
+            (job_dir / f"{source}.pdf").write_bytes(content)
+
+        now = time.time()
+        sources = {source: filename for source, (filename, _) in uploads.items()}
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, sources, available_at, created_at) VALUES (?, 'queued', ?, ?, ?)",
+                (job_id, json.dumps(sources), now, now)
+            )
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def get(self, job_id: str):
+        """Job status and, once finished, its result - or None if unknown"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = {
+            "job_id": row["id"],
+            "status": row["status"],
+            "sources": json.loads(row["sources"]),
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+        }
+        if row["result"] is not None:
+            job["result"] = json.loads(row["result"])
+        if row["error"] is not None:
+            job["error"] = row["error"]
+        return job
+
+    def stats(self) -> dict:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {"workers": self.workers, **{row["status"]: row["n"] for row in rows}}
+
+    # ------------------------------------------------------------------
+    # Worker side
+    # ------------------------------------------------------------------
+    def start(self):
+        """Start the workers and the lease heartbeat"""
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"pdf-job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat_loop, name="pdf-job-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        """Stop claiming new jobs; jobs still running are handed back to the queue"""
+        self._stop.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+        with self._held_lock:
+            held = list(self._held.items())
+            self._held.clear()
+        if held:
+            with self._connect() as conn:
+                conn.executemany(
+                    "UPDATE jobs SET status = 'queued', available_at = ?, lease_owner = NULL "
+                    "WHERE id = ? AND lease_owner = ?",
+                    [(time.time(), job_id, owner) for job_id, owner in held]
+                )
+            logger.info(f"Handed {len(held)} unfinished PDF jobs back to the queue")
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(LEASE_SECONDS / 3):
+            with self._held_lock:
+                held = list(self._held.items())
+            if not held:
+                continue
+            try:
+                with self._connect() as conn:
+                    conn.executemany(
+                        "UPDATE jobs SET lease_until = ? WHERE id = ? AND lease_owner = ?",
+                        [(time.time() + LEASE_SECONDS, job_id, owner) for job_id, owner in held]
+                    )
+            except Exception as e:
+                logger.error(f"Failed to renew PDF job leases: {e}")
+
+    def _claim(self):
+        """Atomically take the oldest available job: queued, or running with an expired lease"""
+        owner = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = conn.execute(
+                    "SELECT id, sources, attempts, status FROM jobs "
+                    "WHERE (status = 'queued' AND available_at <= ?) "
+                    "OR (status = 'running' AND (lease_until IS NULL OR lease_until < ?)) "
+                    "ORDER BY created_at LIMIT 1",
+                    (now, now)
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'running', attempts = attempts + 1, worker_pid = ?, "
+                        "lease_owner = ?, lease_until = ?, started_at = ? WHERE id = ?",
+                        (os.getpid(), owner, now + LEASE_SECONDS, now, row["id"])
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        if row["status"] == "running":
+            logger.info(f"Reclaimed PDF job {row['id']} after its lease ran out")
+        with self._held_lock:
+            self._held[row["id"]] = owner
+        return row["id"], owner, json.loads(row["sources"]), row["attempts"] + 1
+
+    def _release(self, job_id: str) -> str:
+        with self._held_lock:
+            return self._held.pop(job_id, None)
+
+    def _finish(self, job_id: str, owner: str, status: str, result=None, error=None):
+        """Record the outcome, unless the lease was lost and another worker took the job"""
+        self._release(job_id)
+        with self._connect() as conn:
+            updated = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_owner = NULL "
+                "WHERE id = ? AND lease_owner = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id, owner)
+            ).rowcount
+        if not updated:
+            logger.warning(f"PDF job {job_id} was reclaimed by another worker; dropping this result")
+            return
+        shutil.rmtree(self.files_dir / job_id, ignore_errors=True)
+
+    def _defer(self, job_id: str, owner: str, delay: float):
+        """Put a job back in the queue, not claimable for `delay` seconds"""
+        self._release(job_id)
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', attempts = attempts - 1, available_at = ?, "
+                "lease_owner = NULL WHERE id = ? AND lease_owner = ?",
+                (time.time() + delay, job_id, owner)
+            )
+
+    def _worker_loop(self):
+        while not self._stop.is_set():
+            try:
+                claimed = self._claim()
+            except Exception as e:
+                logger.error(f"Failed to claim PDF job: {e}")
+                claimed = None
+
+            if claimed is None:
+                with self._wakeup:
+                    self._wakeup.wait(timeout=1.0)
+                continue
+
+            job_id, owner, sources, attempts = claimed
+            if attempts > MAX_ATTEMPTS:
+                self._finish(job_id, owner, "failed", error=f"Gave up after {MAX_ATTEMPTS} attempts")
+                continue
+            self._run(job_id, owner, sources)
+
+    def _run(self, job_id: str, owner: str, sources: dict):
+        # Imported here so the queue (and its tests) don't need the Gemini SDK
+        from services.pdf_service import merge_parsed_documents, parse_pdf_document
+
+        logger.info(f"Processing PDF job {job_id}: {sources}")
+        job_dir = self.files_dir / job_id
+        try:
+            raw = {}
+            # Batch priority: interactive /pdf-parser calls overtake queued jobs
+            with request_priority(PRIORITY_BATCH):
+                for source, filename in sources.items():
+                    content = (job_dir / f"{source}.pdf").read_bytes()
+                    raw[source] = parse_pdf_document(filename, content)
+            self._finish(job_id, owner, "done", result=merge_parsed_documents(raw))
+            logger.info(f"PDF job {job_id} done")
+        except AdmissionRejected as e:
+            # Upstream quota is busy - wait it out rather than failing the job
+            logger.info(f"PDF job {job_id} deferred {e.retry_after}s: {e}")
+            self._defer(job_id, owner, e.retry_after)
+        except Exception as e:
+            logger.error(f"PDF job {job_id} failed: {e}")
+            self._finish(job_id, owner, "failed", error=str(e))
+
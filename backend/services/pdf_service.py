@@ -5,13 +5,20 @@ Extracts text from court documents and parses with Gemini AI
 """
 
 import json
+import logging
 import os
+import tempfile
 import google.generativeai as genai
 from google.generativeai import GenerativeModel
 from PyPDF2 import PdfReader
 from dotenv import load_dotenv
 from pathlib import Path
 
+from services.prompt_builder import budget_from_env, build_prompt
+from services.rate_limiter import OUTPUT_TOKEN_ESTIMATE, AdmissionRejected, gemini_limiter
+
+logger = logging.getLogger(__name__)
+
 # ----------------------------------------------------------------------
 # 1. Load API key from backend/.env
 # ----------------------------------------------------------------------
@@ -24,6 +31,38 @@ if not API_KEY:
 
 genai.configure(api_key=API_KEY)
 
+# Shared model client, reused across requests
+GEMINI_MODEL = "gemini-2.5-flash"
+gemini_model = GenerativeModel(GEMINI_MODEL)
+
+# Token budget for the extraction prompt (approximate for Gemini's tokenizer)
+PDF_PROMPT_TOKEN_BUDGET = budget_from_env("PDF_PROMPT_TOKEN_BUDGET", 30000)
+
+EXTRACTION_INSTRUCTIONS = """
+You are a legal document extraction expert.
+
+Extract **only** these fields from the document below.
+Return **only** valid JSON — no explanations, no markdown.
+
+Use `null` for missing values. Dates must be in `YYYY-MM-DD` format.
+
+Required fields:
+- city_or_county (string)
+- case_number (string)
+- name (string)
+- date_to_appear (string, YYYY-MM-DD)
+
+Optional fields:
+- violations_charged_with (array of strings)
+- sentencing (string or null)
+- fine (number or null)
+- further_instruction (string or null)
+- report_number (string or null)
+- date_of_incident (string, YYYY-MM-DD or null)
+- officer (string or null)
+- location_of_occurrence (string or null)
+"""
+
 # ----------------------------------------------------------------------
 # 2. Extract text from PDF
 # ----------------------------------------------------------------------
@@ -47,6 +86,19 @@ def extract_text_from_pdf(pdf_path):
 # ----------------------------------------------------------------------
 # 3. Parse with Gemini – STRIP CODE BLOCKS + SAFE JSON
 # ----------------------------------------------------------------------
+def _settle_usage(response, estimate: int, prompt_stats: dict):
+    """Record Gemini's reported usage and correct the limiter's token estimate"""
+    usage = getattr(response, "usage_metadata", None)
+    total = getattr(usage, "total_token_count", None)
+    prompt_stats.update({
+        "input_tokens": getattr(usage, "prompt_token_count", None),
+        "output_tokens": getattr(usage, "candidates_token_count", None),
+        "cached_input_tokens": getattr(usage, "cached_content_token_count", None),
+    })
+    if total is not None:
+        gemini_limiter.settle(estimate, total)
+
+
 def parse_with_gemini(text):
     """
     Parse extracted text using Gemini AI to extract structured case data
@@ -56,46 +108,39 @@ def parse_with_gemini(text):
         
     Returns:
         Dictionary with parsed case information or error details
+        
+    Raises:
+        AdmissionRejected: If the Gemini quota queue is full or the wait is too long
     """
-    prompt = f"""
-You are a legal document extraction expert.
-
-Extract **only** these fields from the document below.
-Return **only** valid JSON — no explanations, no markdown.
-
-Use `null` for missing values. Dates must be in `YYYY-MM-DD` format.
-
-Required fields:
-- city_or_county (string)
-- case_number (string)
-- name (string)
-- date_to_appear (string, YYYY-MM-DD)
-
-Optional fields:
-- violations_charged_with (array of strings)
-- sentencing (string or null)
-- fine (number or null)
-- further_instruction (string or null)
-- report_number (string or null)
-- date_of_incident (string, YYYY-MM-DD or null)
-- officer (string or null)
-- location_of_occurrence (string or null)
-
-Text:
-{text}
-
-Return ONLY the JSON object.
-"""
+    # Static instructions first (cacheable prefix), document text trimmed to budget
+    prompt, prompt_stats = build_prompt(
+        EXTRACTION_INSTRUCTIONS,
+        sections=[],
+        chunks=[text],
+        chunks_heading="Text:",
+        suffix="Return ONLY the JSON object.",
+        budget=PDF_PROMPT_TOKEN_BUDGET
+    )
+    if text.strip() and not prompt_stats['chunks_included']:
+        # Nothing of the document fit - Gemini would only see the instructions
+        logger.warning(f"Gemini extraction skipped, no document text within budget: {prompt_stats}")
+        return {
+            "error": f"Document text doesn't fit PDF_PROMPT_TOKEN_BUDGET ({PDF_PROMPT_TOKEN_BUDGET} tokens)"
+        }
 
-    model = GenerativeModel("gemini-2.5-flash")
+    # Wait for quota - raises AdmissionRejected rather than hitting an upstream 429
+    estimate = prompt_stats['prompt_tokens'] + OUTPUT_TOKEN_ESTIMATE
+    gemini_limiter.acquire(estimate)
 
     try:
-        response = model.generate_content(
+        response = gemini_model.generate_content(
             prompt,
             generation_config=genai.GenerationConfig(
                 response_mime_type="application/json"
             ),
         )
+        _settle_usage(response, estimate, prompt_stats)
+        logger.info(f"Gemini extraction prompt: {prompt_stats}")
 
         raw = response.text.strip()
 
@@ -129,3 +174,114 @@ Return ONLY the JSON object.
             "error": f"Gemini error: {str(e)}"
         }
 
+
+# ----------------------------------------------------------------------
+# 4. Parse one uploaded document and merge several into a case
+# ----------------------------------------------------------------------
+def parse_pdf_document(filename: str, content: bytes) -> dict:
+    """
+    Extract and parse a single PDF document
+    
+    Args:
+        filename: Original upload filename
+        content: Raw PDF bytes
+        
+    Returns:
+        Dictionary with parsed case information or error details
+    """
+    suffix = os.path.splitext(filename)[1]
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+            tmp.write(content)
+            tmp_path = tmp.name
+
+        raw_text = extract_text_from_pdf(tmp_path)
+        if len(raw_text) > 100_000:
+            raw_text = raw_text[:100_000] + "\n\n[TRUNCATED]"
+
+        result = parse_with_gemini(raw_text)
+
+        # === If Gemini failed or returned error ===
+        if "error" in result or "raw_response" in result:
+            return {
+                "city_or_county": None,
+                "case_number": None,
+                "name": None,
+                "date_to_appear": None,
+                "violations_charged_with": [],
+                "sentencing": None,
+                "fine": None,
+                "further_instruction": None,
+                "report_number": None,
+                "date_of_incident": None,
+                "officer": None,
+                "location_of_occurrence": None,
+                "error": f"Failed to parse {filename}: {result.get('error', 'Invalid JSON')}"
+            }
+
+        return result
+
+    except AdmissionRejected:
+        raise  # caller decides: fail the request fast or retry later
+    except Exception as e:
+        return {
+            "city_or_county": None,
+            "case_number": None,
+            "name": None,
+            "date_to_appear": None,
+            "violations_charged_with": [],
+            "sentencing": None,
+            "fine": None,
+            "further_instruction": None,
+            "report_number": None,
+            "date_of_incident": None,
+            "officer": None,
+            "location_of_occurrence": None,
+            "error": f"Crash in {filename}: {str(e)}"
+        }
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            try:
+                os.unlink(tmp_path)
+            except:
+                pass  # ignore cleanup errors
+
+
+def merge_parsed_documents(raw: dict) -> dict:
+    """
+    Merge parsed documents into one case record
+    
+    Args:
+        raw: {"summons" | "sentencing" | "police": parsed document dict}
+        
+    Returns:
+        Merged case document, with parsing_errors if any document failed
+    """
+    final = {}
+    sources = ["summons", "sentencing", "police"]
+    fields = [
+        "city_or_county", "case_number", "name", "date_to_appear",
+        "violations_charged_with", "sentencing", "fine", "further_instruction",
+        "report_number", "date_of_incident", "officer", "location_of_occurrence"
+    ]
+
+    for field in fields:
+        for src in sources:
+            val = raw.get(src, {}).get(field)
+            if val not in (None, "", [], {}) and val is not None:
+                final[field] = val
+                break
+        else:
+            final[field] = None
+
+    # Prefer sentencing's further_instruction
+    if raw.get("sentencing", {}).get("further_instruction"):
+        final["further_instruction"] = raw["sentencing"]["further_instruction"]
+
+    # === COLLECT ERRORS ===
+    errors = [v.get("error") for v in raw.values() if v.get("error")]
+    if errors:
+        final["parsing_errors"] = errors
+
+    return final
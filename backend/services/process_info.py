@@ -0,0 +1,36 @@
+"""
+Process Memory Reporting
+Resident and shared memory of the current worker process, used to check that
+the knowledge base is actually shared between gunicorn workers
+"""
+
+import os
+import resource
+
+
+def memory_usage() -> dict:
+    """
+    Memory of this process in MB
+
+    Returns:
+        {"pid", "rss_mb", "shared_mb"} - shared_mb counts file-backed and
+        copy-on-write pages shared with other processes (e.g. the mmapped
+        vector index); it is None where /proc is unavailable
+    """
+    page_mb = os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    try:
+        with open("/proc/self/statm") as f:
+            _, resident, shared = f.read().split()[:3]
+        rss_mb = int(resident) * page_mb
+        shared_mb = int(shared) * page_mb
+    except OSError:
+        # macOS reports peak RSS in bytes, Linux in KB
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        rss_mb = peak / (1024 * 1024) if os.uname().sysname == "Darwin" else peak / 1024
+        shared_mb = None
+
+    return {
+        "pid": os.getpid(),
+        "rss_mb": round(rss_mb, 1),
+        "shared_mb": round(shared_mb, 1) if shared_mb is not None else None,
+    }
@@ -0,0 +1,126 @@
+"""
+Prompt Builder
+Token-budgeted prompts with the static instructions first, so every request
+shares a stable prefix that providers can cache, followed by the per-request
+sections and as many retrieved chunks as the budget allows
+"""
+
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Tokens below which a trimmed chunk carries too little to be worth including
+MIN_TRIMMED_CHUNK_TOKENS = 40
+TRIM_MARKER = " [...]"
+
+try:
+    import tiktoken
+
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:  # tiktoken missing or its encoding file unavailable offline
+    _encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with the GPT-4o tokenizer, or estimate at ~4 characters per token"""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text down to at most max_tokens tokens"""
+    if max_tokens <= 0:
+        return ""
+    if _encoding is not None:
+        tokens = _encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else _encoding.decode(tokens[:max_tokens])
+    return text[:max_tokens * 4]
+
+
+def budget_from_env(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def build_prompt(instructions: str, sections: list, chunks: list = None,
+                 chunks_heading: str = None, suffix: str = "", budget: int = None) -> tuple:
+    """
+    Assemble a prompt in cache-friendly order:
+        static instructions -> fixed sections -> retrieved chunks -> suffix
+
+    Instructions, sections and suffix are always kept whole. Chunks are added
+    in rank order until the budget is reached; the first chunk that doesn't fit
+    is trimmed if enough room remains, the rest are dropped.
+
+    Args:
+        instructions: Static text identical across requests (rules, schema)
+        sections: List of (heading, body) tuples for per-request data
+        chunks: Retrieved context strings, best first
+        chunks_heading: Heading placed above the chunks
+        suffix: Closing line, e.g. "JSON Response:"
+        budget: Maximum prompt tokens, or None for no limit
+
+    Returns:
+        (prompt, stats) where stats reports token counts and what was dropped
+    """
+    chunks = chunks or []
+    head_parts = [instructions.strip()]
+    for heading, body in sections:
+        head_parts.append(f"{heading}\n{body}")
+    head = "\n\n".join(head_parts)
+
+    static_tokens = count_tokens(instructions)
+    fixed_tokens = count_tokens(head) + count_tokens(suffix)
+    if chunks_heading and chunks:
+        fixed_tokens += count_tokens(chunks_heading)
+
+    remaining = None if budget is None else budget - fixed_tokens
+    kept = []
+    trimmed = 0
+    for chunk in chunks:
+        chunk_tokens = count_tokens(chunk)
+        if remaining is None or chunk_tokens <= remaining:
+            kept.append(chunk)
+            if remaining is not None:
+                remaining -= chunk_tokens
+            continue
+        if remaining >= MIN_TRIMMED_CHUNK_TOKENS:
+            kept.append(truncate_to_tokens(chunk, remaining - count_tokens(TRIM_MARKER)) + TRIM_MARKER)
+            trimmed = 1
+        break
+
+    parts = [head]
+    if kept:
+        context = "\n\n".join(kept)
+        parts.append(f"{chunks_heading}\n{context}" if chunks_heading else context)
+    if suffix:
+        parts.append(suffix)
+    prompt = "\n\n".join(parts)
+
+    stats = {
+        "prompt_tokens": count_tokens(prompt),
+        "static_prefix_tokens": static_tokens,
+        "budget": budget,
+        "chunks_retrieved": len(chunks),
+        "chunks_included": len(kept),
+        "chunks_trimmed": trimmed,
+        "chunks_dropped": len(chunks) - len(kept),
+    }
+    return prompt, stats
+
+
+def usage_stats(response) -> dict:
+    """
+    Token usage reported by the provider for a LangChain chat response,
+    including how much of the prompt was served from the prefix cache
+    """
+    usage = getattr(response, "usage_metadata", None) or {}
+    details = usage.get("input_token_details") or {}
+    return {
+        "input_tokens": usage.get("input_tokens"),
+        "output_tokens": usage.get("output_tokens"),
+        "cached_input_tokens": details.get("cache_read"),
+    }
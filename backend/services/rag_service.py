@@ -7,8 +7,21 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 from langchain_chroma import Chroma
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from langchain_openai import ChatOpenAI
+import asyncio
 import json
+import logging
+
+from langchain_core.documents import Document
+
+from knowledge_base.embeddings import check_manifest, get_embedding_backend
+from knowledge_base.penal_codes import StatuteIndex
+from knowledge_base.vector_index import NumpyVectorIndex
+from services.hybrid_retriever import HybridRetriever
+from services.prompt_builder import budget_from_env, build_prompt, usage_stats
+from services.rate_limiter import OUTPUT_TOKEN_ESTIMATE, openai_limiter
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables - look for .env in backend directory
 env_path = Path(__file__).parent.parent / '.env'
@@ -21,13 +34,153 @@ llm = ChatOpenAI(
     api_key=os.getenv("OPENAI_API_KEY")
 )
 
-# Initialize ChromaDB vector store
-# Use same embedding model as initialize_chromadb.py to avoid dimension mismatch
-vectorstore = Chroma(
-    collection_name="expungement_knowledge_base",
-    persist_directory=str(Path(__file__).parent.parent / "chroma_db"),
-    embedding_function=OpenAIEmbeddings(model="text-embedding-3-small")
-)
+# Use same embedding backend as initialize_chromadb.py (EMBEDDING_BACKEND) -
+# check_manifest refuses to start against a knowledge base built by another one
+KB_DIR = Path(__file__).parent.parent
+embeddings = get_embedding_backend()
+check_manifest(KB_DIR, embeddings)
+
+# Retrieval engine: "chroma" (default) or "numpy" for the in-process index
+# exported by initialize_chromadb.py - both expose similarity_search(query, k, filter)
+RETRIEVAL_ENGINE = os.getenv("RETRIEVAL_ENGINE", "chroma").lower()
+VECTOR_INDEX_DIR = KB_DIR / "vector_index"
+
+if RETRIEVAL_ENGINE == "numpy":
+    vectorstore = NumpyVectorIndex(VECTOR_INDEX_DIR, embedding_function=embeddings)
+else:
+    # Initialize ChromaDB vector store
+    vectorstore = Chroma(
+        collection_name="expungement_knowledge_base",
+        persist_directory=str(KB_DIR / "chroma_db"),
+        embedding_function=embeddings
+    )
+
+
+# Hybrid BM25 + vector retrieval with penal-code boosting (HYBRID_RETRIEVAL=true).
+# Better ranking lets it use a smaller k, which keeps prompts shorter.
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "false").lower() in ("1", "true", "yes")
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "3" if HYBRID_RETRIEVAL else "5"))
+hybrid_retriever = HybridRetriever(vectorstore) if HYBRID_RETRIEVAL else None
+
+
+# Inverted statute -> chunk index built by initialize_chromadb.py, loaded once
+STATUTE_INDEX_PATH = KB_DIR / "statute_index.json"
+statute_index = StatuteIndex.load(STATUTE_INDEX_PATH) if STATUTE_INDEX_PATH.exists() else None
+
+# Chunk types fetched directly when the user's charges cite a statute
+STATUTE_DOC_TYPES = ("eligibility_overview", "eligibility_positive", "eligibility_negative")
+
+
+def lookup_charged_statutes(user_data: dict) -> list:
+    """
+    Fetch the eligibility and exclusion chunks citing the user's charges
+    straight from the statute index (no embedding call, no vector search)
+    """
+    if statute_index is None:
+        return []
+    hits = statute_index.lookup(user_data.get('violations_charged_with'), doc_types=STATUTE_DOC_TYPES)
+    return [
+        Document(id=hit['id'], page_content=hit['text'], metadata={**hit['metadata'], 'matched_statute': hit['statute']})
+        for hit in hits
+    ]
+
+
+def retrieve(query: str, user_data: dict = None, filter: dict = None) -> list:
+    """
+    Retrieve the top RAG_TOP_K chunks for a query
+
+    Uses the hybrid retriever when enabled, boosting chunks that cite the
+    statutes in the user's violations_charged_with; plain vector search otherwise.
+    """
+    if hybrid_retriever:
+        charges = (user_data or {}).get('violations_charged_with')
+        return hybrid_retriever.search(query, charges=charges, k=RAG_TOP_K, filter=filter)
+    return vectorstore.similarity_search(query, k=RAG_TOP_K, filter=filter)
+
+
+def count_chunks() -> int:
+    """Number of chunks in the active retrieval engine"""
+    if isinstance(vectorstore, NumpyVectorIndex):
+        return vectorstore.count()
+    return vectorstore._collection.count()
+
+
+# Static prompt prefixes - identical for every request so providers can cache them.
+# Per-request data (user context, retrieved chunks) is appended after these.
+RAG_PROMPT_TOKEN_BUDGET = budget_from_env("RAG_PROMPT_TOKEN_BUDGET", 2500)
+
+ELIGIBILITY_INSTRUCTIONS = """You are an expert on California expungement law under PC 1203.4. Analyze the user's eligibility for expungement using the eligibility criteria from California law and the user's case information provided below.
+
+CRITICAL ELIGIBILITY RULES:
+1. Under PC 1203.4: ANY misdemeanor where ALL probation conditions are completed IS ELIGIBLE (unless specifically excluded)
+2. Only these specific crimes are excluded: PC 286(c), PC 288, PC 288a(c), PC 288.5, PC 289(j), VC 2800, VC 2801, VC 2803
+3. Disqualifying factors: currently serving sentence, currently on probation, pending charges, probation revoked
+
+Return ONLY a JSON object (no other text) with the following structure:
+
+{
+    "eligible": true or false,
+    "confidence": numeric score from 0-100,
+    "key_findings": [
+        {
+            "title": "Conviction Type Eligible" OR "Conviction Type Not Eligible",
+            "description": "Explain if their conviction type qualifies for expungement"
+        },
+        {
+            "title": "Waiting Period Met" OR "Waiting Period Not Met",
+            "description": "Explain if sufficient time has passed since conviction/sentence completion"
+        },
+        {
+            "title": "No Disqualifying Factors" OR "Disqualifying Factors",
+            "description": "Explain if there are any factors preventing expungement (pending charges, on probation, etc.)"
+        }
+    ],
+    "next_steps": [
+        "step 1 description",
+        "step 2 description",
+        "step 3 description"
+    ]
+}
+
+IMPORTANT RULES:
+- If ELIGIBLE: next_steps should be filing steps (Download CR-180 form, Complete form, File with court)
+- If NOT ELIGIBLE: next_steps should be pathway steps to become eligible
+- Return ONLY the JSON object, no other text before or after
+- confidence should be numeric (90-100 for high confidence, 60-89 for medium, 0-59 for low)"""
+
+PATHWAY_INSTRUCTIONS = """You are an expert on California expungement law helping someone become eligible for expungement.
+
+Based on the pathway information and the user's current status provided below, provide a clear action plan for them to become eligible.
+
+Provide your answer in JSON format:
+{
+    "pathway_available": true or false,
+    "required_steps": ["step 1", "step 2", ...],
+    "estimated_timeline": "X months/years",
+    "additional_notes": "Any important information"
+}"""
+
+
+def _settle_usage(response, estimate: int, prompt_stats: dict):
+    """Record provider usage and correct the limiter's token estimate"""
+    usage = usage_stats(response)
+    prompt_stats.update(usage)
+    if usage['input_tokens'] is not None and usage['output_tokens'] is not None:
+        openai_limiter.settle(estimate, usage['input_tokens'] + usage['output_tokens'])
+
+
+def invoke_llm(prompt: str, prompt_stats: dict):
+    """
+    Call the chat model through the OpenAI admission limiter
+
+    Raises:
+        AdmissionRejected: If the call can't be admitted within the queue limits
+    """
+    estimate = prompt_stats['prompt_tokens'] + OUTPUT_TOKEN_ESTIMATE
+    openai_limiter.acquire(estimate)
+    response = llm.invoke(prompt)
+    _settle_usage(response, estimate, prompt_stats)
+    return response
 
 
 def format_user_context(user_data: dict) -> str:
@@ -91,65 +244,32 @@ def check_eligibility(user_data: dict) -> dict:
     
     # Retrieve relevant documents from ChromaDB
     query = f"eligibility requirements for expungement probation status {user_data.get('conviction_type', 'misdemeanor')}"
-    retrieved_docs = vectorstore.similarity_search(query, k=5)
+    retrieved_docs = retrieve(query, user_data)
     
-    # Format retrieved documents
-    context_text = "\n\n".join([
-        f"[Source: {doc.metadata.get('doc_type', 'unknown')}]\n{doc.page_content}"
-        for doc in retrieved_docs
-    ])
+    # Statute-matched chunks go first; drop their duplicates from the search results
+    statute_docs = lookup_charged_statutes(user_data)
+    if statute_docs:
+        statute_ids = {doc.id for doc in statute_docs}
+        retrieved_docs = statute_docs + [doc for doc in retrieved_docs if doc.id not in statute_ids]
     
-    # Create the prompt
-    prompt = f"""You are an expert on California expungement law under PC 1203.4. Analyze the user's eligibility for expungement.
-
-ELIGIBILITY CRITERIA FROM CALIFORNIA LAW:
-{context_text}
-
-USER'S CASE INFORMATION:
-{user_context}
-
-CRITICAL ELIGIBILITY RULES:
-1. Under PC 1203.4: ANY misdemeanor where ALL probation conditions are completed IS ELIGIBLE (unless specifically excluded)
-2. Only these specific crimes are excluded: PC 286(c), PC 288, PC 288a(c), PC 288.5, PC 289(j), VC 2800, VC 2801, VC 2803
-3. Disqualifying factors: currently serving sentence, currently on probation, pending charges, probation revoked
-
-Return ONLY a JSON object (no other text) with the following structure:
-
-{{
-    "eligible": true or false,
-    "confidence": numeric score from 0-100,
-    "key_findings": [
-        {{
-            "title": "Conviction Type Eligible" OR "Conviction Type Not Eligible",
-            "description": "Explain if their conviction type qualifies for expungement"
-        }},
-        {{
-            "title": "Waiting Period Met" OR "Waiting Period Not Met",
-            "description": "Explain if sufficient time has passed since conviction/sentence completion"
-        }},
-        {{
-            "title": "No Disqualifying Factors" OR "Disqualifying Factors",
-            "description": "Explain if there are any factors preventing expungement (pending charges, on probation, etc.)"
-        }}
-    ],
-    "next_steps": [
-        "step 1 description",
-        "step 2 description",
-        "step 3 description"
-    ]
-}}
-
-IMPORTANT RULES:
-- If ELIGIBLE: next_steps should be filing steps (Download CR-180 form, Complete form, File with court)
-- If NOT ELIGIBLE: next_steps should be pathway steps to become eligible
-- Return ONLY the JSON object, no other text before or after
-- confidence should be numeric (90-100 for high confidence, 60-89 for medium, 0-59 for low)
-
-JSON Response:"""
+    # Build the prompt: static rules and schema first (cacheable prefix),
+    # then the user's case, then as many retrieved chunks as fit the budget
+    prompt, prompt_stats = build_prompt(
+        ELIGIBILITY_INSTRUCTIONS,
+        sections=[("USER'S CASE INFORMATION:", user_context)],
+        chunks=[
+            f"[Source: {doc.metadata.get('doc_type', 'unknown')}]\n{doc.page_content}"
+            for doc in retrieved_docs
+        ],
+        chunks_heading="ELIGIBILITY CRITERIA FROM CALIFORNIA LAW:",
+        suffix="JSON Response:",
+        budget=RAG_PROMPT_TOKEN_BUDGET
+    )
     
     # Call the LLM
-    response = llm.invoke(prompt)
+    response = invoke_llm(prompt, prompt_stats)
     llm_response = response.content
+    logger.info(f"Eligibility prompt: {prompt_stats}")
     
     # Parse the LLM response
     try:
@@ -181,62 +301,45 @@ JSON Response:"""
             "next_steps": ["Contact support for manual review"]
         }
     
-    # Add retrieved source documents
+    # Add the source documents that made it into the prompt
     parsed_response['retrieved_chunks'] = [
         {
             "content": doc.page_content[:200] + "..." if len(doc.page_content) > 200 else doc.page_content,
             "metadata": doc.metadata
         }
-        for doc in retrieved_docs
+        for doc in retrieved_docs[:prompt_stats['chunks_included']]
     ]
+    parsed_response['prompt_stats'] = prompt_stats
     
     return parsed_response
 
 
-def get_pathway_to_eligibility(user_data: dict) -> dict:
-    """
-    If user is not eligible, determine pathway to become eligible
-    """
+def _build_pathway_prompt(user_data: dict) -> tuple:
+    """Retrieve pathway chunks and build the pathway prompt"""
     
     # Query specifically for pathway information
-    retrieved_docs = vectorstore.similarity_search(
+    retrieved_docs = retrieve(
         "steps to become eligible pathway requirements",
-        k=5,
+        user_data,
         filter={"doc_type": "pathway"}
     )
     
     user_context = format_user_context(user_data)
     
-    # Format retrieved documents
-    context_text = "\n\n".join([
-        f"[Pathway Step]\n{doc.page_content}"
-        for doc in retrieved_docs
-    ])
-    
-    # Create prompt
-    prompt = f"""You are an expert on California expungement law helping someone become eligible for expungement.
-
-PATHWAY INFORMATION:
-{context_text}
-
-USER'S CURRENT STATUS:
-{user_context}
+    return build_prompt(
+        PATHWAY_INSTRUCTIONS,
+        sections=[("USER'S CURRENT STATUS:", user_context)],
+        chunks=[f"[Pathway Step]\n{doc.page_content}" for doc in retrieved_docs],
+        chunks_heading="PATHWAY INFORMATION:",
+        suffix="Answer:",
+        budget=RAG_PROMPT_TOKEN_BUDGET
+    )
 
-Based on the pathway information and the user's current status, provide a clear action plan for them to become eligible.
 
-Provide your answer in JSON format:
-{{
-    "pathway_available": true or false,
-    "required_steps": ["step 1", "step 2", ...],
-    "estimated_timeline": "X months/years",
-    "additional_notes": "Any important information"
-}}
-
-Answer:"""
-    
-    # Call the LLM
-    response = llm.invoke(prompt)
+def _parse_pathway_response(response, prompt_stats: dict) -> dict:
+    """Parse the LLM's pathway answer into a dictionary"""
     llm_response = response.content
+    logger.info(f"Pathway prompt: {prompt_stats}")
     
     # Parse response
     try:
@@ -261,5 +364,46 @@ Answer:"""
             "additional_notes": llm_response
         }
     
+    parsed_response['prompt_stats'] = prompt_stats
     return parsed_response
 
+
+def get_pathway_to_eligibility(user_data: dict) -> dict:
+    """
+    If user is not eligible, determine pathway to become eligible
+    """
+    prompt, prompt_stats = _build_pathway_prompt(user_data)
+    response = invoke_llm(prompt, prompt_stats)
+    return _parse_pathway_response(response, prompt_stats)
+
+
+async def aget_pathway_to_eligibility(user_data: dict) -> dict:
+    """
+    Async version of get_pathway_to_eligibility
+
+    Cancelling the awaiting task aborts the in-flight LLM request, which is
+    what lets /check-eligibility start it speculatively.
+    """
+    prompt, prompt_stats = await asyncio.to_thread(_build_pathway_prompt, user_data)
+    estimate = prompt_stats['prompt_tokens'] + OUTPUT_TOKEN_ESTIMATE
+    # Waits on the loop, so cancelling the task leaves the queue without taking tokens
+    await openai_limiter.acquire_async(estimate)
+    response = await llm.ainvoke(prompt)
+    _settle_usage(response, estimate, prompt_stats)
+    return _parse_pathway_response(response, prompt_stats)
+
+
+def likely_ineligible(user_data: dict) -> bool:
+    """
+    Cheap pre-check on the raw inputs - True when the case will probably come
+    back ineligible, so pathway guidance is worth starting early
+    """
+    if user_data.get('terms_of_service_completed') is False:
+        return True
+    if user_data.get('pending_charges_or_cases'):
+        return True
+    # A charge that cites a statute in the exclusion list
+    return any(
+        doc.metadata.get('doc_type') == 'eligibility_negative'
+        for doc in lookup_charged_statutes(user_data)
+    )
@@ -0,0 +1,243 @@
+"""
+Admission Control for Upstream LLM Quotas
+Per-provider token buckets (requests/minute and tokens/minute) with a bounded,
+priority-ordered wait queue. When the queue is full or the wait would be too
+long, callers get AdmissionRejected right away instead of an upstream 429 later.
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# Limits are configured in backend/.env
+env_path = Path(__file__).parent.parent / '.env'
+load_dotenv(dotenv_path=env_path)
+
+# Priority classes - lower value is served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+
+_priority = ContextVar("llm_request_priority", default=PRIORITY_INTERACTIVE)
+
+# How often acquire_async re-checks its place in the queue
+ASYNC_POLL_SECONDS = 0.05
+
+
+@contextmanager
+def request_priority(level: int):
+    """Run the enclosed LLM calls at the given priority (context-local, thread-safe)"""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class AdmissionRejected(Exception):
+    """Raised when an upstream call can't be admitted in time"""
+
+    def __init__(self, provider: str, retry_after: int, reason: str, status_code: int):
+        super().__init__(f"{provider} is at capacity ({reason}); retry after {retry_after}s")
+        self.provider = provider
+        self.retry_after = retry_after
+        self.reason = reason
+        self.status_code = status_code
+
+
+class TokenBucketLimiter:
+    """
+    Blocking limiter guarding one provider
+
+    Two buckets refill continuously: one in requests, one in (estimated) tokens.
+    Waiters queue in (priority, arrival) order and only the head of the queue
+    may take capacity, so interactive requests overtake queued batch work.
+    Threads wait with acquire(), coroutines with acquire_async(); both share
+    the one queue.
+    """
+
+    def __init__(self, provider: str, requests_per_minute: int, tokens_per_minute: int,
+                 max_queue: int = 50, max_wait_seconds: float = 10.0):
+        self.provider = provider
+        self.request_capacity = float(requests_per_minute)
+        self.token_capacity = float(tokens_per_minute)
+        self.request_rate = requests_per_minute / 60.0
+        self.token_rate = tokens_per_minute / 60.0
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+
+        self._requests = self.request_capacity
+        self._tokens = self.token_capacity
+        self._refilled_at = time.monotonic()
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        self._requests = min(self.request_capacity, self._requests + elapsed * self.request_rate)
+        self._tokens = min(self.token_capacity, self._tokens + elapsed * self.token_rate)
+
+    def _seconds_until_capacity(self, tokens: float) -> float:
+        request_wait = max(0.0, (1 - self._requests) / self.request_rate)
+        token_wait = max(0.0, (tokens - self._tokens) / self.token_rate)
+        return max(request_wait, token_wait)
+
+    def _retry_after(self, tokens: float) -> int:
+        # Time for the queue ahead plus this request to drain
+        backlog = len(self._waiters) + 1
+        drain = max(backlog / self.request_rate, backlog * tokens / self.token_rate)
+        return max(1, math.ceil(max(drain, self._seconds_until_capacity(tokens))))
+
+    def _enqueue(self, tokens: float, priority: int) -> tuple:
+        """Join the wait queue (lock held)"""
+        self._refill()
+        if len(self._waiters) >= self.max_queue:
+            self.rejected_queue_full += 1
+            raise AdmissionRejected(self.provider, self._retry_after(tokens), "queue full", 429)
+        entry = (priority, next(self._sequence))
+        heapq.heappush(self._waiters, entry)
+        return entry
+
+    def _try_admit(self, entry: tuple, tokens: float, deadline: float):
+        """
+        Take capacity if entry is at the head and it's available (lock held)
+
+        Returns:
+            None once admitted, otherwise seconds to wait before trying again
+        """
+        self._refill()
+        is_head = self._waiters[0] == entry
+        if is_head and self._requests >= 1 and self._tokens >= tokens:
+            self._requests -= 1
+            self._tokens -= tokens
+            heapq.heappop(self._waiters)
+            self.admitted += 1
+            return None
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self.rejected_timeout += 1
+            raise AdmissionRejected(self.provider, self._retry_after(tokens), "wait timeout", 503)
+        wait = self._seconds_until_capacity(tokens) if is_head else remaining
+        return min(remaining, max(wait, 0.01))
+
+    def _leave(self, entry: tuple):
+        """Drop entry from the queue if it's still waiting and wake the rest (lock held)"""
+        if entry in self._waiters:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+        self._cond.notify_all()
+
+    def acquire(self, tokens: int = 1, priority: int = None):
+        """
+        Block until the call may go upstream
+
+        Args:
+            tokens: Estimated tokens for the call (prompt + expected output)
+            priority: Priority class; defaults to the current request_priority
+
+        Raises:
+            AdmissionRejected: Queue full (429) or max wait exceeded (503)
+        """
+        tokens = min(float(tokens), self.token_capacity)
+        if priority is None:
+            priority = _priority.get()
+
+        with self._cond:
+            entry = self._enqueue(tokens, priority)
+            deadline = time.monotonic() + self.max_wait_seconds
+            try:
+                while True:
+                    wait = self._try_admit(entry, tokens, deadline)
+                    if wait is None:
+                        return
+                    self._cond.wait(wait)
+            finally:
+                self._leave(entry)
+
+    async def acquire_async(self, tokens: int = 1, priority: int = None):
+        """
+        acquire() for coroutines: waits on the event loop instead of a thread
+
+        Cancelling the caller while it's queued leaves the queue without
+        taking any capacity.
+
+        Raises:
+            AdmissionRejected: Queue full (429) or max wait exceeded (503)
+        """
+        tokens = min(float(tokens), self.token_capacity)
+        if priority is None:
+            priority = _priority.get()
+
+        with self._cond:
+            entry = self._enqueue(tokens, priority)
+        deadline = time.monotonic() + self.max_wait_seconds
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_admit(entry, tokens, deadline)
+                if wait is None:
+                    return
+                await asyncio.sleep(min(wait, ASYNC_POLL_SECONDS))
+        finally:
+            with self._cond:
+                self._leave(entry)
+
+    def settle(self, estimated_tokens: int, actual_tokens: int):
+        """Correct the token bucket once the provider reports real usage"""
+        if actual_tokens is None:
+            return
+        with self._cond:
+            self._tokens = min(self.token_capacity, self._tokens + estimated_tokens - actual_tokens)
+
+    def stats(self) -> dict:
+        with self._cond:
+            self._refill()
+            return {
+                "queued": len(self._waiters),
+                "available_requests": round(self._requests, 2),
+                "available_tokens": round(self._tokens),
+                "admitted": self.admitted,
+                "rejected_queue_full": self.rejected_queue_full,
+                "rejected_timeout": self.rejected_timeout,
+            }
+
+
+def worker_processes() -> int:
+    """Server processes sharing the quotas (WEB_CONCURRENCY, which gunicorn.conf.py and uvicorn --workers read)"""
+    return max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+
+def _limiter_from_env(provider: str, prefix: str, rpm: int, tpm: int) -> TokenBucketLimiter:
+    # Each worker process has its own buckets, so each gets an equal share of
+    # the provider quota - together they never admit more than the quota
+    workers = worker_processes()
+    return TokenBucketLimiter(
+        provider,
+        requests_per_minute=max(1, int(os.getenv(f"{prefix}_RPM", str(rpm))) // workers),
+        tokens_per_minute=max(1, int(os.getenv(f"{prefix}_TPM", str(tpm))) // workers),
+        max_queue=int(os.getenv("LLM_MAX_QUEUE", "50")),
+        max_wait_seconds=float(os.getenv("LLM_MAX_WAIT_SECONDS", "10")),
+    )
+
+
+# Expected completion size, added to the prompt size when reserving tokens
+OUTPUT_TOKEN_ESTIMATE = 800
+
+openai_limiter = _limiter_from_env("openai", "OPENAI", rpm=500, tpm=200_000)
+gemini_limiter = _limiter_from_env("gemini", "GEMINI", rpm=1000, tpm=1_000_000)
@@ -0,0 +1,130 @@
+"""
+Cross-Process Result Cache
+SQLite-backed key/value cache shared by every worker process on the host, so
+a result computed by one gunicorn worker is reused by the others instead of
+each worker warming its own copy
+
+Values are JSON documents with a time-to-live. Entries live in
+backend/cache/shared_cache.sqlite3 (WAL mode, safe for concurrent readers and
+writers across processes).
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = Path(__file__).parent.parent / "cache"
+
+# Expired rows are purged once every this many writes
+PURGE_EVERY_WRITES = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,            -- JSON
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS cache_expiry ON cache (expires_at);
+"""
+
+
+class SharedCache:
+    """JSON cache shared across processes; a TTL of 0 disables it"""
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl_seconds: float = 3600):
+        self.ttl_seconds = ttl_seconds
+        self.db_path = Path(cache_dir) / "shared_cache.sqlite3"
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+        if self.enabled:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+
+    @classmethod
+    def from_env(cls) -> "SharedCache":
+        return cls(ttl_seconds=float(os.getenv("SHARED_CACHE_TTL_SECONDS", "3600")))
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def get(self, namespace: str, key: str):
+        """Cached value, or None on a miss or if the entry expired"""
+        if not self.enabled:
+            return None
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT value FROM cache WHERE namespace = ? AND key = ? AND expires_at > ?",
+                    (namespace, key, time.time())
+                ).fetchone()
+        except sqlite3.Error as e:
+            # A cache failure must never fail the request
+            logger.warning(f"Shared cache read failed: {e}")
+            row = None
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return json.loads(row[0]) if row is not None else None
+
+    def set(self, namespace: str, key: str, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.writes += 1
+            purge = self.writes % PURGE_EVERY_WRITES == 0
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                    (namespace, key, json.dumps(value), time.time() + self.ttl_seconds)
+                )
+                if purge:
+                    conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache write failed: {e}")
+
+    def stats(self) -> dict:
+        """Hit/miss counters for this process, entry count for the whole host"""
+        entries = None
+        if self.enabled:
+            try:
+                with self._connect() as conn:
+                    entries = conn.execute(
+                        "SELECT COUNT(*) FROM cache WHERE expires_at > ?", (time.time(),)
+                    ).fetchone()[0]
+            except sqlite3.Error:
+                pass
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "ttl_seconds": self.ttl_seconds,
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,81 @@
+"""
+Single-Flight Request Coalescing
+Concurrent identical requests share one in-flight computation instead of each
+paying for its own LLM call
+"""
+
+import asyncio
+import copy
+import hashlib
+import json
+
+
+def canonical_hash(payload) -> str:
+    """Stable hash of a JSON-like payload - key order and whitespace don't matter"""
+    if isinstance(payload, bytes):
+        return hashlib.sha256(payload).hexdigest()
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    Runs at most one computation per key at a time
+
+    The computation runs as its own task, so a caller that disconnects doesn't
+    fail the others waiting on it. When every waiter has been cancelled the
+    computation itself is cancelled. Each caller gets its own deep copy of the
+    result so endpoints can annotate it freely.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight = {}  # key -> [task, waiter count]
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn):
+        """
+        Await the result of fn() for this key
+
+        Args:
+            key: Canonical request key (see canonical_hash)
+            fn: Zero-argument callable returning an awaitable; only invoked
+                if no computation for this key is already running
+        """
+        self.calls += 1
+        entry = self._inflight.get(key)
+        if entry is None:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            entry = [task, 0]
+            self._inflight[key] = entry
+
+            def _forget(_):
+                if self._inflight.get(key) is entry:
+                    del self._inflight[key]
+
+            task.add_done_callback(_forget)
+        else:
+            self.coalesced += 1
+
+        task = entry[0]
+        entry[1] += 1
+        try:
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and entry[1] == 1:
+                task.cancel()
+            raise
+        finally:
+            entry[1] -= 1
+        return copy.deepcopy(result)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "saved_calls": self.coalesced,
+            "in_flight": len(self._inflight),
+        }
@@ -0,0 +1,191 @@
+"""
+Voice Session Ingestion Store
+Sessions pushed by the voice agent (POST /voice-sessions), with their
+eligibility verdict once evaluated
+
+The agent pushes a session when the questionnaire is complete, while the
+call is still running, and again when the call ends. Each push is keyed by
+session_id, so retries and repeats are idempotent, and the verdict is only
+recomputed when the eligibility input changed. Rows live in
+backend/jobs/voice_sessions.sqlite3 so every worker process sees them - the
+push channel (GET /voice-sessions/rooms/{room}/events) may be served by a
+different worker than the one that evaluated the session.
+"""
+
+import json
+import logging
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).parent.parent / "jobs"
+
+# Facts extracted during the call that describe the case; identity fields
+# (name, date of birth) are stored but never sent to the LLM
+CASE_FACT_KEYS = ("state", "charges", "case_numbers", "disposition_dates", "arrest_years")
+
+# Voice facts renamed to the /check-eligibility field the RAG path reads -
+# statute lookup and hybrid boosting key off violations_charged_with
+FACT_FIELDS = {
+    "charges": "violations_charged_with",
+    "case_numbers": "case_number",
+}
+
+# An evaluation not finished after this long belonged to a worker that died
+STALE_EVALUATION_SECONDS = 300
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS voice_sessions (
+    session_id TEXT PRIMARY KEY,
+    room TEXT,
+    status TEXT NOT NULL,           -- incomplete | evaluating | done | failed
+    qa TEXT NOT NULL,               -- JSON questionnaire answers
+    facts TEXT NOT NULL,            -- JSON facts extracted during the call
+    input_hash TEXT,                -- canonical hash of the eligibility input
+    started_at TEXT,
+    ended_at TEXT,
+    received_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    result TEXT,                    -- JSON /check-eligibility response
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS voice_sessions_room ON voice_sessions (room, received_at);
+"""
+
+
+def eligibility_input(qa: dict, facts: dict) -> dict:
+    """The /check-eligibility payload for a voice session: answers plus case facts"""
+    user_data = {}
+    for key in CASE_FACT_KEYS:
+        if facts.get(key):
+            user_data[FACT_FIELDS.get(key, key)] = facts[key]
+    # A PDF upload carries one case number as a string
+    if isinstance(user_data.get("case_number"), list):
+        user_data["case_number"] = ", ".join(user_data["case_number"])
+    user_data.update(qa)
+    return user_data
+
+
+class VoiceSessionStore:
+    """SQLite-backed voice sessions, shared by all worker processes"""
+
+    def __init__(self, data_dir=DATA_DIR):
+        self.db_path = Path(data_dir) / "voice_sessions.sqlite3"
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _to_dict(row) -> dict:
+        session = {
+            "session_id": row["session_id"],
+            "room": row["room"],
+            "status": row["status"],
+            "qa": json.loads(row["qa"]),
+            "facts": json.loads(row["facts"]),
+            "started_at": row["started_at"],
+            "ended_at": row["ended_at"],
+            "received_at": row["received_at"],
+            "updated_at": row["updated_at"],
+        }
+        if row["result"] is not None:
+            session["result"] = json.loads(row["result"])
+        if row["error"] is not None:
+            session["error"] = row["error"]
+        return session
+
+    def ingest(self, session: dict, input_hash) -> tuple:
+        """
+        Insert or update a pushed session
+
+        Args:
+            session: session_id, room, qa, facts, started_at, ended_at
+            input_hash: Hash of the eligibility input, or None if the
+                questionnaire isn't complete
+
+        Returns:
+            (stored session, whether its verdict needs to be computed)
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT status, input_hash, updated_at FROM voice_sessions WHERE session_id = ?",
+                    (session["session_id"],)
+                ).fetchone()
+                in_progress = row is not None and row["status"] == "evaluating" \
+                    and now - row["updated_at"] < STALE_EVALUATION_SECONDS
+                unchanged = row is not None and row["input_hash"] == input_hash \
+                    and (row["status"] == "done" or in_progress)
+                if input_hash is None:
+                    status = "incomplete"
+                else:
+                    status = row["status"] if unchanged else "evaluating"
+
+                values = (
+                    session.get("room"), json.dumps(session.get("qa") or {}),
+                    json.dumps(session.get("facts") or {}), session.get("started_at"),
+                    session.get("ended_at"), now if not unchanged else row["updated_at"],
+                )
+                if row is None:
+                    conn.execute(
+                        "INSERT INTO voice_sessions (room, qa, facts, started_at, ended_at, updated_at, "
+                        "session_id, status, input_hash, received_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        values + (session["session_id"], status, input_hash, now)
+                    )
+                else:
+                    conn.execute(
+                        "UPDATE voice_sessions SET room = ?, qa = ?, facts = ?, started_at = ?, "
+                        "ended_at = COALESCE(?, ended_at), updated_at = ?, status = ?, input_hash = ?"
+                        + ("" if unchanged else ", result = NULL, error = NULL")
+                        + " WHERE session_id = ?",
+                        values + (status, input_hash, session["session_id"])
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return self.get(session["session_id"]), status == "evaluating" and not unchanged
+
+    def finish(self, session_id: str, input_hash: str, status: str, result=None, error=None) -> None:
+        """Record a verdict, unless a newer push changed the input in the meantime"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE voice_sessions SET status = ?, result = ?, error = ?, updated_at = ? "
+                "WHERE session_id = ? AND input_hash = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(),
+                 session_id, input_hash)
+            )
+
+    def get(self, session_id: str):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM voice_sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def latest_for_room(self, room: str):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM voice_sessions WHERE room = ? ORDER BY received_at DESC LIMIT 1",
+                (room,)
+            ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def stats(self) -> dict:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM voice_sessions GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
@@ -0,0 +1,110 @@
+"""
+Warmup Service
+Loads the knowledge base and opens upstream connections before the API
+reports itself ready, so the first real requests don't pay the cold-start cost
+"""
+
+import logging
+import time
+from datetime import datetime, timezone
+
+from services.pdf_service import GEMINI_MODEL, gemini_model
+from services.rag_service import RETRIEVAL_ENGINE, count_chunks, embeddings, llm, statute_index, vectorstore
+
+logger = logging.getLogger(__name__)
+
+# Shared readiness state, read by the /ready endpoint
+warmup_state = {
+    "ready": False,
+    "started_at": None,
+    "completed_at": None,
+    "total_ms": None,
+    "steps": [],
+}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _load_collection():
+    count = count_chunks()
+    if count == 0:
+        raise RuntimeError("Knowledge base is empty - run scripts.initialize_chromadb first")
+    return {
+        "engine": RETRIEVAL_ENGINE,
+        "embedding_backend": embeddings.fingerprint,
+        "chunks": count,
+        "indexed_statutes": len(statute_index.statutes) if statute_index else 0,
+    }
+
+
+def _probe_query():
+    # Pages the index into memory and opens the embeddings connection (if remote)
+    docs = vectorstore.similarity_search("expungement eligibility requirements", k=1)
+    return {"results": len(docs)}
+
+
+def _open_openai_connection():
+    # Cheap metadata call that opens the pooled HTTPS connection the chat
+    # client reuses for llm.invoke
+    llm.root_client.models.retrieve(llm.model_name)
+    return {"model": llm.model_name}
+
+
+def _open_gemini_connection():
+    gemini_model.count_tokens("warmup")
+    return {"model": GEMINI_MODEL}
+
+
+# (name, function, critical) - a failing critical step keeps the service unready
+WARMUP_STEPS = [
+    ("load_collection", _load_collection, True),
+    ("probe_query", _probe_query, True),
+    ("openai_connection", _open_openai_connection, False),
+    ("gemini_connection", _open_gemini_connection, False),
+]
+
+
+def run_warmup() -> dict:
+    """
+    Run every warmup step in order and record its duration
+
+    Blocking - call it from a worker thread, not the event loop.
+
+    Returns:
+        The updated warmup_state dictionary
+    """
+    warmup_state["ready"] = False
+    warmup_state["started_at"] = _now()
+    warmup_state["completed_at"] = None
+    warmup_state["steps"] = []
+
+    total_start = time.perf_counter()
+    ready = True
+
+    for name, step, critical in WARMUP_STEPS:
+        start = time.perf_counter()
+        entry = {"name": name, "critical": critical}
+        try:
+            entry["details"] = step()
+            entry["ok"] = True
+        except Exception as e:
+            entry["ok"] = False
+            entry["error"] = str(e)
+            if critical:
+                ready = False
+        entry["duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        warmup_state["steps"].append(entry)
+
+        if entry["ok"]:
+            logger.info(f"Warmup step {name} done in {entry['duration_ms']}ms")
+        else:
+            logger.warning(f"Warmup step {name} failed after {entry['duration_ms']}ms: {entry['error']}")
+
+    warmup_state["total_ms"] = round((time.perf_counter() - total_start) * 1000, 2)
+    warmup_state["completed_at"] = _now()
+    warmup_state["ready"] = ready
+
+    logger.info(f"Warmup finished in {warmup_state['total_ms']}ms: ready={ready}")
+    return warmup_state
@@ -0,0 +1,149 @@
+import sqlite3
+import sys
+import time
+import types
+
+import pytest
+
+from services import job_queue as job_queue_module
+from services.job_queue import JobQueue
+from services.rate_limiter import AdmissionRejected
+
+UPLOADS = {"summons": ("summons.pdf", b"%PDF-1.4 summons")}
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(tmp_path / "jobs", workers=1)
+    yield queue
+    queue.stop(timeout=2)
+
+
+def expire_lease(queue, job_id):
+    with queue._connect() as conn:
+        conn.execute("UPDATE jobs SET lease_until = ? WHERE id = ?", (time.time() - 1, job_id))
+
+
+def test_submit_persists_uploads_and_queues_job(queue):
+    job_id = queue.submit(UPLOADS)
+    job = queue.get(job_id)
+    assert job["status"] == "queued"
+    assert job["sources"] == {"summons": "summons.pdf"}
+    assert (queue.files_dir / job_id / "summons.pdf").read_bytes() == b"%PDF-1.4 summons"
+    assert queue.get("missing") is None
+    assert queue.stats() == {"workers": 1, "queued": 1}
+
+
+def test_claimed_job_is_held_until_finished(queue):
+    job_id = queue.submit(UPLOADS)
+    claimed_id, owner, sources, attempts = queue._claim()
+    assert (claimed_id, sources, attempts) == (job_id, {"summons": "summons.pdf"}, 1)
+    assert queue._claim() is None
+
+    queue._finish(job_id, owner, "done", result={"cases": []})
+    job = queue.get(job_id)
+    assert job["status"] == "done"
+    assert job["result"] == {"cases": []}
+    assert not (queue.files_dir / job_id).exists()
+
+
+def test_expired_lease_is_reclaimed_and_stale_result_dropped(queue):
+    job_id = queue.submit(UPLOADS)
+    _, first_owner, _, _ = queue._claim()
+    expire_lease(queue, job_id)
+
+    _, second_owner, _, attempts = queue._claim()
+    assert attempts == 2
+    assert second_owner != first_owner
+
+    # The worker that lost its lease finishes late; its result is ignored
+    queue._finish(job_id, first_owner, "failed", error="stale")
+    assert queue.get(job_id)["status"] == "running"
+
+    queue._finish(job_id, second_owner, "done", result={"cases": [1]})
+    assert queue.get(job_id)["result"] == {"cases": [1]}
+
+
+def test_heartbeat_keeps_lease_alive(queue, monkeypatch):
+    monkeypatch.setattr(job_queue_module, "LEASE_SECONDS", 0.3)
+    job_id = queue.submit(UPLOADS)
+    queue._claim()
+    queue.workers = 0
+    queue.start()
+
+    time.sleep(0.6)
+    assert queue._claim() is None
+    assert queue.get(job_id)["attempts"] == 1
+
+
+def test_deferred_job_waits_without_using_an_attempt(queue):
+    job_id = queue.submit(UPLOADS)
+    _, owner, _, _ = queue._claim()
+    queue._defer(job_id, owner, delay=60)
+
+    job = queue.get(job_id)
+    assert (job["status"], job["attempts"]) == ("queued", 0)
+    assert queue._claim() is None
+
+
+def test_stop_hands_running_jobs_back(queue):
+    job_id = queue.submit(UPLOADS)
+    queue._claim()
+    queue.stop()
+    assert queue.get(job_id)["status"] == "queued"
+    assert queue._claim()[0] == job_id
+
+
+def test_workers_run_jobs_and_defer_on_admission_rejected(queue, monkeypatch):
+    calls = []
+
+    def parse(filename, content):
+        calls.append(filename)
+        if len(calls) == 1:
+            raise AdmissionRejected("gemini", 0, "queue full", 429)
+        return {"filename": filename}
+
+    # Stands in for Gemini, which the worker imports when a job runs
+    pdf_service = types.SimpleNamespace(parse_pdf_document=parse,
+                                        merge_parsed_documents=lambda raw: {"merged": sorted(raw)})
+    monkeypatch.setitem(sys.modules, "services.pdf_service", pdf_service)
+    job_id = queue.submit(UPLOADS)
+    queue.start()
+
+    deadline = time.time() + 5
+    while queue.get(job_id)["status"] != "done" and time.time() < deadline:
+        time.sleep(0.05)
+    job = queue.get(job_id)
+    assert job["status"] == "done"
+    assert job["result"] == {"merged": ["summons"]}
+    assert job["attempts"] == 1
+    assert calls == ["summons.pdf", "summons.pdf"]
+
+
+def test_gives_up_after_max_attempts(queue):
+    job_id = queue.submit(UPLOADS)
+    for _ in range(job_queue_module.MAX_ATTEMPTS):
+        queue._claim()
+        expire_lease(queue, job_id)
+    queue.start()
+
+    deadline = time.time() + 5
+    while queue.get(job_id)["status"] != "failed" and time.time() < deadline:
+        time.sleep(0.05)
+    assert "Gave up" in queue.get(job_id)["error"]
+
+
+def test_adds_lease_columns_to_existing_database(tmp_path):
+    jobs_dir = tmp_path / "jobs"
+    jobs_dir.mkdir()
+    conn = sqlite3.connect(jobs_dir / "jobs.sqlite3")
+    conn.execute(
+        "CREATE TABLE jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, sources TEXT NOT NULL, "
+        "attempts INTEGER NOT NULL DEFAULT 0, worker_pid INTEGER, available_at REAL NOT NULL, "
+        "created_at REAL NOT NULL, started_at REAL, finished_at REAL, result TEXT, error TEXT)"
+    )
+    conn.close()
+
+    queue = JobQueue(jobs_dir)
+    job_id = queue.submit(UPLOADS)
+    assert queue._claim()[0] == job_id
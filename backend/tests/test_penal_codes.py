@@ -0,0 +1,40 @@
+import pytest
+
+from knowledge_base.penal_codes import StatuteIndex, build_statute_index, extract_statutes
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("PC 1203.4", ["PC 1203.4"]),
+    ("PC1203.4", ["PC 1203.4"]),
+    # Stray OCR characters glued to the abbreviation
+    ("BPC 1203.4", ["PC 1203.4"]),
+    ("•PC 1203.4", ["PC 1203.4"]),
+    ("pc 1203.4", ["PC 1203.4"]),
+    ("Penal Code section 1203.4", ["PC 1203.4"]),
+    ("health and safety code 11350", ["HS 11350"]),
+    ("VC 23152 (a)(1), VC 23152(a)(1)", ["VC 23152(a)(1)"]),
+    ("CONVICTED PC 484(a) 36 MONTHS PROBATION", ["PC 484(a)"]),
+    (None, []),
+])
+def test_extract_statutes(text, expected):
+    assert extract_statutes(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "SENTENCED TO 18 MONTHS 6 DAYS",
+    "3 YEARS 2 MONTHS 10 DAYS JAIL",
+    "PROBATION 36 MONTHS",
+    "PCS 5",
+])
+def test_ordinary_words_are_not_statutes(text):
+    assert extract_statutes(text) == []
+
+
+def test_index_ignores_sentence_lengths():
+    index = StatuteIndex(build_statute_index([
+        {"id": "a", "text": "PC 1203.4 relief. SENTENCED TO 18 MONTHS 6 DAYS", "metadata": {}},
+        {"id": "b", "text": "Covers PC 286(c)", "metadata": {"penal_codes": "VC 2800"}},
+    ]))
+    assert set(index.statutes) == {"PC 1203.4", "PC 286(c)", "VC 2800"}
+    assert [chunk["id"] for chunk in index.lookup("PC 286")] == ["b"]
+    assert index.lookup(["HS 6"]) == []
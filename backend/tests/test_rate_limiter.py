@@ -0,0 +1,144 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services.rate_limiter import (
+    PRIORITY_BATCH, PRIORITY_INTERACTIVE, AdmissionRejected, TokenBucketLimiter, _limiter_from_env,
+)
+
+
+def make_limiter(**overrides):
+    config = {"requests_per_minute": 600, "tokens_per_minute": 60_000, "max_queue": 10, "max_wait_seconds": 1.0}
+    config.update(overrides)
+    return TokenBucketLimiter("test", **config)
+
+
+def test_admits_within_capacity():
+    limiter = make_limiter()
+    limiter.acquire(1000)
+    limiter.acquire(1000)
+    stats = limiter.stats()
+    assert stats["admitted"] == 2
+    assert stats["queued"] == 0
+    assert stats["available_tokens"] == pytest.approx(58_000, abs=100)
+
+
+def test_rejects_with_429_when_queue_is_full():
+    limiter = make_limiter(max_queue=0)
+    with pytest.raises(AdmissionRejected) as excinfo:
+        limiter.acquire()
+    assert excinfo.value.status_code == 429
+    assert excinfo.value.reason == "queue full"
+    assert excinfo.value.retry_after >= 1
+    assert limiter.stats()["rejected_queue_full"] == 1
+
+
+def test_rejects_with_503_when_wait_is_too_long():
+    limiter = make_limiter(requests_per_minute=1, max_wait_seconds=0.05)
+    limiter.acquire()
+    with pytest.raises(AdmissionRejected) as excinfo:
+        limiter.acquire()
+    assert excinfo.value.status_code == 503
+    assert excinfo.value.retry_after >= 1
+    stats = limiter.stats()
+    assert stats["rejected_timeout"] == 1
+    assert stats["queued"] == 0
+
+
+def test_oversized_requests_are_capped_at_bucket_size():
+    limiter = make_limiter(tokens_per_minute=1000)
+    limiter.acquire(5000)
+    assert limiter.stats()["admitted"] == 1
+
+
+def test_settle_returns_overestimated_tokens():
+    limiter = make_limiter(tokens_per_minute=6000)
+    limiter.acquire(4000)
+    limiter.settle(4000, 1500)
+    assert limiter.stats()["available_tokens"] == pytest.approx(4500, abs=50)
+
+
+def test_settle_charges_underestimates_and_ignores_missing_usage():
+    limiter = make_limiter(tokens_per_minute=6000)
+    limiter.acquire(1000)
+    limiter.settle(1000, None)
+    assert limiter.stats()["available_tokens"] == pytest.approx(5000, abs=50)
+    limiter.settle(1000, 3000)
+    assert limiter.stats()["available_tokens"] == pytest.approx(3000, abs=50)
+
+
+def test_interactive_waiters_overtake_queued_batch_work():
+    limiter = make_limiter(tokens_per_minute=600, max_wait_seconds=5)
+    limiter.acquire(600)
+    admitted = []
+
+    def call(name, priority):
+        limiter.acquire(5, priority=priority)
+        admitted.append(name)
+
+    batch = threading.Thread(target=call, args=("batch", PRIORITY_BATCH))
+    batch.start()
+    time.sleep(0.05)
+    interactive = threading.Thread(target=call, args=("interactive", PRIORITY_INTERACTIVE))
+    interactive.start()
+    batch.join()
+    interactive.join()
+    assert admitted == ["interactive", "batch"]
+
+
+def test_acquire_async_waits_for_capacity():
+    limiter = make_limiter(requests_per_minute=600)
+
+    async def run():
+        await limiter.acquire_async(100)
+        await limiter.acquire_async(100)
+
+    asyncio.run(run())
+    assert limiter.stats()["admitted"] == 2
+
+
+def test_acquire_async_times_out_with_503():
+    limiter = make_limiter(requests_per_minute=1, max_wait_seconds=0.05)
+    limiter.acquire()
+
+    async def run():
+        with pytest.raises(AdmissionRejected) as excinfo:
+            await limiter.acquire_async()
+        return excinfo.value
+
+    assert asyncio.run(run()).status_code == 503
+    assert limiter.stats()["queued"] == 0
+
+
+def test_cancelled_acquire_async_leaves_queue_without_capacity():
+    limiter = make_limiter(requests_per_minute=1, max_wait_seconds=10)
+    limiter.acquire()
+
+    async def run():
+        waiter = asyncio.ensure_future(limiter.acquire_async())
+        await asyncio.sleep(0.1)
+        assert limiter.stats()["queued"] == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+    asyncio.run(run())
+    stats = limiter.stats()
+    assert stats["queued"] == 0
+    assert stats["admitted"] == 1
+
+
+def test_env_limits_are_split_between_worker_processes(monkeypatch):
+    monkeypatch.setenv("OPENAI_RPM", "500")
+    monkeypatch.setenv("OPENAI_TPM", "200000")
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    limiter = _limiter_from_env("openai", "OPENAI", rpm=1, tpm=1)
+    assert (limiter.request_capacity, limiter.token_capacity) == (125, 50_000)
+
+    monkeypatch.setenv("OPENAI_RPM", "3")
+    assert _limiter_from_env("openai", "OPENAI", rpm=1, tpm=1).request_capacity == 1
+
+    monkeypatch.delenv("WEB_CONCURRENCY")
+    assert _limiter_from_env("openai", "OPENAI", rpm=1, tpm=1).request_capacity == 3
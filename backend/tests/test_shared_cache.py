@@ -0,0 +1,49 @@
+import multiprocessing
+import time
+
+from services.shared_cache import SharedCache
+
+
+def _write_from_other_process(cache_dir):
+    SharedCache(cache_dir).set("eligibility", "key", {"eligible": True})
+
+
+def test_round_trip_by_namespace(tmp_path):
+    cache = SharedCache(tmp_path)
+    cache.set("eligibility", "key", {"eligible": True, "reasons": ["a"]})
+    assert cache.get("eligibility", "key") == {"eligible": True, "reasons": ["a"]}
+    assert cache.get("pdf", "key") is None
+    assert cache.stats() == {"enabled": True, "ttl_seconds": 3600, "entries": 1, "hits": 1, "misses": 1}
+
+
+def test_entries_expire(tmp_path):
+    cache = SharedCache(tmp_path, ttl_seconds=0.1)
+    cache.set("pdf", "key", [1, 2])
+    time.sleep(0.2)
+    assert cache.get("pdf", "key") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_values_are_shared_across_worker_processes(tmp_path):
+    # gunicorn forks its workers from the preloaded app
+    process = multiprocessing.get_context("fork").Process(target=_write_from_other_process, args=(tmp_path,))
+    process.start()
+    process.join(timeout=30)
+    assert process.exitcode == 0
+    assert SharedCache(tmp_path).get("eligibility", "key") == {"eligible": True}
+
+
+def test_zero_ttl_disables_cache(tmp_path):
+    cache = SharedCache(tmp_path / "cache", ttl_seconds=0)
+    cache.set("pdf", "key", {"a": 1})
+    assert cache.get("pdf", "key") is None
+    assert not (tmp_path / "cache").exists()
+    assert cache.stats()["entries"] is None
+
+
+def test_storage_errors_do_not_raise(tmp_path):
+    cache = SharedCache(tmp_path)
+    cache.db_path.unlink()
+    cache.db_path.mkdir()
+    cache.set("pdf", "key", {"a": 1})
+    assert cache.get("pdf", "key") is None
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from services.single_flight import SingleFlight, canonical_hash
+
+
+def test_canonical_hash_ignores_key_order():
+    assert canonical_hash({"a": 1, "b": [1, 2]}) == canonical_hash({"b": [1, 2], "a": 1})
+    assert canonical_hash({"a": 1}) != canonical_hash({"a": 2})
+    assert canonical_hash(b"pdf bytes") == canonical_hash(b"pdf bytes")
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test")
+    runs = 0
+
+    async def compute():
+        nonlocal runs
+        runs += 1
+        await asyncio.sleep(0.05)
+        return {"eligible": True}
+
+    async def run():
+        return await asyncio.gather(*(flight.do("key", compute) for _ in range(3)))
+
+    results = asyncio.run(run())
+    assert runs == 1
+    assert results == [{"eligible": True}] * 3
+    # Every caller gets its own copy
+    results[0]["eligible"] = False
+    assert results[1] == {"eligible": True}
+    assert flight.stats() == {"calls": 3, "executions": 1, "saved_calls": 2, "in_flight": 0}
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight("test")
+
+    async def run():
+        return await asyncio.gather(flight.do("a", lambda: asyncio.sleep(0, "a")),
+                                    flight.do("b", lambda: asyncio.sleep(0, "b")))
+
+    assert asyncio.run(run()) == ["a", "b"]
+    assert flight.stats()["executions"] == 2
+
+
+def test_errors_reach_every_waiter_and_free_the_key():
+    flight = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream failed")
+
+    async def run():
+        results = await asyncio.gather(flight.do("key", fail), flight.do("key", fail), return_exceptions=True)
+        assert all(isinstance(r, ValueError) for r in results)
+        return await flight.do("key", lambda: asyncio.sleep(0, "retried"))
+
+    assert asyncio.run(run()) == "retried"
+    assert flight.stats()["executions"] == 2
+
+
+def test_one_cancelled_caller_does_not_cancel_the_others():
+    flight = SingleFlight("test")
+
+    async def run():
+        leaving = asyncio.ensure_future(flight.do("key", lambda: asyncio.sleep(0.05, "done")))
+        staying = asyncio.ensure_future(flight.do("key", lambda: asyncio.sleep(0.05, "unused")))
+        await asyncio.sleep(0.01)
+        leaving.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leaving
+        return await staying
+
+    assert asyncio.run(run()) == "done"
+
+
+def test_computation_is_cancelled_when_every_caller_leaves():
+    flight = SingleFlight("test")
+
+    async def run():
+        computation_cancelled = asyncio.Event()
+
+        async def compute():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                computation_cancelled.set()
+                raise
+
+        caller = asyncio.ensure_future(flight.do("key", compute))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await asyncio.wait_for(computation_cancelled.wait(), timeout=1)
+
+    asyncio.run(run())
+    assert flight.stats()["in_flight"] == 0
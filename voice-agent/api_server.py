@@ -4,22 +4,87 @@ FastAPI server for the expungement agent frontend.
 Provides endpoints to get chat history and session data.
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from email.utils import formatdate, parsedate_to_datetime
 from pathlib import Path
+from typing import Optional
 import json
 import sys
 import os
 import jwt
 import time
+import uuid
+import asyncio
 from datetime import datetime, timedelta
+from livekit import api
 
 # Add src directory to path to import parser
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from src.parser import ConversationParser
+from src.session_events import EventBroadcaster, SessionEventFeed
+from src.session_index import SessionIndex, SessionWatcher, eligibility_filename
+from src.session_journal import recover_orphaned_journals
+from src.session_retention import RetentionPolicy, SessionRetention
+
+SESSION_DIR = Path("/tmp/livekit_session")
+
+# Kept current by the watcher below and by the agent when it saves a session
+session_index = SessionIndex(SESSION_DIR)
+
+# Archives old sessions into SESSION_DIR/archive in the background
+retention = SessionRetention(SESSION_DIR, RetentionPolicy.from_env(), index=session_index)
+
+# Session events pushed to /api/events subscribers, fed by the watcher
+session_events = EventBroadcaster()
+session_feed = SessionEventFeed(SESSION_DIR)
+
+
+# Get LiveKit credentials from environment
+LIVEKIT_URL = os.getenv("LIVEKIT_URL")
+LIVEKIT_API_KEY = os.getenv("LIVEKIT_API_KEY")
+LIVEKIT_API_SECRET = os.getenv("LIVEKIT_API_SECRET")
+LIVEKIT_TOKEN_TTL_SECONDS = 3600
+
+# One LiveKit API client per worker process, opened and closed by the lifespan
+# so its HTTP connections are reused across /api/start-agent calls
+livekit_api: Optional[api.LiveKitAPI] = None
+
+
+def livekit_configured() -> bool:
+    return bool(LIVEKIT_URL and LIVEKIT_API_KEY and LIVEKIT_API_SECRET)
+
+
+async def publish_session_changes(paths):
+    for event_type, data in await asyncio.to_thread(session_feed.read_changes, paths):
+        session_events.publish(event_type, data)
 
-app = FastAPI(title="Expungement Agent API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Recover crashed sessions, index existing ones, then watch the session directory"""
+    await asyncio.to_thread(recover_orphaned_journals, SESSION_DIR)
+    await asyncio.to_thread(session_feed.prime)
+    watcher = SessionWatcher(session_index, on_changes=publish_session_changes)
+    watcher.start()
+    retention.start()
+    global livekit_api
+    if livekit_configured():
+        livekit_api = api.LiveKitAPI(url=LIVEKIT_URL, api_key=LIVEKIT_API_KEY, api_secret=LIVEKIT_API_SECRET)
+    yield
+    if livekit_api is not None:
+        await livekit_api.aclose()
+        livekit_api = None
+    session_events.close()
+    await retention.stop()
+    await watcher.stop()
+
+
+app = FastAPI(title="Expungement Agent API", lifespan=lifespan)
 
 # Enable CORS for frontend access
 app.add_middleware(
@@ -30,41 +95,112 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-SESSION_DIR = Path("/tmp/livekit_session")
 
-# Get LiveKit credentials from environment
-LIVEKIT_URL = os.getenv("LIVEKIT_URL")
-LIVEKIT_API_KEY = os.getenv("LIVEKIT_API_KEY")
-LIVEKIT_API_SECRET = os.getenv("LIVEKIT_API_SECRET")
+# Parsed Q&A bodies kept in memory, keyed by _qa.json path and validated
+# against its (mtime, size) on every request
+QA_CACHE_SIZE = 128
+_qa_bodies = OrderedDict()
 
 
-@app.post("/api/token")
-async def create_token():
-    """Generate a LiveKit token for frontend to connect"""
-    if not LIVEKIT_URL or not LIVEKIT_API_KEY or not LIVEKIT_API_SECRET:
-        raise HTTPException(status_code=500, detail="LiveKit credentials not configured")
-    
-    # Generate a unique room name
-    room_name = f"room_{int(time.time())}"
-    participant_name = "user"
-    
-    # Create LiveKit token
-    token = jwt.encode(
+def fresh_qa_file(session_file: Path):
+    """
+    Return the session's _qa.json and its stat, re-parsing the session
+    only when the Q&A file is missing or older than the session file.
+    """
+    qa_file = session_file.with_name(f"{session_file.stem}_qa.json")
+    session_mtime = session_file.stat().st_mtime_ns
+    try:
+        qa_stat = qa_file.stat()
+    except FileNotFoundError:
+        qa_stat = None
+
+    if qa_stat is None or qa_stat.st_mtime_ns < session_mtime:
+        ConversationParser(str(session_file)).create_formatted_json(str(qa_file))
+        qa_stat = qa_file.stat()
+    return qa_file, qa_stat
+
+
+def read_qa_body(qa_file: Path, qa_stat) -> bytes:
+    version = (qa_stat.st_mtime_ns, qa_stat.st_size)
+    cached = _qa_bodies.get(qa_file)
+    if cached and cached[0] == version:
+        _qa_bodies.move_to_end(qa_file)
+        return cached[1]
+
+    body = qa_file.read_bytes()
+    _qa_bodies[qa_file] = (version, body)
+    if len(_qa_bodies) > QA_CACHE_SIZE:
+        _qa_bodies.popitem(last=False)
+    return body
+
+
+def not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+async def qa_response(session_file: Path, request: Request) -> Response:
+    """Serve the session's Q&A with ETag/Last-Modified, or 304 if the client is current"""
+    try:
+        qa_file, qa_stat = await asyncio.to_thread(fresh_qa_file, session_file)
+        etag = f'"{qa_stat.st_mtime_ns:x}-{qa_stat.st_size:x}"'
+        headers = {
+            "ETag": etag,
+            "Last-Modified": formatdate(qa_stat.st_mtime, usegmt=True),
+            "Cache-Control": "no-cache",
+        }
+        if not_modified(request, etag, qa_stat.st_mtime):
+            return Response(status_code=304, headers=headers)
+
+        body = await asyncio.to_thread(read_qa_body, qa_file, qa_stat)
+        return Response(content=body, media_type="application/json", headers=headers)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def new_room_name() -> str:
+    """Room name that can't collide with another session's, however many start at once"""
+    return f"room_{uuid.uuid4().hex}"
+
+
+def mint_token(room_name: str, participant_name: str = "user") -> str:
+    """Sign a LiveKit access token that lets participant_name join room_name"""
+    now = int(time.time())
+    grant = {"room": room_name, "roomJoin": True}
+    return jwt.encode(
         {
             "iss": LIVEKIT_API_KEY,
             "sub": participant_name,
-            "iat": int(time.time()),
-            "exp": int(time.time()) + 3600,  # 1 hour expiration
-            "video": {"room": room_name, "roomJoin": True},
-            "audio": {"room": room_name, "roomJoin": True},
+            "iat": now,
+            "exp": now + LIVEKIT_TOKEN_TTL_SECONDS,
+            "video": grant,
+            "audio": grant,
         },
         LIVEKIT_API_SECRET,
         algorithm="HS256"
     )
+
+
+@app.post("/api/token")
+async def create_token():
+    """Generate a LiveKit token for frontend to connect"""
+    if not livekit_configured():
+        raise HTTPException(status_code=500, detail="LiveKit credentials not configured")
     
+    room_name = new_room_name()
     return {
         "url": LIVEKIT_URL,
-        "token": token,
+        "token": mint_token(room_name),
         "room": room_name
     }
 
@@ -76,17 +212,45 @@ async def health_check():
 
 
 @app.get("/api/sessions")
-async def get_sessions():
-    """Get list of all sessions"""
-    sessions = []
-    for json_file in sorted(SESSION_DIR.glob("session_*.json"), reverse=True):
-        if "_qa.json" not in json_file.name:  # Skip parsed files
-            sessions.append({
-                "filename": json_file.name,
-                "path": str(json_file),
-                "size": json_file.stat().st_size
-            })
-    return {"sessions": sessions}
+async def get_sessions(
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+):
+    """
+    List sessions, newest first.
+
+    Query params:
+        limit/offset: Pagination
+        since/until: Inclusive start-date range (YYYY-MM-DD or ISO datetime, UTC)
+    """
+    return session_index.list_sessions(limit=limit, offset=offset, since=since, until=until)
+
+
+@app.get("/api/events")
+async def stream_session_events(
+    request: Request,
+    session_id: Optional[str] = Query(None, description="Only events for this session (filename stem)"),
+    since: Optional[int] = Query(None, ge=0, description="Replay events after this id"),
+):
+    """
+    Server-sent events as sessions progress, instead of polling /api/latest:
+    session-created, turn-appended, session-saved, qa-ready and
+    eligibility-ready. Each event's id can be passed back as ?since= (or
+    Last-Event-ID, which browsers send on reconnect) to pick up where the
+    stream left off; "reset" means too much was missed and the client
+    should refetch.
+    """
+    last_event_id = request.headers.get("last-event-id")
+    if since is None and last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+
+    return StreamingResponse(
+        session_events.subscribe(since=since, session_id=session_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.get("/api/session/{session_id}")
@@ -94,7 +258,13 @@ async def get_session(session_id: str):
     """Get full session data (with turns)"""
     session_file = SESSION_DIR / session_id
     if not session_file.exists():
-        raise HTTPException(status_code=404, detail="Session not found")
+        # Older sessions may have been moved into an archive bundle
+        archived = None
+        if Path(session_id).name == session_id:
+            archived = await asyncio.to_thread(retention.read_archived, session_id)
+        if archived is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+        return json.loads(archived)
     
     try:
         with open(session_file, 'r') as f:
@@ -105,28 +275,45 @@ async def get_session(session_id: str):
 
 
 @app.get("/api/session/{session_id}/qa")
-async def get_session_qa(session_id: str):
+async def get_session_qa(session_id: str, request: Request):
     """Get parsed Q&A JSON for a session"""
     session_file = SESSION_DIR / session_id
-    if not session_file.exists():
+    if Path(session_id).name != session_id or not session_file.exists():
         raise HTTPException(status_code=404, detail="Session not found")
     
+    return await qa_response(session_file, request)
+
+
+async def eligibility_response(session_id: str):
+    """The eligibility verdict the agent prefetched for a session, live or archived"""
+    filename = eligibility_filename(session_id)
+    eligibility_file = SESSION_DIR / filename
     try:
-        parser = ConversationParser(str(session_file))
-        qa_data = parser.create_formatted_json()
-        return qa_data
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        body = await asyncio.to_thread(eligibility_file.read_bytes)
+    except FileNotFoundError:
+        body = await asyncio.to_thread(retention.read_archived, filename)
+    if body is None:
+        raise HTTPException(status_code=404, detail="No eligibility result for this session")
+    return Response(content=body, media_type="application/json")
+
+
+@app.get("/api/session/{session_id}/eligibility")
+async def get_session_eligibility(session_id: str):
+    """Get the eligibility verdict prefetched during the call"""
+    if Path(session_id).name != session_id or not session_id.endswith(".json"):
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    return await eligibility_response(session_id)
 
 
 @app.get("/api/latest")
 async def get_latest_session():
     """Get the most recent session"""
-    sessions = sorted(SESSION_DIR.glob("session_*.json"), reverse=True)
-    if not sessions:
+    latest = session_index.latest()
+    if not latest:
         raise HTTPException(status_code=404, detail="No sessions found")
     
-    latest_session = sessions[0]
+    latest_session = Path(latest["path"])
     try:
         with open(latest_session, 'r') as f:
             data = json.load(f)
@@ -136,22 +323,24 @@ async def get_latest_session():
 
 
 @app.get("/api/latest/qa")
-async def get_latest_qa():
+async def get_latest_qa(request: Request):
     """Get parsed Q&A for the most recent session"""
-    sessions = sorted(SESSION_DIR.glob("session_*.json"), reverse=True)
-    if not sessions:
+    latest = session_index.latest()
+    if not latest:
         raise HTTPException(status_code=404, detail="No sessions found")
     
-    latest_session = sessions[0]
-    try:
-        parser = ConversationParser(str(latest_session))
-        qa_data = parser.create_formatted_json()
-        return qa_data
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return await qa_response(Path(latest["path"]), request)
 
 
-from livekit import api
+@app.get("/api/latest/eligibility")
+async def get_latest_eligibility():
+    """Get the prefetched eligibility verdict for the most recent session"""
+    latest = session_index.latest()
+    if not latest:
+        raise HTTPException(status_code=404, detail="No sessions found")
+    
+    return await eligibility_response(latest["filename"])
+
 
 @app.post("/api/start-agent")
 async def start_agent(request: dict):
@@ -162,18 +351,15 @@ async def start_agent(request: dict):
     if not room_name:
         raise HTTPException(status_code=400, detail="Room name is required")
 
-    try:
-        lk = api.LiveKitAPI(
-            url=LIVEKIT_URL,
-            api_key=LIVEKIT_API_KEY,
-            api_secret=LIVEKIT_API_SECRET,
-        )
+    if livekit_api is None:
+        raise HTTPException(status_code=500, detail="LiveKit credentials not configured")
 
+    try:
         # Ensure room exists or create it
-        await lk.room.create(room_name)
+        await livekit_api.room.create(room_name)
 
         # Start the agent worker
-        await lk.agent.start(
+        await livekit_api.agent.start(
             agent_id="expungement-agent",   # this must match the ID you configure in your worker
             room=room_name,
         )
@@ -192,13 +378,16 @@ if __name__ == '__main__':
     print(f"API documentation available at http://localhost:5001/docs")
     print(f"\nAPI endpoints:")
     print(f"  GET /api/health - Health check")
-    print(f"  GET /api/sessions - List all sessions")
+    print(f"  GET /api/sessions - List sessions (?limit=&offset=&since=&until=)")
+    print(f"  GET /api/events - Stream session events (server-sent events)")
     print(f"  POST /api/token - Generate LiveKit connection token")
     print(f"  GET /api/latest - Get most recent session")
     print(f"  GET /api/latest/qa - Get parsed Q&A for most recent session")
+    print(f"  GET /api/latest/eligibility - Get eligibility prefetched for most recent session")
     print(f"  POST /api/latest/qa - Send parsed Q&A JSON (use this!)")
     print(f"  GET /api/session/{{session_id}} - Get specific session")
     print(f"  GET /api/session/{{session_id}}/qa - Get parsed Q&A for specific session")
+    print(f"  GET /api/session/{{session_id}}/eligibility - Get eligibility prefetched for specific session")
     
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=5001)
@@ -1,4 +1,4 @@
-import logging, os, json, re, datetime
+import logging, os, json, datetime, time
 from pathlib import Path
 import asyncio
 
@@ -7,18 +7,28 @@ from dotenv import load_dotenv
 from livekit.agents import (
     Agent,
     AgentSession,
+    ConversationItemAddedEvent,
+    AgentStateChangedEvent,
     JobContext,
     JobProcess,
     MetricsCollectedEvent,
     RoomInputOptions,
     WorkerOptions,
     cli,
+    inference,
     metrics,
 )
 from livekit.agents.llm.chat_context import ChatContext
 from livekit.plugins import noise_cancellation, silero
 from livekit.plugins.turn_detector.multilingual import MultilingualModel
 
+from backend_client import backend_client
+from eligibility_prefetch import EligibilityPrefetch
+from fact_extractor import FactExtractor
+from parser import ConversationParser, IncrementalQA
+from session_index import SessionIndex
+from session_journal import SessionJournal, compact_journal
+
 logger = logging.getLogger("agent")
 
 load_dotenv(".env.local")
@@ -26,12 +36,37 @@ load_dotenv(".env.local")
 SESSION_DIR = Path("/tmp/livekit_session")
 SESSION_DIR.mkdir(parents=True, exist_ok=True)
 
+# Shared with api_server.py, which serves listings from it
+session_index = SessionIndex(SESSION_DIR)
+
+# How long shutdown waits for an eligibility check still in flight
+ELIGIBILITY_SHUTDOWN_WAIT_SECONDS = float(os.getenv("ELIGIBILITY_SHUTDOWN_WAIT_SECONDS", "15"))
+# How long shutdown waits for queued backend pushes before closing the pool
+BACKEND_DRAIN_SECONDS = float(os.getenv("BACKEND_DRAIN_SECONDS", "5"))
+
+STT_MODEL = "assemblyai/universal-streaming:en"
+LLM_MODEL = "openai/gpt-4.1-mini"
+TTS_MODEL = "cartesia/sonic-2:9626c31c-bec5-4cca-baa8-f8ba9e84c8bc"
+
+# Warm processes kept waiting for new rooms (unset: the LiveKit default)
+AGENT_IDLE_PROCESSES = os.getenv("AGENT_IDLE_PROCESSES")
+# prewarm() now loads every model, so give it more than the default 10s
+AGENT_INITIALIZE_TIMEOUT_SECONDS = float(os.getenv("AGENT_INITIALIZE_TIMEOUT_SECONDS", "30"))
+
 class ConversationMemory:
     """
     Minimal session memory to collect a turn-by-turn transcript and
     extract structured facts for downstream RAG/eligibility.
+
+    With a journal, every turn, answer and fact update is also appended to
+    the session's .jsonl journal as it happens, so a crash mid-call loses
+    at most the last flush interval.
+
+    The survey answers are mapped to their question keys as they arrive
+    (see IncrementalQA); on_qa_complete is called once with the Q&A pairs
+    when the last one is filled.
     """
-    def __init__(self):
+    def __init__(self, journal: SessionJournal = None):
         self.started_at = datetime.datetime.utcnow().isoformat() + "Z"
         self.ended_at = None
         self.turns = []  # list of {"role": "user"|"assistant", "text": "..."}
@@ -45,52 +80,39 @@ class ConversationMemory:
             "disposition_dates": [],
             "arrest_years": [],
         }
+        self._extractor = FactExtractor(self.facts)
+        self.qa = IncrementalQA()
+        self.on_qa_complete = None
+        self._journal = journal
+        self._journal_record({"type": "start", "started_at": self.started_at, "facts": self.facts})
+
+    def _journal_record(self, record: dict):
+        # After save() the compacted JSON is authoritative; later changes go to dump()
+        if self._journal is not None and not self._journal.closed:
+            self._journal.append(record)
 
     def add_turn(self, role: str, text: str):
         if not text:
             return
         self.turns.append({"role": role, "text": text})
+        self._journal_record({"type": "turn", "role": role, "text": text})
         if role == "user":
-            self._heuristic_extract(text)
-
-    def _heuristic_extract(self, text: str):
-        # very naive regex-based extraction as a baseline; your RAG can refine later
-        # state (2-letter)
-        m = re.search(r"\b([A-Z]{2})\b", text)
-        if m and not self.facts["state"]:
-            self.facts["state"] = m.group(1)
-
-        # dates (YYYY-MM-DD or MM/DD/YYYY)
-        for d in re.findall(r"\b(\d{4}-\d{2}-\d{2}|\d{1,2}/\d{1,2}/\d{2,4})\b", text):
-            # assume disposition dates for now; customize as needed
-            self.facts["disposition_dates"].append(d)
-
-        # case numbers (very rough)
-        for cn in re.findall(r"\b([A-Z0-9\-]{6,})\b", text):
-            if cn not in self.facts["case_numbers"]:
-                self.facts["case_numbers"].append(cn)
-
-        # years that look like arrest/conviction years
-        for y in re.findall(r"\b(19\d{2}|20\d{2})\b", text):
-            yy = int(y)
-            if 1950 <= yy <= datetime.datetime.utcnow().year and yy not in self.facts["arrest_years"]:
-                self.facts["arrest_years"].append(yy)
-
-        # quick-and-dirty "charges" capture keywords
-        for ch in re.findall(r"\b(dui|theft|petty theft|burglary|misdemeanor|felony|drug possession|assault)\b", text, re.I):
-            c = ch.lower()
-            if c not in self.facts["charges"]:
-                self.facts["charges"].append(c)
-
-        # full name (very naive: "my name is …")
-        m = re.search(r"\bmy name is ([A-Z][a-z]+(?: [A-Z][a-z]+)+)\b", text, re.I)
-        if m and not self.facts["full_name"]:
-            self.facts["full_name"] = m.group(1)
-
-        # DOB (naive)
-        m = re.search(r"\b(dob|date of birth)\s*[:\-]?\s*(\d{1,2}/\d{1,2}/\d{2,4})\b", text, re.I)
-        if m and not self.facts["dob"]:
-            self.facts["dob"] = m.group(2)
+            update = self._heuristic_extract(text)
+            if update:
+                self._journal_record({"type": "facts", "update": update})
+        key = self.qa.add_turn(role, text)
+        if key:
+            logger.info(f"Answer for {key}: {self.qa.qa_pairs[key]!r}")
+            if self.qa.complete and self.on_qa_complete is not None:
+                self.on_qa_complete(self.qa.qa_pairs)
+
+    def set_answer(self, key: str, answer: str):
+        self.questions[key] = answer
+        self._journal_record({"type": "answer", "key": key, "answer": answer})
+
+    def _heuristic_extract(self, text: str) -> dict:
+        # regex-based extraction as a baseline; your RAG can refine later
+        return self._extractor.extract(text)
 
     def finalize(self):
         self.ended_at = datetime.datetime.utcnow().isoformat() + "Z"
@@ -108,6 +130,20 @@ class ConversationMemory:
         self.finalize()
         path.write_text(json.dumps(self.to_dict(), indent=2))
 
+    async def save(self, path: Path):
+        """
+        Finish the session and write its JSON without blocking the event loop:
+        flush the journal and compact it into `path`, or dump directly when
+        there is no journal.
+        """
+        if self._journal is None or self._journal.closed:
+            await asyncio.to_thread(self.dump, path)
+            return
+        self.finalize()
+        self._journal_record({"type": "end", "ended_at": self.ended_at})
+        await self._journal.aclose()
+        await asyncio.to_thread(compact_journal, self._journal.path, path)
+
 
 class Assistant(Agent):
     def __init__(self, memory: ConversationMemory, session_filename: str, session_obj) -> None:
@@ -154,7 +190,7 @@ When the user types "q", end the session immediately.
             print("\n🛑 Detected 'q' command - ending session")
             # Save and close
             out_path = SESSION_DIR / self.session_filename
-            self._memory.dump(out_path)
+            await self._memory.save(out_path)
             print(f"\n📁 Session context saved to: {out_path}")
             
             # Close session after brief delay
@@ -163,30 +199,134 @@ When the user types "q", end the session immediately.
         else:
             # Store the answer to the current question
             if 1 <= self._q_count <= 5:
-                self._memory.questions[f"q{self._q_count}"] = text
+                self._memory.set_answer(f"q{self._q_count}", text)
                 print(f"💾 Saved answer for Q{self._q_count}: {text}")
 
 
+def _message_text(item) -> str:
+    """Text of a ChatMessage whose content is a string or a list of parts"""
+    content = item.content
+    if isinstance(content, str):
+        return content
+    parts = []
+    for part in content:
+        if isinstance(part, str):
+            parts.append(part)
+        elif hasattr(part, "text"):
+            parts.append(part.text)
+        elif hasattr(part, "content"):
+            parts.append(str(part.content))
+    return " ".join(parts)
+
+
+def history_to_turns(items) -> tuple:
+    """
+    Convert session.history.items into turns and questionnaire answers in one pass.
+
+    Args:
+        items: Chat history items; anything that isn't a ChatMessage is skipped
+
+    Returns:
+        (turns, answers): [(role, text), ...] and the user's replies to each
+        assistant message that asked a question, in order
+    """
+    turns = []
+    answers = []
+    debug = logger.isEnabledFor(logging.DEBUG)
+    for item in items:
+        if item.__class__.__name__ != "ChatMessage":
+            continue
+        role = getattr(item, "role", None)
+        text = _message_text(item)
+        if not role or not text:
+            continue
+        if turns and role == "user":
+            prev_role, prev_text = turns[-1]
+            if prev_role == "assistant" and "?" in prev_text:
+                answers.append(text)
+        turns.append((role, text))
+        if debug:
+            logger.debug(f"History {role}: {text[:50]}")
+    return turns, answers
+
+
+def write_qa_and_index(session_path: Path):
+    """
+    Write the session's _qa.json and record it in the session index.
+
+    Blocking; the shutdown callback runs it in a worker thread.
+
+    Returns:
+        Path of the _qa.json, or None if parsing failed
+    """
+    qa_path = session_path.parent / f"{session_path.stem}_qa.json"
+    try:
+        ConversationParser(str(session_path)).create_formatted_json(str(qa_path))
+        logger.info(f"Question-answer pairs saved to: {qa_path}")
+    except Exception as e:
+        logger.error(f"Failed to parse conversation: {e}")
+        qa_path = None
+
+    try:
+        session_index.record(session_path)
+    except Exception as e:
+        # The API server's watcher picks the file up anyway
+        logger.warning(f"Failed to index session: {e}")
+    return qa_path
+
+
 def prewarm(proc: JobProcess):
+    """
+    Runs once per worker process, before it's handed a room: load the local
+    models and build the provider clients, so a job only has to open their
+    connections (see warm_providers) instead of starting from scratch.
+    """
+    started = time.perf_counter()
     proc.userdata["vad"] = silero.VAD.load()
+    proc.userdata["turn_detection"] = MultilingualModel()
+    proc.userdata["stt"] = inference.STT.from_model_string(STT_MODEL)
+    proc.userdata["llm"] = inference.LLM.from_model_string(LLM_MODEL)
+    proc.userdata["tts"] = inference.TTS.from_model_string(TTS_MODEL)
+    proc.userdata["prewarm_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    logger.info(f"Process prewarmed in {proc.userdata['prewarm_ms']} ms")
+
+
+def warm_providers(userdata: dict) -> None:
+    """Open the STT, LLM and TTS connections while the room is still being set up"""
+    for name in ("stt", "llm", "tts"):
+        try:
+            userdata[name].prewarm()
+        except Exception as e:
+            # The session opens them on first use anyway
+            logger.warning(f"Could not prewarm {name}: {e}")
+
 
 async def entrypoint(ctx: JobContext):
+    job_started = time.perf_counter()
     ctx.log_context_fields = {"room": ctx.room.name}
+    userdata = ctx.proc.userdata
+    warm_providers(userdata)
 
-    # ✅ Create memory for THIS session only
-    memory = ConversationMemory()
-    
     # Generate unique session filename
     timestamp = datetime.datetime.utcnow().strftime("%Y%m%d_%H%M%S")
     session_filename = f"session_{timestamp}_{ctx.room.name}.json"
 
+    # ✅ Create memory for THIS session only, journaled as the call goes
+    journal = SessionJournal(SESSION_DIR / Path(session_filename).with_suffix(".jsonl"))
+    memory = ConversationMemory(journal)
+
+    # Hand the session to the backend as soon as all five answers are in
+    session_id = Path(session_filename).stem
+    prefetch = EligibilityPrefetch(memory, session_id, ctx.room.name, SESSION_DIR / f"{session_id}_eligibility.json")
+    memory.on_qa_complete = prefetch.start
+
     # ✅ Proper AgentSession setup
     session = AgentSession(
-        stt="assemblyai/universal-streaming:en",
-        llm="openai/gpt-4.1-mini",
-        tts="cartesia/sonic-2:9626c31c-bec5-4cca-baa8-f8ba9e84c8bc",
-        turn_detection=MultilingualModel(),
-        vad=ctx.proc.userdata["vad"],
+        stt=userdata["stt"],
+        llm=userdata["llm"],
+        tts=userdata["tts"],
+        turn_detection=userdata["turn_detection"],
+        vad=userdata["vad"],
         preemptive_generation=True,
     )
     
@@ -200,123 +340,84 @@ async def entrypoint(ctx: JobContext):
         metrics.log_metrics(ev.metrics)
         usage_collector.collect(ev.metrics)
 
+    # Time from the job being assigned to the agent first speaking
+    first_utterance_ms = None
+
+    @session.on("agent_state_changed")
+    def _on_agent_state_changed(ev: AgentStateChangedEvent):
+        nonlocal first_utterance_ms
+        if ev.new_state == "speaking" and first_utterance_ms is None:
+            first_utterance_ms = round((time.perf_counter() - job_started) * 1000, 1)
+            logger.info(
+                "first utterance",
+                extra={"first_utterance_ms": first_utterance_ms, "prewarm_ms": userdata.get("prewarm_ms")},
+            )
+            print(f"⏱️ First agent utterance {first_utterance_ms:.0f} ms after job start")
+
+    # Journal each turn as soon as it is committed to the chat history
+    @session.on("conversation_item_added")
+    def _on_conversation_item_added(ev: ConversationItemAddedEvent):
+        item = ev.item
+        if getattr(item, "role", None) in ("user", "assistant") and item.text_content:
+            memory.add_turn(item.role, item.text_content)
+
     # ✅ On shutdown, save memory to JSON
     async def log_usage_and_dump():
-        summary = usage_collector.get_summary()
-        logger.info(f"Usage: {summary}")
-        
-        # Extract from session.history.items
-        messages = None
-        
-        if hasattr(session, 'history'):
-            try:
-                # items is a property that returns a list
-                items = session.history.items
-                if isinstance(items, list):
-                    messages = items
-                    print(f"\n🔍 ✅ Found {len(messages)} items in session.history.items")
-                elif hasattr(items, '__iter__'):
-                    messages = list(items)
-                    print(f"\n🔍 ✅ Converted items to list: {len(messages)} items")
-                else:
-                    print(f"\n🔍 items type: {type(items)}")
-            except Exception as e:
-                print(f"\n🔍 Error accessing items: {e}")
-        
-        if messages:
-            print(f"🔍 Processing {len(messages)} messages")
-            q_num = 0
-            for i, item in enumerate(messages):
-                # Extract role and content from ChatMessage
-                role = None
-                content = None
-                
-                # Check if this is a ChatMessage
-                if hasattr(item, '__class__'):
-                    class_name = item.__class__.__name__
-                    print(f"🔍 Item {i}: {class_name}")
-                    if class_name == 'ChatMessage':
-                        role = item.role if hasattr(item, 'role') else None
-                        print(f"🔍 ChatMessage {i}: role={role}")
-                        # content is a list of Content objects (or strings)
-                        if hasattr(item, 'content') and isinstance(item.content, list):
-                            print(f"🔍 Content is a list with {len(item.content)} items")
-                            # Extract text from content items
-                            content_parts = []
-                            for j, content_item in enumerate(item.content):
-                                print(f"🔍 Content item {j}: {type(content_item)}")
-                                if isinstance(content_item, str):
-                                    # Content item is a string
-                                    content_parts.append(content_item)
-                                    print(f"🔍 Found string: {content_item[:50]}...")
-                                elif hasattr(content_item, 'text'):
-                                    content_parts.append(content_item.text)
-                                    print(f"🔍 Found text: {content_item.text[:50]}...")
-                                elif hasattr(content_item, 'content'):
-                                    content_parts.append(str(content_item.content))
-                                    print(f"🔍 Found content: {str(content_item.content)[:50]}...")
-                            content = ' '.join(content_parts) if content_parts else ''
-                            print(f"🔍 Final content: {content[:50]}...")
-                        elif hasattr(item, 'content'):
-                            content = str(item.content)
-                            print(f"🔍 Content is not a list: {content[:50]}...")
-                    else:
-                        print(f"🔍 Skipping non-ChatMessage item at index {i}: {class_name}")
-                        continue
-                else:
-                    continue
-                
-                if role and content:
-                    memory.add_turn(role, content)
-                    print(f"📝 Added turn: {role}: {content[:50]}...")
-                    
-                    # Check if this is a question with an answer
-                    if role == 'assistant' and '?' in content and i + 1 < len(messages):
-                        next_item = messages[i + 1]
-                        next_role = None
-                        answer = None
-                        
-                        if hasattr(next_item, '__class__'):
-                            next_class = next_item.__class__.__name__
-                            if next_class == 'ChatMessage':
-                                next_role = next_item.role if hasattr(next_item, 'role') else None
-                                if hasattr(next_item, 'content') and isinstance(next_item.content, list):
-                                    answer_parts = []
-                                    for content_item in next_item.content:
-                                        if isinstance(content_item, str):
-                                            answer_parts.append(content_item)
-                                        elif hasattr(content_item, 'text'):
-                                            answer_parts.append(content_item.text)
-                                    answer = ' '.join(answer_parts) if answer_parts else ''
-                        
-                        if next_role == 'user' and answer:
-                            q_num += 1
-                            memory.questions[f"q{q_num}"] = answer
-                            print(f"💾 Extracted Q{q_num}: {answer}")
-        else:
-            print("❌ Could not find message history")
-        
-        out_path = SESSION_DIR / session_filename
-        memory.dump(out_path)
-        logger.info(f"Session context saved to: {out_path}")
-        print(f"\n📁 Session saved to: {out_path}")
-        print(f"📊 Memory has {len(memory.turns)} turns and {len(memory.questions)} questions")
-        
-        # Automatically parse the conversation JSON
-        import sys
-        import os
-        sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
-        from parser import ConversationParser
-        
+        started = time.perf_counter()
+        logger.info(f"Usage: {usage_collector.get_summary()}")
+
+        # Turns already journaled live only need their answers extracted here
+        turns_captured = bool(memory.turns)
         try:
-            qa_parser = ConversationParser(str(out_path))
-            qa_output_path = out_path.parent / f"{out_path.stem}_qa.json"
-            qa_parser.create_formatted_json(str(qa_output_path))
-            logger.info(f"Question-answer pairs saved to: {qa_output_path}")
-            print(f"✅ Q&A JSON saved to: {qa_output_path}")
+            turns, answers = history_to_turns(session.history.items)
         except Exception as e:
-            logger.error(f"Failed to parse conversation: {e}")
-            print(f"❌ Failed to parse conversation: {e}")
+            logger.error(f"Could not read session history: {e}")
+            turns, answers = [], []
+
+        if not turns_captured:
+            for role, text in turns:
+                memory.add_turn(role, text)
+        for q_num, answer in enumerate(answers, start=1):
+            memory.set_answer(f"q{q_num}", answer)
+
+        out_path = SESSION_DIR / session_filename
+        await memory.save(out_path)
+        prefetch.finish()
+        saved = time.perf_counter()
+
+        # Parsing and indexing touch the disk; keep them off the event loop
+        qa_path = await asyncio.to_thread(write_qa_and_index, out_path)
+        written = time.perf_counter()
+
+        eligibility = await prefetch.wait(ELIGIBILITY_SHUTDOWN_WAIT_SECONDS)
+        # Nothing else goes to the backend from this job; send what is still
+        # queued, then close the pool
+        if not await backend_client.drain(BACKEND_DRAIN_SECONDS):
+            logger.warning(
+                f"Backend outbox not empty after {BACKEND_DRAIN_SECONDS}s, "
+                f"dropping {backend_client.pending} push(es)"
+            )
+        await backend_client.aclose()
+        finished = time.perf_counter()
+
+        logger.info(
+            "session saved",
+            extra={
+                "session_file": out_path.name,
+                "qa_file": qa_path.name if qa_path else None,
+                "history_turns": len(turns),
+                "turns": len(memory.turns),
+                "questions": len(memory.questions),
+                "save_ms": round((saved - started) * 1000, 1),
+                "qa_ms": round((written - saved) * 1000, 1),
+                "eligibility_wait_ms": round((finished - written) * 1000, 1) if prefetch.started else None,
+                "eligible": eligibility.get("eligible") if eligibility else None,
+                "shutdown_ms": round((finished - started) * 1000, 1),
+                "first_utterance_ms": first_utterance_ms,
+            },
+        )
+        print(f"\n📁 Session saved to: {out_path} ({len(memory.turns)} turns, "
+              f"{len(memory.questions)} questions, shutdown {(finished - started) * 1000:.0f} ms)")
 
     ctx.add_shutdown_callback(log_usage_and_dump)
 
@@ -333,4 +434,7 @@ async def entrypoint(ctx: JobContext):
 
 
 if __name__ == "__main__":
-    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
+    worker_options = {"initialize_process_timeout": AGENT_INITIALIZE_TIMEOUT_SECONDS}
+    if AGENT_IDLE_PROCESSES is not None:
+        worker_options["num_idle_processes"] = int(AGENT_IDLE_PROCESSES)
+    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm, **worker_options))
@@ -0,0 +1,110 @@
+"""
+Yes/no answer classifier for the survey's boolean questions.
+
+All cue phrases live in one compiled pattern with a named group per cue
+class, so classifying an answer is a single regex scan. The precedence is
+the one ConversationParser.text_to_boolean always used:
+
+1. an explicit negation ("no", "nope", "nah") anywhere makes it "no"
+2. otherwise any positive cue makes it "yes"
+3. otherwise any negative cue makes it "no"
+4. otherwise "unknown" (treated as False)
+
+classify_answers() labels many answers in one scan over their
+concatenation, for re-scoring archived sessions in bulk.
+"""
+
+import re
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Iterable, List, NamedTuple
+
+# Groups are ordered by precedence so that, where cues overlap, the one
+# that decides the label is the one reported
+CUE_RE = re.compile(
+    r"(?P<negation>\b(?:no|nope|nah)\b)"
+    r"|(?P<yes_strong>\b(?:yes|yeah|yep|ya|sure|of course|absolutely|definitely)\b)"
+    r"|(?P<yes_weak>\b(?:correct|right|true|completed|done|finished|i do)\b)"
+    r"|(?P<no_weak>\b(?:not|never|none|zero|i haven't|i haven|wrong|false|didn't|didnt)\b)"
+)
+
+# Confidence by the cue that decided the label
+CONFIDENCE = {
+    "negation": 0.95,
+    "yes_strong": 0.9,
+    "yes_weak": 0.75,
+    "no_weak": 0.75,
+}
+# When the answer also contains cues pointing the other way
+CONFLICT_CONFIDENCE = 0.5
+
+
+class AnswerLabel(NamedTuple):
+    label: str          # "yes", "no" or "unknown"
+    confidence: float   # 0.0 - 1.0
+
+    @property
+    def value(self) -> bool:
+        return self.label == "yes"
+
+
+UNKNOWN = AnswerLabel("unknown", 0.0)
+
+
+def _decide(kinds: set) -> AnswerLabel:
+    if not kinds:
+        return UNKNOWN
+    if "negation" in kinds:
+        conflict = "yes_strong" in kinds or "yes_weak" in kinds
+        return AnswerLabel("no", CONFLICT_CONFIDENCE if conflict else CONFIDENCE["negation"])
+    if "yes_strong" in kinds or "yes_weak" in kinds:
+        decided = "yes_strong" if "yes_strong" in kinds else "yes_weak"
+        conflict = "no_weak" in kinds
+        return AnswerLabel("yes", CONFLICT_CONFIDENCE if conflict else CONFIDENCE[decided])
+    return AnswerLabel("no", CONFIDENCE["no_weak"])
+
+
+@lru_cache(maxsize=4096)
+def _classify_normalized(text: str) -> AnswerLabel:
+    return _decide({m.lastgroup for m in CUE_RE.finditer(text)})
+
+
+def classify_answer(text: str) -> AnswerLabel:
+    """
+    Label one answer.
+
+    Args:
+        text: The user's answer as transcribed
+
+    Returns:
+        AnswerLabel(label, confidence); repeated answers are memoized
+    """
+    if not text:
+        return UNKNOWN
+    return _classify_normalized(text.lower().strip())
+
+
+def classify_answers(texts: Iterable[str]) -> List[AnswerLabel]:
+    """
+    Label many answers with one regex scan.
+
+    The answers are joined with newlines, which no cue can span, and each
+    match is attributed to its answer by offset.
+
+    Args:
+        texts: Answers as transcribed (None and "" give "unknown")
+
+    Returns:
+        One AnswerLabel per input, in order
+    """
+    normalized = [(text or "").lower().strip() for text in texts]
+    starts = []
+    offset = 0
+    for text in normalized:
+        starts.append(offset)
+        offset += len(text) + 1
+
+    kinds = [set() for _ in normalized]
+    for m in CUE_RE.finditer("\n".join(normalized)):
+        kinds[bisect_right(starts, m.start()) - 1].add(m.lastgroup)
+    return [_decide(found) for found in kinds]
@@ -0,0 +1,231 @@
+"""
+Pooled HTTP client for the agent's calls to the backend.
+
+One httpx.AsyncClient per worker process keeps connections to the backend
+alive across calls and sessions. Requests are retried with exponential
+backoff on connection errors, 429 and 5xx responses (honouring Retry-After).
+
+Pushes that nobody needs to wait for go through a bounded outbox drained in
+order by a sender task: submit() never blocks the call, and when the backend is
+down the outbox fills up to OUTBOX_SIZE and further pushes are dropped with
+an error instead of piling up in memory.
+
+The push channel back (server-sent events) is read with events().
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+BACKEND_URL = os.getenv("ELIGIBILITY_API_URL", "http://127.0.0.1:8000")
+BACKEND_TIMEOUT_SECONDS = float(os.getenv("ELIGIBILITY_TIMEOUT_SECONDS", "60"))
+BACKEND_MAX_CONNECTIONS = int(os.getenv("BACKEND_MAX_CONNECTIONS", "10"))
+BACKEND_MAX_ATTEMPTS = int(os.getenv("BACKEND_MAX_ATTEMPTS", "4"))
+OUTBOX_SIZE = int(os.getenv("BACKEND_OUTBOX_SIZE", "100"))
+# One sender keeps a session's pushes in the order they were made
+OUTBOX_SENDERS = 1
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class BackendClient:
+    """
+    Long-lived backend client with retries and a bounded outbox.
+
+    Args:
+        base_url: Backend base URL
+        max_attempts: Attempts per request, including the first
+        backoff: Delay before the first retry, doubled each time
+    """
+
+    def __init__(self, base_url: str = BACKEND_URL, max_attempts: int = BACKEND_MAX_ATTEMPTS,
+                 backoff: float = 0.5, outbox_size: int = OUTBOX_SIZE):
+        self.base_url = base_url.rstrip("/")
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.outbox_size = outbox_size
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop = None
+        self._outbox: Optional[asyncio.Queue] = None
+        self._senders = []
+        self._pending = 0
+        self.dropped = 0
+
+    # ------------------------------------------------------------------
+    # Connection pool
+    # ------------------------------------------------------------------
+    def _ensure_started(self) -> None:
+        # Bound to the running loop; a new loop (e.g. a new job process
+        # event loop) gets a fresh pool and outbox
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        if self._loop is not None:
+            self._close_stale()
+        self._loop = loop
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(BACKEND_TIMEOUT_SECONDS, connect=5.0),
+            limits=httpx.Limits(max_connections=BACKEND_MAX_CONNECTIONS,
+                                max_keepalive_connections=BACKEND_MAX_CONNECTIONS),
+        )
+        self._outbox = asyncio.Queue(maxsize=self.outbox_size)
+        self._senders = [loop.create_task(self._sender(self._outbox)) for _ in range(OUTBOX_SENDERS)]
+
+    @staticmethod
+    async def _shutdown(client: httpx.AsyncClient, senders: list) -> None:
+        for task in senders:
+            task.cancel()
+        await asyncio.gather(*senders, return_exceptions=True)
+        await client.aclose()
+
+    def _detach(self) -> tuple:
+        state = (self._loop, self._client, self._senders)
+        self._loop = self._client = self._outbox = None
+        self._senders = []
+        self._pending = 0
+        return state
+
+    def _close_stale(self) -> None:
+        """Close the pool left on a previous event loop, from that loop"""
+        loop, client, senders = self._detach()
+        if loop.is_running():
+            asyncio.run_coroutine_threadsafe(self._shutdown(client, senders), loop)
+        else:
+            # Finished without aclose(): nothing can await on it any more, so
+            # the pool's sockets close when it is collected
+            logger.debug("Backend client's event loop ended without aclose()")
+
+    async def aclose(self) -> None:
+        """Stop the senders and close the pool; queued pushes are dropped (drain() first)"""
+        if self._loop is None:
+            return
+        if self._loop is not asyncio.get_running_loop():
+            self._close_stale()
+            return
+        _, client, senders = self._detach()
+        await self._shutdown(client, senders)
+
+    # ------------------------------------------------------------------
+    # Requests
+    # ------------------------------------------------------------------
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        if response is not None and response.headers.get("retry-after", "").isdigit():
+            return float(response.headers["retry-after"])
+        return self.backoff * (2 ** (attempt - 1)) * random.uniform(0.8, 1.2)
+
+    async def post_json(self, path: str, payload: Dict) -> Dict:
+        """
+        POST a JSON payload, retrying transient failures.
+
+        Returns:
+            The decoded JSON response
+
+        Raises:
+            httpx.HTTPError: Once the attempts are used up, or right away for
+                other 4xx responses
+        """
+        self._ensure_started()
+        for attempt in range(1, self.max_attempts + 1):
+            response = None
+            try:
+                response = await self._client.post(path, json=payload)
+                if response.status_code not in RETRY_STATUS:
+                    response.raise_for_status()
+                    return response.json()
+                error = httpx.HTTPStatusError(f"{response.status_code} from {path}",
+                                              request=response.request, response=response)
+            except httpx.TransportError as e:
+                error = e
+            if attempt == self.max_attempts:
+                raise error
+            delay = self._retry_delay(attempt, response)
+            logger.info(f"POST {path} failed ({error}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def events(self, path: str) -> AsyncIterator[Dict]:
+        """
+        Read a server-sent events stream.
+
+        Yields:
+            {"event": name, "data": decoded JSON} for each event
+        """
+        self._ensure_started()
+        async with self._client.stream("GET", path, timeout=httpx.Timeout(None, connect=5.0)) as response:
+            response.raise_for_status()
+            event, data = "message", []
+            async for line in response.aiter_lines():
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data.append(line[len("data:"):].strip())
+                elif not line and data:
+                    yield {"event": event, "data": json.loads("\n".join(data))}
+                    event, data = "message", []
+
+    # ------------------------------------------------------------------
+    # Outbox
+    # ------------------------------------------------------------------
+    def submit(self, path: str, payload: Dict) -> asyncio.Future:
+        """
+        Queue a POST without waiting for it.
+
+        Returns:
+            Future resolved with the response JSON, or with None if the push
+            was dropped or failed for good
+        """
+        self._ensure_started()
+        done = self._loop.create_future()
+        try:
+            self._outbox.put_nowait((path, payload, done))
+            self._pending += 1
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.error(f"Backend outbox full ({self.outbox_size}), dropped POST {path}")
+            done.set_result(None)
+        return done
+
+    @property
+    def pending(self) -> int:
+        """Pushes queued or in flight; aclose() drops them"""
+        return self._pending
+
+    async def drain(self, timeout: float) -> bool:
+        """Wait up to timeout seconds for the outbox to empty; True if it did"""
+        if self._outbox is None:
+            return True
+        try:
+            await asyncio.wait_for(self._outbox.join(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _sender(self, outbox: asyncio.Queue):
+        # Bound to its own outbox: aclose() detaches it before cancelling us
+        while True:
+            path, payload, done = await outbox.get()
+            try:
+                result = await self.post_json(path, payload)
+            except (httpx.HTTPError, ValueError) as e:
+                logger.error(f"Giving up on POST {path}: {e}")
+                result = None
+            except asyncio.CancelledError:
+                if not done.done():
+                    done.set_result(None)
+                raise
+            finally:
+                outbox.task_done()
+                if outbox is self._outbox:
+                    self._pending -= 1
+            if not done.done():
+                done.set_result(result)
+
+
+backend_client = BackendClient()
@@ -0,0 +1,155 @@
+"""
+Accuracy and speed benchmark for spoken_dates.
+
+Runs a corpus of date answers as the speech-to-text produces them through
+parse_spoken_date and, when it is installed, through plain dateutil (what
+text_to_date relied on before), then prints accuracy and per-answer timings.
+
+Usage:
+    python src/benchmark_spoken_dates.py [--repeat 200]
+"""
+
+import argparse
+import time
+from datetime import date
+
+from spoken_dates import _parse, dateutil_parser, parse_spoken_date, parse_spoken_dates
+
+# Fixed reference day so relative phrases and missing years have one answer
+TODAY = date(2024, 6, 15)
+
+# (transcribed answer, expected) - None means no date should be read
+CORPUS = [
+    ("May 14th 2021", "2021-05-14"),
+    ("May 14, 2021", "2021-05-14"),
+    ("may fourteenth twenty twenty one", "2021-05-14"),
+    ("May tenth two thousand and sixteen", "2016-05-10"),
+    ("may tenth two thousand sixteen", "2016-05-10"),
+    ("the tenth of may two thousand sixteen", "2016-05-10"),
+    ("It was on the twenty-first of June, nineteen ninety nine.", "1999-06-21"),
+    ("june twenty first nineteen ninety nine", "1999-06-21"),
+    ("December thirty first two thousand", "2000-12-31"),
+    ("december thirty-first, two thousand and nine", "2009-12-31"),
+    ("september the second twenty oh nine", "2009-09-02"),
+    ("September 2nd, 2009", "2009-09-02"),
+    ("sept 2 2009", "2009-09-02"),
+    ("August 3rd '19", "2019-08-03"),
+    ("the third of august twenty nineteen", "2019-08-03"),
+    ("march fifth nineteen hundred and ninety", "1990-03-05"),
+    ("January of 2015", "2015-01-01"),
+    ("january twenty fifteen", "2015-01-01"),
+    ("I think it was around February 2018", "2018-02-01"),
+    ("um it was like the fourth of july twenty twelve", "2012-07-04"),
+    ("july 4 2012", "2012-07-04"),
+    ("i think it was in 2016 around may 14th", "2016-05-14"),
+    ("2016, on may fourteenth", "2016-05-14"),
+    ("oct 31 2020", "2020-10-31"),
+    ("October thirtieth twenty twenty", "2020-10-30"),
+    ("november eleventh two thousand eleven", "2011-11-11"),
+    ("April first", "2024-04-01"),
+    ("the twelfth of december", "2023-12-12"),
+    ("5/14/2021", "2021-05-14"),
+    ("5/14/21", "2021-05-14"),
+    ("05-14-2021", "2021-05-14"),
+    ("14/05/2021", "2021-05-14"),
+    ("2021-05-14", "2021-05-14"),
+    ("today", "2024-06-15"),
+    ("yesterday", "2024-06-14"),
+    ("last week", "2024-06-08"),
+    ("last month", "2024-05-15"),
+    ("last year", "2023-06-15"),
+    ("three years ago", "2021-06-15"),
+    ("about two years ago", "2022-06-15"),
+    ("a year ago", "2023-06-15"),
+    ("six months ago", "2023-12-15"),
+    ("ten days ago", "2024-06-05"),
+    ("it was a year ago", "2023-06-15"),
+    # Vague amounts aren't guessed at
+    ("a couple years ago", None),
+    ("a couple of years ago", None),
+    ("a few months ago", None),
+    ("several years ago", None),
+    # The year is read first, so its last word isn't taken for the day
+    ("two thousand twelve in april", "2012-04-01"),
+    ("twenty twelve in april", "2012-04-01"),
+    ("2012 the twelfth of april", "2012-04-12"),
+    ("june 2015 the fifteenth", "2015-06-15"),
+    ("june twenty fifteen the fifteenth", "2015-06-15"),
+    ("nineteen eighty the sixth of march", "1980-03-06"),
+    # 1986, or 1980 and the 6th? Neither is guessed
+    ("nineteen eighty sixth of march", None),
+    # A year on its own is its first day
+    ("nineteen oh five", "1905-01-01"),
+    ("It was in 2019", "2019-01-01"),
+    ("twenty nineteen", "2019-01-01"),
+    ("between 2015 and 2016", None),
+    ("two thousand dollars", None),
+    ("feb thirtieth twenty twenty", None),
+    # Dates that don't exist are rejected, not re-read as shorter numbers
+    ("february twenty ninth 2023", None),
+    ("february twenty ninth twenty twenty three", None),
+    ("april thirty first 2020", None),
+    ("april 31 2020", None),
+    ("june thirty first", None),
+    ("february twenty ninth twenty twenty", "2020-02-29"),
+    # A month word with no day or year next to it isn't a month
+    ("I may have been convicted in 2015", "2015-01-01"),
+    ("we had to march down to the courthouse", None),
+    ("I may have been convicted in march 2015", "2015-03-01"),
+    ("I don't remember", None),
+    ("a while back", None),
+    ("no", None),
+]
+
+
+def timed(parse, texts, repeat: int) -> float:
+    """Microseconds per answer"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            parse(text)
+    return (time.perf_counter() - start) / (repeat * len(texts)) * 1e6
+
+
+def accuracy(results) -> float:
+    return sum(result == expected for result, (_, expected) in zip(results, CORPUS)) / len(CORPUS)
+
+
+def dateutil_baseline(text: str):
+    try:
+        return dateutil_parser.parse(text.lower()).strftime("%Y-%m-%d")
+    except (ValueError, OverflowError):
+        return None
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--repeat", type=int, default=200, help="Passes over the corpus for timing")
+    args = arg_parser.parse_args()
+    texts = [text for text, _ in CORPUS]
+
+    results = parse_spoken_dates(texts, TODAY)
+    print(f"📅 {len(CORPUS)} transcribed answers\n")
+    print(f"🎯 spoken_dates accuracy: {accuracy(results):.1%}")
+    for result, (text, expected) in zip(results, CORPUS):
+        if result != expected:
+            print(f"   ❌ {text!r}: got {result}, expected {expected}")
+
+    def uncached(text):
+        _parse.cache_clear()
+        return parse_spoken_date(text, TODAY)
+
+    print(f"\n⏱️  spoken_dates (cold):     {timed(uncached, texts, args.repeat):8.1f} µs/answer")
+    print(f"⏱️  spoken_dates (memoized): {timed(lambda t: parse_spoken_date(t, TODAY), texts, args.repeat):8.1f} µs/answer")
+
+    if dateutil_parser is None:
+        print("\n⚠️  python-dateutil not installed - skipping the baseline")
+        return
+    # dateutil fills missing parts from the real today, so only absolute dates compare
+    baseline = [dateutil_baseline(text) for text in texts]
+    print(f"\n🎯 dateutil accuracy:       {accuracy(baseline):.1%}")
+    print(f"⏱️  dateutil:                {timed(dateutil_baseline, texts, args.repeat):8.1f} µs/answer")
+
+
+if __name__ == "__main__":
+    main()
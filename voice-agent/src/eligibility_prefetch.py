@@ -0,0 +1,130 @@
+"""
+Session handoff to the backend, with eligibility evaluated during the call.
+
+As soon as the agent has answers for all five questions it pushes the Q&A
+and the case facts extracted so far to the backend's POST /voice-sessions,
+while the call is still wrapping up; the backend starts the eligibility
+evaluation right away. When the call ends the finished session is pushed
+again (the backend only re-evaluates if the answers or facts changed), and
+the verdict comes back over the session's server-sent events channel.
+
+The frontend gets the same verdict pushed on
+GET /voice-sessions/rooms/{room}/events, so neither side polls api_server.py
+or shares SESSION_DIR with the backend. The verdict is also written next to
+the session as <session>_eligibility.json for the analytics export.
+"""
+
+import asyncio
+import copy
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import httpx
+
+from backend_client import BackendClient, backend_client
+
+logger = logging.getLogger(__name__)
+
+INGEST_PATH = "/voice-sessions"
+
+
+def write_result(path: Path, result: Dict) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(result, indent=2))
+    os.replace(tmp_path, path)
+
+
+class EligibilityPrefetch:
+    """
+    Pushes one session to the backend and collects its verdict.
+
+    Args:
+        memory: The session's ConversationMemory
+        session_id: Session filename stem
+        room: LiveKit room name, which the frontend subscribes by
+        result_path: Where to write the verdict (<session>_eligibility.json)
+        client: Backend client, the process-wide pool by default
+    """
+
+    def __init__(self, memory, session_id: str, room: str, result_path: Path,
+                 client: BackendClient = backend_client):
+        self.memory = memory
+        self.session_id = session_id
+        self.room = room
+        self.result_path = Path(result_path)
+        self.client = client
+        self._pushed: Optional[asyncio.Future] = None
+        self._started_at = None
+
+    @property
+    def started(self) -> bool:
+        return self._started_at is not None
+
+    def _push(self) -> asyncio.Future:
+        payload = {
+            "session_id": self.session_id,
+            "room": self.room,
+            "qa": self.memory.qa.qa_pairs,
+            "qa_complete": self.memory.qa.complete,
+            "facts": self.memory.facts,
+            "started_at": self.memory.started_at,
+            "ended_at": self.memory.ended_at,
+        }
+        # Snapshot: the call keeps updating memory while the push is queued
+        self._pushed = self.client.submit(INGEST_PATH, copy.deepcopy(payload))
+        return self._pushed
+
+    def start(self, qa_pairs: Dict) -> None:
+        """Push the completed questionnaire so evaluation starts during the call; later calls are ignored"""
+        if self._started_at is None:
+            self._started_at = time.perf_counter()
+            self._push()
+
+    def finish(self) -> None:
+        """Push the finished session (call after ConversationMemory.finalize)"""
+        self._push()
+
+    async def _verdict(self) -> Optional[Dict]:
+        session = await self._pushed
+        if session is None:
+            return None
+        # Stream status updates until the backend has a verdict
+        if session["status"] == "evaluating":
+            async for event in self.client.events(f"{INGEST_PATH}/{self.session_id}/events"):
+                if event["event"] != "status":
+                    break  # the backend closed the channel ("timeout")
+                session = event["data"]
+                if session["status"] != "evaluating":
+                    break
+        if session["status"] != "done":
+            if session["status"] == "failed":
+                logger.warning(f"Eligibility evaluation failed: {session.get('error')}")
+            return None
+
+        result = session["result"]
+        await asyncio.to_thread(write_result, self.result_path, result)
+        elapsed = f" {time.perf_counter() - self._started_at:.1f}s after the last answer" if self.started else ""
+        logger.info(f"Eligibility verdict{elapsed}: eligible={result.get('eligible')} -> {self.result_path.name}")
+        return result
+
+    async def wait(self, timeout: float) -> Optional[Dict]:
+        """
+        Wait up to timeout seconds for the verdict on the last push.
+
+        Returns:
+            The /check-eligibility result, or None if nothing was pushed, the
+            questionnaire was incomplete, evaluation failed or it timed out
+        """
+        if self._pushed is None:
+            return None
+        try:
+            return await asyncio.wait_for(self._verdict(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"No eligibility verdict after {timeout:.0f}s, giving up")
+        except (httpx.HTTPError, ValueError, KeyError) as e:
+            logger.warning(f"Could not read the eligibility verdict: {e}")
+        return None
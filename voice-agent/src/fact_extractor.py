@@ -0,0 +1,87 @@
+"""
+Fact extraction for ConversationMemory.
+
+The same naive regexes the agent always used, compiled once. List-valued
+facts keep first-seen order and are deduplicated through a companion set,
+so a long session never rescans its own history, and extract() returns only
+the facts a turn changed, so the journal doesn't diff the whole facts dict.
+"""
+
+import re
+from datetime import datetime, timezone
+from typing import Dict, Set
+
+STATE_RE = re.compile(r"\b([A-Z]{2})\b")
+DATE_RE = re.compile(r"\b(\d{4}-\d{2}-\d{2}|\d{1,2}/\d{1,2}/\d{2,4})\b")
+CASE_NUMBER_RE = re.compile(r"\b([A-Z0-9\-]{6,})\b")
+YEAR_RE = re.compile(r"\b(19\d{2}|20\d{2})\b")
+CHARGE_RE = re.compile(
+    r"\b(dui|theft|petty theft|burglary|misdemeanor|felony|drug possession|assault)\b", re.I
+)
+FULL_NAME_RE = re.compile(r"\bmy name is ([A-Z][a-z]+(?: [A-Z][a-z]+)+)\b", re.I)
+DOB_RE = re.compile(r"\b(?:dob|date of birth)\s*[:\-]?\s*(\d{1,2}/\d{1,2}/\d{2,4})\b", re.I)
+
+# Facts accumulated as deduplicated lists
+SET_FACTS = ("case_numbers", "charges", "arrest_years")
+
+
+class FactExtractor:
+    """
+    Incremental extractor bound to one facts dict.
+
+    Args:
+        facts: ConversationMemory.facts, updated in place
+    """
+
+    def __init__(self, facts: Dict):
+        self.facts = facts
+        self._seen: Dict[str, Set] = {key: set(facts[key]) for key in SET_FACTS}
+
+    def _add_unique(self, key: str, value, update: Dict) -> None:
+        seen = self._seen[key]
+        if value not in seen:
+            seen.add(value)
+            self.facts[key].append(value)
+            update[key] = self.facts[key]
+
+    def _set_once(self, key: str, pattern: re.Pattern, text: str, update: Dict) -> None:
+        if not self.facts[key]:
+            m = pattern.search(text)
+            if m:
+                self.facts[key] = m.group(1)
+                update[key] = self.facts[key]
+
+    def extract(self, text: str) -> Dict:
+        """
+        Extract facts from one user turn.
+
+        Returns:
+            {fact: new value} for every fact this turn changed
+        """
+        facts = self.facts
+        update = {}
+
+        self._set_once("state", STATE_RE, text, update)
+
+        dates = DATE_RE.findall(text)
+        if dates:
+            # assume disposition dates for now; customize as needed
+            facts["disposition_dates"].extend(dates)
+            update["disposition_dates"] = facts["disposition_dates"]
+
+        for case_number in CASE_NUMBER_RE.findall(text):
+            self._add_unique("case_numbers", case_number, update)
+
+        current_year = datetime.now(timezone.utc).year
+        for year in YEAR_RE.findall(text):
+            yy = int(year)
+            if 1950 <= yy <= current_year:
+                self._add_unique("arrest_years", yy, update)
+
+        for charge in CHARGE_RE.findall(text):
+            self._add_unique("charges", charge.lower(), update)
+
+        self._set_once("full_name", FULL_NAME_RE, text, update)
+        self._set_once("dob", DOB_RE, text, update)
+
+        return update
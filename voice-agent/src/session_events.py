@@ -0,0 +1,206 @@
+"""
+Live session events for api_server.py subscribers.
+
+SessionEventFeed turns file changes in SESSION_DIR, as reported by
+SessionWatcher, into events:
+
+    session-created      a journal appeared (a call started)
+    turn-appended        a turn was flushed to a call's journal
+    session-saved        the session JSON was written (the call ended)
+    qa-ready             the session's _qa.json was written
+    eligibility-ready    the session's _eligibility.json was written
+
+Journals are append-only, so each change is read from the offset where the
+previous read stopped.
+
+EventBroadcaster fans the events out. Each event is encoded once as a
+server-sent-events frame into a bounded ring buffer that every subscriber
+reads through its own cursor, so publishing costs the same however many
+subscribers there are. A subscriber that falls further behind than the
+buffer gets a "reset" event and should refetch what it shows.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+from collections import deque
+from itertools import islice
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from .session_index import ELIGIBILITY_SUFFIX, QA_SUFFIX, is_session_file
+from .session_journal import JOURNAL_SUFFIX
+
+logger = logging.getLogger(__name__)
+
+# Events kept for late or reconnecting subscribers (Last-Event-ID)
+EVENT_HISTORY = 1000
+KEEPALIVE_SECONDS = 15
+
+
+class EventBroadcaster:
+    """Single-producer, many-subscriber event stream over a ring buffer"""
+
+    def __init__(self, history: int = EVENT_HISTORY):
+        self._events = deque(maxlen=history)  # (seq, session_id, frame)
+        self._seq = 0
+        self._wake: Optional[asyncio.Event] = None
+        self._closed = False
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+    def publish(self, event_type: str, data: Dict) -> int:
+        """Append an event and wake every waiting subscriber; returns its sequence number"""
+        self._seq += 1
+        frame = f"id: {self._seq}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n"
+        self._events.append((self._seq, data.get("session_id"), frame))
+        self._notify()
+        return self._seq
+
+    def close(self) -> None:
+        """End every subscription"""
+        self._closed = True
+        self._notify()
+
+    def _notify(self) -> None:
+        if self._wake is not None:
+            self._wake.set()
+            self._wake = None
+
+    def _after(self, seq: int) -> Tuple[bool, List[tuple]]:
+        """(lagged, events newer than seq)"""
+        if not self._events or seq >= self._seq:
+            return False, []
+        first = self._events[0][0]
+        lagged = seq + 1 < first
+        return lagged, list(islice(self._events, max(0, seq + 1 - first), None))
+
+    async def _wait(self, seq: int, timeout: float) -> None:
+        if self._seq > seq or self._closed:
+            return
+        if self._wake is None:
+            self._wake = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def subscribe(self, since: Optional[int] = None, session_id: Optional[str] = None,
+                        keepalive: float = KEEPALIVE_SECONDS) -> AsyncIterator[str]:
+        """
+        Server-sent-events frames, starting after sequence number `since`
+        (only new events when None), optionally for one session only.
+        Yields a keep-alive comment when nothing happened for `keepalive` seconds.
+        """
+        cursor = self._seq if since is None else since
+        while not self._closed:
+            lagged, events = self._after(cursor)
+            if lagged:
+                yield f"id: {self._seq}\nevent: reset\ndata: {{}}\n\n"
+                cursor = self._seq
+                continue
+            for seq, event_session, frame in events:
+                cursor = seq
+                if session_id is None or event_session == session_id:
+                    yield frame
+            if not events:
+                await self._wait(cursor, keepalive)
+                if self._seq == cursor and not self._closed:
+                    yield ": keep-alive\n\n"
+
+
+class SessionEventFeed:
+    """Derives session events from changed paths in SESSION_DIR"""
+
+    def __init__(self, session_dir: Path):
+        self.session_dir = Path(session_dir)
+        self._offsets: Dict[str, int] = {}     # journal name -> bytes already read
+        self._versions: Dict[str, int] = {}    # json name -> mtime_ns already reported
+        self._lock = threading.Lock()
+
+    def prime(self) -> None:
+        """Skip what existing files already hold, so a restart doesn't replay them"""
+        with self._lock, os.scandir(self.session_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(JOURNAL_SUFFIX):
+                    self._offsets[entry.name] = entry.stat().st_size
+                elif entry.name.startswith("session_") and entry.name.endswith(".json"):
+                    self._versions[entry.name] = entry.stat().st_mtime_ns
+
+    def read_changes(self, paths) -> List[Tuple[str, Dict]]:
+        """
+        Events for a batch of changed paths (blocking; run in a thread).
+
+        Returns:
+            [(event type, data), ...] in file order
+        """
+        events = []
+        with self._lock:
+            for path in sorted(Path(p) for p in paths):
+                try:
+                    if path.name.endswith(JOURNAL_SUFFIX):
+                        events.extend(self._read_journal(path))
+                    elif path.name.startswith("session_") and path.name.endswith(".json"):
+                        events.extend(self._read_json(path))
+                except (OSError, ValueError) as e:
+                    logger.debug(f"Skipping {path.name}: {e}")
+        return events
+
+    def _read_journal(self, path: Path) -> List[Tuple[str, Dict]]:
+        session_id = path.name[:-len(JOURNAL_SUFFIX)]
+        if not path.exists():
+            # Compacted or recovered; session-saved follows from the .json
+            self._offsets.pop(path.name, None)
+            return []
+
+        offset = self._offsets.get(path.name, 0)
+        if path.stat().st_size < offset:
+            offset = 0
+        with open(path, "rb") as f:
+            f.seek(offset)
+            chunk = f.read()
+        # Only whole lines; a partial last line is read again next time
+        end = chunk.rfind(b"\n") + 1
+        self._offsets[path.name] = offset + end
+
+        events = []
+        for line in chunk[:end].splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            kind = record.get("type")
+            if kind == "start":
+                events.append(("session-created", {"session_id": session_id, "started_at": record.get("started_at")}))
+            elif kind == "turn":
+                events.append(("turn-appended", {"session_id": session_id, "role": record["role"], "text": record["text"]}))
+        return events
+
+    def _read_json(self, path: Path) -> List[Tuple[str, Dict]]:
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._versions.pop(path.name, None)
+            return []
+        if self._versions.get(path.name) == mtime:
+            return []
+
+        name = path.name
+        if name.endswith(QA_SUFFIX):
+            event = ("qa-ready", {"session_id": name[:-len(QA_SUFFIX)], "qa": json.loads(path.read_text())})
+        elif name.endswith(ELIGIBILITY_SUFFIX):
+            result = json.loads(path.read_text())
+            event = ("eligibility-ready", {"session_id": name[:-len(ELIGIBILITY_SUFFIX)],
+                                           "eligible": result.get("eligible"),
+                                           "confidence": result.get("confidence")})
+        elif is_session_file(name):
+            event = ("session-saved", {"session_id": name[:-len(".json")], "filename": name})
+        else:
+            return []
+        # Only once parsed: a half-written file is read again on its next change
+        self._versions[name] = mtime
+        return [event]
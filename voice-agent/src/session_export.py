@@ -0,0 +1,333 @@
+"""
+Columnar export of sessions for analytics.
+
+Flattens every finished session into one row: timing, turn counts, the
+parsed questionnaire answers (via ConversationParser), the extracted facts,
+and the eligibility verdict when a <session>_eligibility.json sits next to
+it. Rows are written as Parquet, partitioned by the session's start date:
+
+    EXPORT_DIR/sessions/date=2024-06-15/part-<run id>.parquet
+
+so a whole month of sessions loads with one read:
+
+    pyarrow.dataset.dataset(EXPORT_DIR / "sessions", partitioning="hive")
+    duckdb: SELECT ... FROM 'EXPORT_DIR/sessions/*/*.parquet'
+
+Each run only parses sessions not exported before, across a process pool.
+Sessions already moved into SESSION_DIR/archive bundles are read from there.
+The export state (which session went into which part file) is written after
+the part files, and parts that a crashed run left behind are deleted at the
+start of the next run, so no session is ever exported twice.
+
+Requires pyarrow (pip install pyarrow).
+
+Usage:
+    python src/session_export.py [--session-dir DIR] [--export-dir DIR] [--workers N]
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from .parser import ConversationParser
+    from .session_index import eligibility_filename, is_session_file, parse_session_filename
+except ImportError:  # run as a script from src/
+    from parser import ConversationParser
+    from session_index import eligibility_filename, is_session_file, parse_session_filename
+
+logger = logging.getLogger(__name__)
+
+SESSION_DIR = Path("/tmp/livekit_session")
+STATE_FILENAME = "_export_state.json"
+
+# Sessions this fresh may still be getting their eligibility verdict written
+MIN_AGE_SECONDS = 300
+
+QUESTION_KEYS = [
+    "conviction_type",
+    "date",
+    "terms_of_service_completed",
+    "other_convictions",
+    "pending_charges_or_cases",
+]
+
+
+def _schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("session_id", pa.string()),
+        ("room", pa.string()),
+        ("started_at", pa.timestamp("s", tz="UTC")),
+        ("ended_at", pa.timestamp("s", tz="UTC")),
+        ("duration_seconds", pa.float64()),
+        ("turns", pa.int32()),
+        ("user_turns", pa.int32()),
+        ("assistant_turns", pa.int32()),
+        ("questions_answered", pa.int32()),
+        ("completed", pa.bool_()),
+        ("last_question", pa.string()),
+        ("conviction_type", pa.string()),
+        ("conviction_date", pa.string()),
+        ("terms_of_service_completed", pa.bool_()),
+        ("other_convictions", pa.bool_()),
+        ("pending_charges_or_cases", pa.bool_()),
+        ("state", pa.string()),
+        ("charges", pa.list_(pa.string())),
+        ("case_numbers", pa.list_(pa.string())),
+        ("arrest_years", pa.list_(pa.int32())),
+        ("eligible", pa.bool_()),
+        ("eligibility_confidence", pa.float64()),
+        ("eligibility_checked", pa.bool_()),
+    ])
+
+
+def _timestamp(value) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+# ----------------------------------------------------------------------
+# Per-session work, run in the process pool
+# ----------------------------------------------------------------------
+def session_row(filename: str, session: Dict, eligibility: Optional[Dict], mtime: float) -> Dict:
+    """
+    Flatten one session into an export row.
+
+    Args:
+        filename: Session filename, used as session_id
+        session: The session JSON document
+        eligibility: Contents of its _eligibility.json, if any
+        mtime: File mtime, for names that carry no start time
+    """
+    parser = ConversationParser(filename)
+    parser.data = session
+    qa = parser.extract_qa_pairs()
+
+    meta = parse_session_filename(filename, mtime)
+    started = _timestamp(session.get("started_at")) or _timestamp(meta["started_at"])
+    ended = _timestamp(session.get("ended_at"))
+    turns = session.get("turns", [])
+    facts = session.get("extracted_facts") or {}
+    answered = [key for key in QUESTION_KEYS if key in qa]
+    eligibility = eligibility or {}
+
+    return {
+        "session_id": filename,
+        "room": meta["room"],
+        "started_at": started,
+        "ended_at": ended,
+        "duration_seconds": (ended - started).total_seconds() if started and ended else None,
+        "turns": len(turns),
+        "user_turns": sum(1 for turn in turns if turn.get("role") == "user"),
+        "assistant_turns": sum(1 for turn in turns if turn.get("role") == "assistant"),
+        "questions_answered": len(answered),
+        "completed": len(answered) == len(QUESTION_KEYS),
+        "last_question": answered[-1] if answered else None,
+        "conviction_type": qa.get("conviction_type"),
+        "conviction_date": qa.get("date"),
+        "terms_of_service_completed": qa.get("terms_of_service_completed"),
+        "other_convictions": qa.get("other_convictions"),
+        "pending_charges_or_cases": qa.get("pending_charges_or_cases"),
+        "state": facts.get("state"),
+        "charges": facts.get("charges") or [],
+        "case_numbers": facts.get("case_numbers") or [],
+        "arrest_years": facts.get("arrest_years") or [],
+        "eligible": eligibility.get("eligible"),
+        "eligibility_confidence": eligibility.get("confidence"),
+        "eligibility_checked": bool(eligibility),
+    }
+
+
+def _load_source(source: Tuple) -> Tuple[Optional[Dict], Optional[Dict]]:
+    """Session document and eligibility verdict from a live file or an archive bundle"""
+    kind, location, filename, _ = source
+    companion = eligibility_filename(filename)
+    if kind == "live":
+        session = json.loads((Path(location) / filename).read_text())
+        eligibility_path = Path(location) / companion
+        eligibility = json.loads(eligibility_path.read_text()) if eligibility_path.exists() else None
+        return session, eligibility
+
+    with zipfile.ZipFile(location) as zf:
+        names = set(zf.namelist())
+        session = json.loads(zf.read(filename))
+        eligibility = json.loads(zf.read(companion)) if companion in names else None
+    return session, eligibility
+
+
+def _export_one(source: Tuple) -> Tuple[str, Optional[Dict], Optional[str]]:
+    """Pool task: (filename, row or None, error or None)"""
+    filename = source[2]
+    try:
+        session, eligibility = _load_source(source)
+        return filename, session_row(filename, session, eligibility, source[3]), None
+    except Exception as e:
+        return filename, None, str(e)
+
+
+# ----------------------------------------------------------------------
+# Exporter
+# ----------------------------------------------------------------------
+class SessionExporter:
+    """
+    Incremental Parquet exporter for one SESSION_DIR.
+
+    Args:
+        session_dir: Directory holding session_*.json files (and archive/)
+        export_dir: Output root; partitions go under export_dir/sessions
+        workers: Process pool size, defaults to the CPU count
+    """
+
+    def __init__(self, session_dir: Path, export_dir: Path, workers: Optional[int] = None):
+        self.session_dir = Path(session_dir)
+        self.export_dir = Path(export_dir)
+        self.dataset_dir = self.export_dir / "sessions"
+        self.state_path = self.export_dir / STATE_FILENAME
+        self.workers = workers or os.cpu_count() or 1
+
+    # --- state ---------------------------------------------------------
+    def _load_state(self) -> Dict:
+        if not self.state_path.exists():
+            return {"exported": {}, "parts": []}
+        return json.loads(self.state_path.read_text())
+
+    def _save_state(self, state: Dict) -> None:
+        self.export_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_name(self.state_path.name + ".tmp")
+        tmp_path.write_text(json.dumps(state))
+        os.replace(tmp_path, self.state_path)
+
+    def _remove_orphaned_parts(self, state: Dict) -> int:
+        """Delete part files written by a run that died before saving its state"""
+        if not self.dataset_dir.exists():
+            return 0
+        known = set(state["parts"])
+        removed = 0
+        for part in self.dataset_dir.glob("date=*/*.parquet"):
+            if part.relative_to(self.dataset_dir).as_posix() not in known:
+                part.unlink()
+                removed += 1
+        return removed
+
+    # --- discovery -----------------------------------------------------
+    def _pending(self, exported: Dict) -> List[Tuple]:
+        """Sources of sessions not exported yet: (kind, location, filename, mtime)"""
+        cutoff = time.time() - MIN_AGE_SECONDS
+        pending = {}
+
+        archive_dir = self.session_dir / "archive"
+        if archive_dir.exists():
+            for bundle in sorted(archive_dir.glob("sessions_*.zip")):
+                with zipfile.ZipFile(bundle) as zf:
+                    for info in zf.infolist():
+                        if is_session_file(info.filename) and info.filename not in exported:
+                            mtime = datetime(*info.date_time).timestamp()
+                            pending[info.filename] = ("archive", str(bundle), info.filename, mtime)
+
+        with os.scandir(self.session_dir) as entries:
+            for entry in entries:
+                if not entry.is_file() or not is_session_file(entry.name) or entry.name in exported:
+                    continue
+                mtime = entry.stat().st_mtime
+                if mtime <= cutoff:
+                    pending[entry.name] = ("live", str(self.session_dir), entry.name, mtime)
+
+        return sorted(pending.values(), key=lambda source: source[2])
+
+    # --- export --------------------------------------------------------
+    def _write_partitions(self, rows: List[Dict], run_id: str) -> Dict[str, str]:
+        """Write rows grouped by start date; returns {session_id: part path}"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = _schema()
+        by_date: Dict[str, List[Dict]] = {}
+        for row in rows:
+            day = row["started_at"].strftime("%Y-%m-%d") if row["started_at"] else "unknown"
+            by_date.setdefault(day, []).append(row)
+
+        written = {}
+        for day, day_rows in sorted(by_date.items()):
+            part = f"date={day}/part-{run_id}.parquet"
+            path = self.dataset_dir / part
+            path.parent.mkdir(parents=True, exist_ok=True)
+            pq.write_table(pa.Table.from_pylist(day_rows, schema=schema), path, compression="zstd")
+            written.update({row["session_id"]: part for row in day_rows})
+        return written
+
+    def run(self) -> Dict:
+        """
+        Export every session not exported by an earlier run.
+
+        Returns:
+            Counts of sessions exported and failed, part files written and
+            orphaned parts removed
+        """
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ImportError("Session export requires pyarrow: pip install pyarrow") from e
+
+        state = self._load_state()
+        orphans = self._remove_orphaned_parts(state)
+        sources = self._pending(state["exported"])
+        if not sources:
+            return {"exported": 0, "failed": 0, "parts": 0, "orphans_removed": orphans}
+
+        rows, failed = [], 0
+        chunksize = max(1, len(sources) // (self.workers * 4))
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            for filename, row, error in pool.map(_export_one, sources, chunksize=chunksize):
+                if row is None:
+                    logger.error(f"Failed to export {filename}: {error}")
+                    failed += 1
+                else:
+                    rows.append(row)
+
+        run_id = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+        written = self._write_partitions(rows, run_id)
+        state["exported"].update(written)
+        state["parts"] = sorted(set(state["parts"]) | set(written.values()))
+        self._save_state(state)
+
+        result = {
+            "exported": len(written),
+            "failed": failed,
+            "parts": len(set(written.values())),
+            "orphans_removed": orphans,
+        }
+        logger.info(f"Session export: {result}")
+        return result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Export sessions to partitioned Parquet")
+    arg_parser.add_argument("--session-dir", type=Path, default=SESSION_DIR)
+    arg_parser.add_argument("--export-dir", type=Path, default=None,
+                            help="Defaults to SESSION_DIR/analytics")
+    arg_parser.add_argument("--workers", type=int, default=None, help="Process pool size")
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    export_dir = args.export_dir or args.session_dir / "analytics"
+    print(f"📦 Exporting sessions from {args.session_dir} to {export_dir}")
+    result = SessionExporter(args.session_dir, export_dir, args.workers).run()
+    print(f"✅ Exported {result['exported']} sessions into {result['parts']} part files"
+          + (f", {result['failed']} failed" if result["failed"] else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+"""
+Session index for the agent's saved conversations.
+
+Keeps one SQLite row per session file in SESSION_DIR so the API server can
+answer "latest session" and paginated, date-filtered listings without
+globbing and stat-ing the whole directory on every request. The index lives
+next to the sessions and is shared by the agent process (which records each
+session as it saves it) and the API server (which also watches the directory
+for files written or removed by anything else).
+"""
+
+import asyncio
+import logging
+import os
+import re
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = ".session_index.sqlite3"
+
+# session_<YYYYmmdd>_<HHMMSS>_<room>.json, written by agent.entrypoint
+SESSION_PATTERN = re.compile(r"^session_(\d{8})_(\d{6})_(.+)\.json$")
+QA_SUFFIX = "_qa.json"
+# Eligibility verdict for a session, written next to it by the agent
+ELIGIBILITY_SUFFIX = "_eligibility.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    filename TEXT PRIMARY KEY,
+    room TEXT,
+    started_at TEXT NOT NULL,       -- ISO 8601 UTC, from the filename
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    has_qa INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS sessions_started ON sessions (started_at, filename);
+"""
+
+
+def is_session_file(name: str) -> bool:
+    """True for conversation files, False for their _qa.json and _eligibility.json companions"""
+    return name.startswith("session_") and name.endswith(".json") \
+        and not name.endswith(QA_SUFFIX) and not name.endswith(ELIGIBILITY_SUFFIX)
+
+
+def qa_filename(filename: str) -> str:
+    return filename[:-len(".json")] + QA_SUFFIX
+
+
+def eligibility_filename(filename: str) -> str:
+    return filename[:-len(".json")] + ELIGIBILITY_SUFFIX
+
+
+def parse_session_filename(filename: str, mtime: float) -> Dict:
+    """
+    Derive room and start time from a session filename.
+
+    Falls back to the file's mtime for names that don't follow the pattern.
+    """
+    match = SESSION_PATTERN.match(filename)
+    if match:
+        date, clock, room = match.groups()
+        started = datetime.strptime(date + clock, "%Y%m%d%H%M%S")
+        return {"room": room, "started_at": started.strftime("%Y-%m-%dT%H:%M:%SZ")}
+    started = datetime.fromtimestamp(mtime, tz=timezone.utc)
+    return {"room": None, "started_at": started.strftime("%Y-%m-%dT%H:%M:%SZ")}
+
+
+class SessionIndex:
+    """
+    SQLite-backed index of session files.
+
+    All lookups are indexed queries: latest() is a single index seek and
+    list_sessions() pages through the (started_at, filename) index.
+    """
+
+    def __init__(self, session_dir: Path, index_path: Optional[Path] = None):
+        """
+        Args:
+            session_dir: Directory holding session_*.json files
+            index_path: SQLite file, defaults to SESSION_DIR/.session_index.sqlite3
+        """
+        self.session_dir = Path(session_dir)
+        self.index_path = Path(index_path) if index_path else self.session_dir / INDEX_FILENAME
+        self.session_dir.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.index_path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _row(self, filename: str) -> Optional[tuple]:
+        path = self.session_dir / filename
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        meta = parse_session_filename(filename, stat.st_mtime)
+        has_qa = (self.session_dir / qa_filename(filename)).exists()
+        return (filename, meta["room"], meta["started_at"], stat.st_size, stat.st_mtime, int(has_qa))
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def record(self, path) -> None:
+        """
+        Add or refresh one session file (or, for a _qa.json, its session).
+
+        Args:
+            path: Path or filename of the file that was written or removed
+        """
+        name = Path(path).name
+        if name.endswith(QA_SUFFIX):
+            name = name[:-len(QA_SUFFIX)] + ".json"
+        if not is_session_file(name):
+            return
+
+        row = self._row(name)
+        with self._connect() as conn:
+            if row is None:
+                conn.execute("DELETE FROM sessions WHERE filename = ?", (name,))
+            else:
+                conn.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?)", row)
+
+    def sync(self) -> int:
+        """
+        Reconcile the index with the directory in one scandir pass.
+
+        Returns:
+            Number of indexed sessions
+        """
+        names = set()
+        qa_names = set()
+        with os.scandir(self.session_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(QA_SUFFIX):
+                    qa_names.add(entry.name)
+                elif is_session_file(entry.name):
+                    names.add(entry.name)
+
+        with self._connect() as conn:
+            known = {row["filename"]: row for row in conn.execute("SELECT filename, size, mtime, has_qa FROM sessions")}
+            stale = [(name,) for name in known if name not in names]
+            fresh = []
+            for name in names:
+                old = known.get(name)
+                try:
+                    stat = (self.session_dir / name).stat()
+                except FileNotFoundError:
+                    continue
+                has_qa = int(qa_filename(name) in qa_names)
+                if old is not None and old["mtime"] == stat.st_mtime and old["size"] == stat.st_size \
+                        and old["has_qa"] == has_qa:
+                    continue
+                meta = parse_session_filename(name, stat.st_mtime)
+                fresh.append((name, meta["room"], meta["started_at"], stat.st_size, stat.st_mtime, has_qa))
+
+            conn.execute("BEGIN")
+            conn.executemany("DELETE FROM sessions WHERE filename = ?", stale)
+            conn.executemany("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?)", fresh)
+            conn.execute("COMMIT")
+        return len(names)
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    def _to_dict(self, row) -> Dict:
+        return {
+            "filename": row["filename"],
+            "path": str(self.session_dir / row["filename"]),
+            "size": row["size"],
+            "room": row["room"],
+            "started_at": row["started_at"],
+            "has_qa": bool(row["has_qa"]),
+        }
+
+    def latest(self) -> Optional[Dict]:
+        """Most recent session, or None if there are none"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM sessions ORDER BY started_at DESC, filename DESC LIMIT 1"
+            ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def get(self, filename: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM sessions WHERE filename = ?", (filename,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list_sessions(self, limit: int = 50, offset: int = 0,
+                      since: Optional[str] = None, until: Optional[str] = None) -> Dict:
+        """
+        Newest-first page of sessions, optionally within a date range.
+
+        Args:
+            limit: Page size
+            offset: Number of sessions to skip
+            since: Inclusive lower bound on started_at (ISO date or datetime)
+            until: Inclusive upper bound on started_at; a bare date covers the whole day
+
+        Returns:
+            {"sessions": [...], "total": matching sessions, "limit", "offset"}
+        """
+        clauses, params = [], []
+        if since:
+            clauses.append("started_at >= ?")
+            params.append(since)
+        if until:
+            clauses.append("started_at <= ?")
+            # "2025-01-31" should include sessions later that day
+            params.append(until + "T23:59:59Z" if len(until) == 10 else until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with self._connect() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM sessions {where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT * FROM sessions {where} ORDER BY started_at DESC, filename DESC LIMIT ? OFFSET ?",
+                (*params, limit, offset)
+            ).fetchall()
+        return {
+            "sessions": [self._to_dict(row) for row in rows],
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+        }
+
+
+# ----------------------------------------------------------------------
+# Directory watcher
+# ----------------------------------------------------------------------
+class SessionWatcher:
+    """
+    Keeps a SessionIndex current while the API server runs.
+
+    Uses watchfiles (installed with uvicorn[standard]) for change events and
+    falls back to polling the directory mtime, which changes whenever a
+    session file is created, renamed or deleted.
+
+    With on_changes, every batch of changed paths is also passed to that
+    coroutine after the index is updated, one batch at a time. The polling
+    fallback then also compares file sizes and mtimes, since appending to a
+    journal doesn't touch the directory mtime.
+    """
+
+    def __init__(self, index: SessionIndex, poll_interval: float = 1.0, on_changes=None):
+        self.index = index
+        self.poll_interval = poll_interval
+        self.on_changes = on_changes
+        self._stop = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        self.index.sync()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._stop.set()
+        if self._task:
+            await self._task
+
+    async def _run(self):
+        try:
+            from watchfiles import awatch
+        except ImportError:
+            await self._poll()
+            return
+
+        try:
+            async for changes in awatch(self.index.session_dir, stop_event=self._stop, recursive=False):
+                paths = {path for _, path in changes}
+                await asyncio.to_thread(self._record_all, paths)
+                await self._notify(paths)
+        except Exception as e:
+            logger.warning(f"Session watcher failed ({e}), falling back to polling")
+            await self._poll()
+
+    def _record_all(self, paths):
+        for path in paths:
+            self.index.record(path)
+
+    async def _notify(self, paths):
+        if self.on_changes is None or not paths:
+            return
+        try:
+            await self.on_changes(paths)
+        except Exception as e:
+            logger.error(f"Session change handler failed: {e}")
+
+    def _snapshot(self) -> Dict[str, tuple]:
+        with os.scandir(self.index.session_dir) as entries:
+            return {entry.path: (entry.stat().st_mtime_ns, entry.stat().st_size)
+                    for entry in entries if entry.is_file()}
+
+    async def _poll(self):
+        last_mtime = None
+        files = await asyncio.to_thread(self._snapshot) if self.on_changes else {}
+        while not self._stop.is_set():
+            try:
+                mtime = os.stat(self.index.session_dir).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if mtime != last_mtime:
+                last_mtime = mtime
+                await asyncio.to_thread(self.index.sync)
+            if self.on_changes is not None:
+                current = await asyncio.to_thread(self._snapshot)
+                changed = {path for path in current.keys() | files.keys() if current.get(path) != files.get(path)}
+                files = current
+                await self._notify(changed)
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,198 @@
+"""
+Append-only session journal.
+
+While a call is running, every turn, answer and fact update is appended to
+SESSION_DIR/<session>.jsonl as one JSON line. Lines are buffered in memory
+and written by a background task off the event loop, so a crashed worker
+loses at most the last flush interval instead of the whole conversation.
+
+When the session ends the journal is compacted into the pretty-printed
+<session>.json that api_server.py and ConversationParser read; journals left
+behind by a crash are compacted by the API server at startup.
+
+Record types:
+    {"type": "start", "started_at": ..., "facts": {...}}
+    {"type": "turn", "role": "user" | "assistant", "text": ...}
+    {"type": "answer", "key": "q1", "answer": ...}
+    {"type": "facts", "update": {field: new value, ...}}
+    {"type": "end", "ended_at": ...}
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_SUFFIX = ".jsonl"
+
+# A journal untouched for this long without a compacted .json belongs to a
+# session whose worker died
+ORPHAN_IDLE_SECONDS = 600
+
+
+class SessionJournal:
+    """
+    Buffered JSONL writer for one session.
+
+    append() never blocks: it queues the line, and a background task writes
+    the buffer every flush_interval seconds, or sooner once max_buffer lines
+    are waiting. Outside an event loop, append() writes synchronously.
+    """
+
+    def __init__(self, path: Path, flush_interval: float = 0.5, max_buffer: int = 64):
+        self.path = Path(path)
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._buffer: List[str] = []
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._task = None
+        self._wake = None
+        self._closing = False
+
+    @property
+    def closed(self) -> bool:
+        return self._closing
+
+    def append(self, record: Dict) -> None:
+        if self._closing:
+            raise RuntimeError(f"Journal {self.path.name} is closed")
+        self._buffer.append(json.dumps(record, ensure_ascii=False) + "\n")
+
+        if self._task is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                self._write(self._take())
+                return
+            self._wake = asyncio.Event()
+            self._task = loop.create_task(self._flusher())
+
+        if len(self._buffer) >= self.max_buffer:
+            self._wake.set()
+
+    def _take(self) -> List[str]:
+        lines, self._buffer = self._buffer, []
+        return lines
+
+    def _write(self, lines: List[str]) -> None:
+        if lines:
+            self._file.write("".join(lines))
+            self._file.flush()
+
+    async def _flusher(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            lines = self._take()
+            if lines:
+                try:
+                    await asyncio.to_thread(self._write, lines)
+                except OSError as e:
+                    logger.error(f"Failed to write session journal {self.path}: {e}")
+
+    async def aclose(self) -> None:
+        """Flush everything still buffered and close the file"""
+        if self._closing:
+            return
+        self._closing = True
+        if self._task is not None:
+            self._wake.set()
+            await self._task
+        lines = self._take()
+        await asyncio.to_thread(self._write, lines)
+        await asyncio.to_thread(self._file.close)
+
+
+def replay_journal(journal_path: Path) -> Dict:
+    """
+    Rebuild the session document from a journal.
+
+    Returns:
+        Dictionary in the session JSON format: started_at, ended_at, turns,
+        questions, extracted_facts
+    """
+    session = {
+        "started_at": None,
+        "ended_at": None,
+        "turns": [],
+        "questions": {},
+        "extracted_facts": {},
+    }
+    with open(journal_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Last line of a crashed session may be cut off
+                continue
+            kind = record.get("type")
+            if kind == "start":
+                session["started_at"] = record.get("started_at")
+                session["extracted_facts"] = record.get("facts", {})
+            elif kind == "turn":
+                session["turns"].append({"role": record["role"], "text": record["text"]})
+            elif kind == "answer":
+                session["questions"][record["key"]] = record["answer"]
+            elif kind == "facts":
+                session["extracted_facts"].update(record.get("update", {}))
+            elif kind == "end":
+                session["ended_at"] = record.get("ended_at")
+    return session
+
+
+def compact_journal(journal_path: Path, output_path: Optional[Path] = None, remove: bool = True) -> Dict:
+    """
+    Write the session JSON read by api_server.py and ConversationParser.
+
+    Args:
+        journal_path: The session's .jsonl journal
+        output_path: Defaults to the journal path with a .json suffix
+        remove: Delete the journal once the JSON is in place
+
+    Returns:
+        The compacted session document
+    """
+    journal_path = Path(journal_path)
+    output_path = Path(output_path) if output_path else journal_path.with_suffix(".json")
+    session = replay_journal(journal_path)
+
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+    tmp_path.write_text(json.dumps(session, indent=2))
+    os.replace(tmp_path, output_path)
+
+    if remove:
+        journal_path.unlink(missing_ok=True)
+    return session
+
+
+def recover_orphaned_journals(session_dir: Path, idle_seconds: float = ORPHAN_IDLE_SECONDS) -> List[Path]:
+    """
+    Compact journals left behind by sessions that never finished.
+
+    Journals modified within idle_seconds are assumed to belong to a live
+    call and are left alone.
+
+    Returns:
+        Paths of the session JSON files written
+    """
+    recovered = []
+    now = time.time()
+    for journal_path in Path(session_dir).glob(f"session_*{JOURNAL_SUFFIX}"):
+        try:
+            if now - journal_path.stat().st_mtime < idle_seconds:
+                continue
+            output_path = journal_path.with_suffix(".json")
+            compact_journal(journal_path, output_path)
+            recovered.append(output_path)
+            logger.info(f"Recovered session from journal: {output_path.name}")
+        except (OSError, KeyError) as e:
+            logger.error(f"Failed to recover journal {journal_path.name}: {e}")
+    return recovered
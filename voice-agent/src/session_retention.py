@@ -0,0 +1,246 @@
+"""
+Retention for SESSION_DIR.
+
+Finished sessions (session_*.json plus their _qa.json and _eligibility.json)
+are moved out of the live directory into compressed, dated zip bundles under
+SESSION_DIR/archive, one new bundle per date per pass
+(sessions_<date>_<run id>.zip):
+
+- sessions older than compress_after_hours are archived
+- if the live directory still exceeds max_files or max_total_mb, the oldest
+  sessions are archived early (but never ones younger than min_age_seconds,
+  which may still be getting their Q&A written)
+- if the archive exceeds max_archive_mb, the oldest bundles are deleted
+
+A bundle is written to a temporary file, synced and renamed into place, and
+the sessions in it are only deleted after that, so a crash or full disk
+never damages what was archived before. Journals (.jsonl) of calls still in
+progress are never touched. The API server runs this periodically in a
+worker thread, so it never blocks the agent or request handling.
+"""
+
+import asyncio
+import logging
+import os
+import time
+import zipfile
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .session_index import (
+    ELIGIBILITY_SUFFIX, QA_SUFFIX, SESSION_PATTERN, SessionIndex, eligibility_filename,
+    is_session_file, parse_session_filename, qa_filename,
+)
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_PREFIX = "sessions_"
+
+
+@dataclass
+class RetentionPolicy:
+    compress_after_hours: float = 24
+    max_files: int = 5000
+    max_total_mb: float = 500
+    max_archive_mb: float = 2000
+    min_age_seconds: float = 300
+    interval_seconds: float = 600
+
+    @classmethod
+    def from_env(cls) -> "RetentionPolicy":
+        return cls(
+            compress_after_hours=float(os.getenv("SESSION_COMPRESS_AFTER_HOURS", cls.compress_after_hours)),
+            max_files=int(os.getenv("SESSION_MAX_FILES", cls.max_files)),
+            max_total_mb=float(os.getenv("SESSION_MAX_TOTAL_MB", cls.max_total_mb)),
+            max_archive_mb=float(os.getenv("SESSION_ARCHIVE_MAX_MB", cls.max_archive_mb)),
+            interval_seconds=float(os.getenv("SESSION_RETENTION_INTERVAL_SECONDS", cls.interval_seconds)),
+        )
+
+
+class SessionRetention:
+    """Archives and evicts session files according to a RetentionPolicy"""
+
+    def __init__(self, session_dir: Path, policy: RetentionPolicy,
+                 index: Optional[SessionIndex] = None, archive_dir: Optional[Path] = None):
+        self.session_dir = Path(session_dir)
+        self.archive_dir = Path(archive_dir) if archive_dir else self.session_dir / "archive"
+        self.policy = policy
+        self.index = index
+        self._task = None
+        self._stop = None
+
+    # ------------------------------------------------------------------
+    # Archive access
+    # ------------------------------------------------------------------
+    def bundles_for(self, filename: str) -> List[Path]:
+        """
+        Bundles that may hold a session, newest first.
+
+        Sessions are bundled by the start date in their name; a name without
+        one was bundled by its mtime, which is gone once archived, so every
+        bundle is searched.
+        """
+        if not self.archive_dir.exists():
+            return []
+        if SESSION_PATTERN.match(filename):
+            date = parse_session_filename(filename, 0)["started_at"][:10]
+            pattern = f"{BUNDLE_PREFIX}{date}*.zip"
+        else:
+            pattern = f"{BUNDLE_PREFIX}*.zip"
+        return sorted(self.archive_dir.glob(pattern), reverse=True)
+
+    def read_archived(self, filename: str) -> Optional[bytes]:
+        """Contents of an archived session, _qa.json or _eligibility.json file, or None if not archived"""
+        session_name = filename
+        for suffix in (QA_SUFFIX, ELIGIBILITY_SUFFIX):
+            if filename.endswith(suffix):
+                session_name = filename[:-len(suffix)] + ".json"
+        for bundle in self.bundles_for(session_name):
+            try:
+                with zipfile.ZipFile(bundle) as zf:
+                    return zf.read(filename)
+            except KeyError:
+                continue
+            except (OSError, zipfile.BadZipFile) as e:
+                logger.warning(f"Skipping unreadable bundle {bundle.name}: {e}")
+        return None
+
+    # ------------------------------------------------------------------
+    # Retention pass
+    # ------------------------------------------------------------------
+    def _live_sessions(self) -> List[Dict]:
+        """Finished sessions in the live directory, oldest first"""
+        sessions = []
+        with os.scandir(self.session_dir) as entries:
+            names = {entry.name: entry for entry in entries if entry.is_file()}
+        for name, entry in names.items():
+            if not is_session_file(name):
+                continue
+            stat = entry.stat()
+            files = [name]
+            size = stat.st_size
+            for companion in (qa_filename(name), eligibility_filename(name)):
+                companion_entry = names.get(companion)
+                if companion_entry is not None:
+                    files.append(companion)
+                    size += companion_entry.stat().st_size
+            sessions.append({"filename": name, "files": files, "size": size, "mtime": stat.st_mtime})
+        sessions.sort(key=lambda s: (s["mtime"], s["filename"]))
+        return sessions
+
+    def _archive(self, sessions: List[Dict], run_id: str) -> None:
+        """Move sessions into new bundles, one per start date"""
+        by_date: Dict[str, List[Dict]] = {}
+        for session in sessions:
+            date = parse_session_filename(session["filename"], session["mtime"])["started_at"][:10]
+            by_date.setdefault(date, []).append(session)
+
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        for date, day_sessions in sorted(by_date.items()):
+            bundle = self.archive_dir / f"{BUNDLE_PREFIX}{date}_{run_id}.zip"
+            tmp_path = bundle.with_name(bundle.name + ".tmp")
+            try:
+                with open(tmp_path, "wb") as f:
+                    with zipfile.ZipFile(f, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+                        for session in day_sessions:
+                            for name in session["files"]:
+                                zf.write(self.session_dir / name, arcname=name)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, bundle)
+            except BaseException:
+                tmp_path.unlink(missing_ok=True)
+                raise
+
+            # Only delete once the bundle is complete and in place
+            for session in day_sessions:
+                for name in session["files"]:
+                    (self.session_dir / name).unlink(missing_ok=True)
+                if self.index is not None:
+                    self.index.record(session["filename"])
+
+    def _remove_partial_bundles(self) -> None:
+        """Temp files of a pass that died mid-write; their sessions are still live"""
+        if self.archive_dir.exists():
+            for tmp_path in self.archive_dir.glob(f"{BUNDLE_PREFIX}*.zip.tmp"):
+                tmp_path.unlink(missing_ok=True)
+
+    def _trim_archive(self) -> int:
+        if not self.archive_dir.exists():
+            return 0
+        bundles = sorted(self.archive_dir.glob(f"{BUNDLE_PREFIX}*.zip"))
+        total = sum(bundle.stat().st_size for bundle in bundles)
+        limit = self.policy.max_archive_mb * 1024 * 1024
+        deleted = 0
+        # Bundle names sort by date, then run, so this drops the oldest first
+        while bundles and total > limit:
+            bundle = bundles.pop(0)
+            total -= bundle.stat().st_size
+            bundle.unlink()
+            deleted += 1
+        return deleted
+
+    def run_once(self) -> Dict:
+        """
+        One retention pass.
+
+        Returns:
+            Counts of sessions archived by age and by cap, and bundles deleted
+        """
+        now = time.time()
+        self._remove_partial_bundles()
+        sessions = self._live_sessions()
+
+        cutoff = now - self.policy.compress_after_hours * 3600
+        by_age = [session for session in sessions if session["mtime"] < cutoff]
+        remaining = [session for session in sessions if session["mtime"] >= cutoff]
+
+        total_files = sum(len(s["files"]) for s in remaining)
+        total_size = sum(s["size"] for s in remaining)
+        size_limit = self.policy.max_total_mb * 1024 * 1024
+        by_cap = []
+        for session in remaining:
+            over_cap = total_files > self.policy.max_files or total_size > size_limit
+            if not over_cap or now - session["mtime"] < self.policy.min_age_seconds:
+                break
+            by_cap.append(session)
+            total_files -= len(session["files"])
+            total_size -= session["size"]
+
+        if by_age or by_cap:
+            self._archive(by_age + by_cap, datetime.now().strftime("%Y%m%dT%H%M%S%f"))
+
+        bundles_deleted = self._trim_archive()
+        result = {
+            "archived_by_age": len(by_age),
+            "archived_by_cap": len(by_cap),
+            "bundles_deleted": bundles_deleted,
+        }
+        if by_age or by_cap or bundles_deleted:
+            logger.info(f"Session retention: {result}")
+        return result
+
+    # ------------------------------------------------------------------
+    # Background loop
+    # ------------------------------------------------------------------
+    def start(self):
+        self._stop = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._stop.set()
+            await self._task
+
+    async def _run(self):
+        while not self._stop.is_set():
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                logger.error(f"Session retention pass failed: {e}")
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.policy.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
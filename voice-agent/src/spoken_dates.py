@@ -0,0 +1,430 @@
+"""
+Spoken-date parsing for transcribed answers.
+
+Turns what callers actually say into YYYY-MM-DD:
+
+    "May 14th 2021", "may fourteenth twenty twenty one",
+    "the tenth of March two thousand and sixteen", "nineteen oh five",
+    "January of 2015", "5/14/21", "2021-05-14", "three years ago", ...
+
+The text is tokenized once with a compiled pattern, and month names and
+number words are looked up as whole tokens (no substring tests). A small
+grammar then reads the tokens:
+
+    date  := MONTH DAY [YEAR] | DAY MONTH [YEAR] | MONTH YEAR [DAY]
+           | YEAR MONTH | YEAR
+    day   := 1-31 as digits, cardinal or ordinal words ("twenty first")
+    year  := 4 digits | 'NN | two thousand [and] N | CENTURY hundred [and] N
+           | CENTURY oh N | CENTURY NN          (CENTURY = nineteen | twenty)
+
+plus numeric forms (ISO and US month-first) and relative phrases ("today",
+"yesterday", "last year", "N days/weeks/months/years ago"). Years are read
+first, so a day is never taken from the end of one ("twenty twelve in
+april" is April 2012). A missing day means the 1st of the month and a
+missing month means January; a missing year means the most recent such date
+that isn't in the future. A month word only counts when a day or year sits
+next to it ("I may have..." is not May). Vague amounts ("a couple of years
+ago") give None. Anything else falls back to
+dateutil when it is installed. Results are memoized per (text, reference day).
+
+Number phrases are read greedily and never re-read shorter, so a date that
+doesn't exist ("february twenty ninth 2023") gives None rather than some
+other, valid date: for eligibility a wrong conviction date is worse than
+none.
+"""
+
+import re
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Iterable, List, Optional
+
+try:
+    from dateutil import parser as dateutil_parser
+except ImportError:  # optional - only used for forms the grammar doesn't cover
+    dateutil_parser = None
+
+MONTHS = {
+    "january": 1, "jan": 1,
+    "february": 2, "feb": 2,
+    "march": 3, "mar": 3,
+    "april": 4, "apr": 4,
+    "may": 5,
+    "june": 6, "jun": 6,
+    "july": 7, "jul": 7,
+    "august": 8, "aug": 8,
+    "september": 9, "sep": 9, "sept": 9,
+    "october": 10, "oct": 10,
+    "november": 11, "nov": 11,
+    "december": 12, "dec": 12,
+}
+
+UNITS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9,
+}
+TEENS = {
+    "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14,
+    "fifteen": 15, "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19,
+}
+TENS = {
+    "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50,
+    "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90,
+}
+ORDINAL_UNITS = {
+    "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5,
+    "sixth": 6, "seventh": 7, "eighth": 8, "ninth": 9,
+}
+ORDINAL_TEENS = {
+    "tenth": 10, "eleventh": 11, "twelfth": 12, "thirteenth": 13, "fourteenth": 14,
+    "fifteenth": 15, "sixteenth": 16, "seventeenth": 17, "eighteenth": 18, "nineteenth": 19,
+}
+ORDINAL_TENS = {"twentieth": 20, "thirtieth": 30}
+ZEROS = {"oh", "o", "zero"}
+CENTURIES = {"nineteen": 19, "twenty": 20}
+
+# A number before these is a count, not a year said on its own ("two thousand dollars")
+COUNTED = {"dollars", "bucks", "people", "times", "hours", "days", "weeks", "months", "years", "miles"}
+
+# Words that carry nothing for the grammar. "the" is kept: it only ever
+# introduces a day, and no number phrase runs across it ("nineteen eighty the
+# sixth" is not 1986)
+FILLER = {"of", "on", "in", "and", "at", "around", "about", "it", "was", "i", "think", "um", "uh", "like"}
+
+TOKEN_RE = re.compile(r"'\d{2}\b|\d+(?:st|nd|rd|th)?|[a-z]+")
+DIGITS_RE = re.compile(r"(\d+)(?:st|nd|rd|th)?$")
+ISO_RE = re.compile(r"\b(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})\b")
+US_RE = re.compile(r"\b(\d{1,2})[-/.](\d{1,2})[-/.](\d{4}|\d{2})\b")
+AGO_RE = re.compile(r"\b([a-z\d]+(?: [a-z]+)?) (day|week|month|year)s? ago\b")
+LAST_RE = re.compile(r"\b(today|yesterday|last (?:week|month|year))\b")
+
+
+# ----------------------------------------------------------------------
+# Number phrases
+#
+# Each reader takes the longest phrase it can ("twenty ninth", not
+# "twenty"). A shorter reading is never retried, so a date that doesn't
+# exist is rejected instead of being re-read as a different, valid one.
+# ----------------------------------------------------------------------
+def _small_number(tokens: List[str], i: int, ordinals: bool = True) -> Optional[tuple]:
+    """
+    The 0-99 number starting at tokens[i]
+
+    Returns:
+        (value, index after the phrase), or None
+    """
+    if i >= len(tokens):
+        return None
+    token = tokens[i]
+
+    m = DIGITS_RE.match(token)
+    if m:
+        digits = m.group(1)
+        return (int(digits), i + 1) if len(digits) <= 2 else None
+
+    if token in TENS:
+        following = tokens[i + 1] if i + 1 < len(tokens) else None
+        # "june twenty two thousand ten": the "two" starts the year
+        starts_year = i + 2 < len(tokens) and tokens[i + 2] == "thousand"
+        if following in UNITS and not starts_year:
+            return TENS[token] + UNITS[following], i + 2
+        if following in ORDINAL_UNITS:
+            # "two thousand the twenty fifth": the "twenty" belongs to the day
+            return (TENS[token] + ORDINAL_UNITS[following], i + 2) if ordinals else None
+        return TENS[token], i + 1
+
+    for table in (UNITS, TEENS) + ((ORDINAL_UNITS, ORDINAL_TEENS, ORDINAL_TENS) if ordinals else ()):
+        if token in table:
+            return table[token], i + 1
+    return None
+
+
+def _day(tokens: List[str], i: int) -> Optional[tuple]:
+    if i < len(tokens) and tokens[i] == "the":
+        i += 1
+    reading = _small_number(tokens, i)
+    return reading if reading and 1 <= reading[0] <= 31 else None
+
+
+def _two_digit_year(value: int, today: date) -> int:
+    # '21 is 2021 unless that is in the future, then 1921
+    year = 2000 + value
+    return year if year <= today.year else 1900 + value
+
+
+def _year(tokens: List[str], i: int, today: date) -> Optional[tuple]:
+    """The year starting at tokens[i] as (year, index after it), or None"""
+    if i >= len(tokens):
+        return None
+    token = tokens[i]
+    reading = None
+
+    if token.isdigit() and len(token) == 4:
+        reading = (int(token), i + 1)
+    elif token.startswith("'"):
+        reading = (_two_digit_year(int(token[1:]), today), i + 1)
+
+    # two thousand [and] N
+    elif token == "two" and i + 1 < len(tokens) and tokens[i + 1] == "thousand":
+        number = _small_number(tokens, i + 2, ordinals=False)
+        reading = (2000 + number[0], number[1]) if number and number[0] >= 1 else (2000, i + 2)
+
+    elif token in CENTURIES:
+        century = CENTURIES[token] * 100
+        following = tokens[i + 1] if i + 1 < len(tokens) else None
+        if following == "hundred":
+            number = _small_number(tokens, i + 2, ordinals=False)
+            reading = (century + number[0], number[1]) if number else (century, i + 2)
+        elif following in ZEROS:
+            if i + 2 < len(tokens) and tokens[i + 2] in UNITS:
+                reading = (century + UNITS[tokens[i + 2]], i + 3)
+        else:
+            number = _small_number(tokens, i + 1, ordinals=False)
+            if number and 10 <= number[0] <= 99:
+                reading = (century + number[0], number[1])
+
+    return reading if reading and 1900 <= reading[0] <= today.year + 1 else None
+
+
+# ----------------------------------------------------------------------
+# Grammar
+# ----------------------------------------------------------------------
+class NoSuchDate(ValueError):
+    """A date was said, but it doesn't exist ("february thirtieth") or is too vague ("a few years ago")"""
+
+
+def _make_date(year: int, month: int, day: int) -> Optional[date]:
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _existing_date(year: int, month: int, day: int) -> date:
+    found = _make_date(year, month, day)
+    if found is None:
+        raise NoSuchDate(f"{year:04d}-{month:02d}-{day:02d}")
+    return found
+
+
+def _most_recent(month: int, day: int, today: date) -> date:
+    """The latest month/day on or before today"""
+    for year in (today.year, today.year - 1):
+        candidate = _make_date(year, month, day)
+        if candidate and candidate <= today:
+            return candidate
+    raise NoSuchDate(f"--{month:02d}-{day:02d}")
+
+
+def _year_spans(tokens: List[str], today: date) -> List[tuple]:
+    """
+    Every year said, read left to right without overlaps
+
+    Returns:
+        [(start, end, year)] token ranges
+    """
+    spans = []
+    i = 0
+    while i < len(tokens):
+        reading = _year(tokens, i, today)
+        if reading:
+            spans.append((i, reading[1], reading[0]))
+            i = reading[1]
+        else:
+            i += 1
+    return spans
+
+
+def _in_year(spans: List[tuple], used: range) -> bool:
+    return any(start < used.stop and used.start < end for start, end, _ in spans)
+
+
+def _find_year(spans: List[tuple], used: range) -> Optional[int]:
+    """A year anywhere outside the tokens already used for month and day"""
+    for start, end, year in spans:
+        if not (start < used.stop and used.start < end):
+            return year
+    return None
+
+
+def _day_before(tokens: List[str], month_at: int, spans: List[tuple]) -> Optional[tuple]:
+    """
+    A day ending right before the month ("the twenty first of may"), as
+    (day, start); never the end of a year ("twenty twelve in april")
+    """
+    for start in (month_at - 2, month_at - 1):
+        if start >= 0 and not _in_year(spans, range(start, month_at)):
+            reading = _small_number(tokens, start)
+            if reading and reading[1] == month_at:
+                # "nineteen eighty sixth of march" is not the 6th
+                return (reading[0], start) if 1 <= reading[0] <= 31 else None
+    return None
+
+
+def _parse_month(tokens: List[str], month_at: int, spans: List[tuple], today: date) -> Optional[date]:
+    """
+    The date around the month word at tokens[month_at]
+
+    Returns None when no day or year sits next to it ("I may have..."), so
+    it isn't taken for a month.
+
+    Raises:
+        NoSuchDate: The day and year that were said don't make a date
+    """
+    month = MONTHS[tokens[month_at]]
+    day_after = _day(tokens, month_at + 1)
+    year_after = _year(tokens, month_at + 1, today)
+    day_before = _day_before(tokens, month_at, spans)
+
+    # MONTH DAY YEAR
+    if day_after:
+        year = _year(tokens, day_after[1], today)
+        if year:
+            return _existing_date(year[0], month, day_after[0])
+
+    if year_after:
+        # DAY MONTH YEAR ("the fourteenth of may ...")
+        if day_before:
+            return _existing_date(year_after[0], month, day_before[0])
+        # MONTH YEAR DAY ("june 2015 the fifteenth")
+        day = _day(tokens, year_after[1])
+        if day:
+            return _existing_date(year_after[0], month, day[0])
+        # MONTH YEAR
+        return date(year_after[0], month, 1)
+
+    # MONTH DAY / DAY MONTH with the year elsewhere, or not said at all
+    if day_after:
+        day, used = day_after[0], range(month_at, day_after[1])
+    elif day_before:
+        day, used = day_before[0], range(day_before[1], month_at + 1)
+    else:
+        # YEAR MONTH ("twenty twelve in april")
+        year_before = [year for _, end, year in spans if end == month_at]
+        return date(year_before[0], month, 1) if year_before else None
+    year = _find_year(spans, used)
+    return _existing_date(year, month, day) if year else _most_recent(month, day, today)
+
+
+def _parse_tokens(tokens: List[str], spans: List[tuple], today: date) -> Optional[date]:
+    for month_at, token in enumerate(tokens):
+        if token in MONTHS:
+            found = _parse_month(tokens, month_at, spans, today)
+            if found:
+                return found
+    return None
+
+
+def _parse_year(tokens: List[str], spans: List[tuple]) -> Optional[date]:
+    """A year said on its own ("it was in 2019"), as its first day; None if several were"""
+    years = {year for _, end, year in spans if end == len(tokens) or tokens[end] not in COUNTED}
+    return date(years.pop(), 1, 1) if len(years) == 1 and len(spans) == 1 else None
+
+
+def _parse_numeric(text: str, today: date) -> Optional[date]:
+    m = ISO_RE.search(text)
+    if m:
+        return _make_date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+
+    m = US_RE.search(text)
+    if m:
+        first, second, year = int(m.group(1)), int(m.group(2)), m.group(3)
+        year = int(year) if len(year) == 4 else _two_digit_year(int(year), today)
+        # Month first, unless that can't be a month
+        if first > 12 >= second:
+            first, second = second, first
+        return _make_date(year, first, second)
+    return None
+
+
+def _shift_months(day: date, months: int) -> date:
+    total = day.year * 12 + day.month - 1 - months
+    year, month = divmod(total, 12)
+    for d in (day.day, 30, 29, 28):
+        found = _make_date(year, month + 1, d)
+        if found:
+            return found
+
+
+def _parse_relative(text: str, tokens: List[str], today: date) -> Optional[date]:
+    m = LAST_RE.search(text)
+    if m:
+        phrase = m.group(1)
+        if phrase == "today":
+            return today
+        if phrase == "yesterday":
+            return today - timedelta(days=1)
+        unit = phrase.split()[1]
+        return {"week": today - timedelta(weeks=1),
+                "month": _shift_months(today, 1),
+                "year": _shift_months(today, 12)}[unit]
+
+    m = AGO_RE.search(text)
+    if m:
+        amount_tokens = TOKEN_RE.findall(m.group(1))
+        reading = _small_number(amount_tokens, 0, ordinals=False)
+        # "... in two years ago" - the number is the last word before the unit
+        if not reading or reading[1] != len(amount_tokens):
+            reading = _small_number(amount_tokens, len(amount_tokens) - 1, ordinals=False)
+        if reading:
+            amount = reading[0]
+        elif amount_tokens[-1] in ("a", "an"):
+            # "a year ago", but not "a couple" / "a few" / "several" years ago
+            amount = 1
+        else:
+            raise NoSuchDate(f"vague amount: {m.group(0)}")
+        unit = m.group(2)
+        if unit == "day":
+            return today - timedelta(days=amount)
+        if unit == "week":
+            return today - timedelta(weeks=amount)
+        return _shift_months(today, amount if unit == "month" else 12 * amount)
+    return None
+
+
+@lru_cache(maxsize=8192)
+def _parse(text: str, today: date) -> Optional[date]:
+    normalized = re.sub(r"(?<=[a-z])-(?=[a-z])", " ", text)
+    found = _parse_numeric(normalized, today)
+    if found:
+        return found
+
+    tokens = [token for token in TOKEN_RE.findall(normalized) if token not in FILLER]
+    spans = _year_spans(tokens, today)
+    try:
+        found = _parse_tokens(tokens, spans, today) or _parse_relative(normalized, tokens, today)
+    except NoSuchDate:
+        # A wrong date is worse than none; don't let dateutil guess either
+        return None
+    found = found or _parse_year(tokens, spans)
+    if found:
+        return found
+
+    if dateutil_parser is not None:
+        try:
+            return dateutil_parser.parse(normalized).date()
+        except (ValueError, OverflowError):
+            pass
+    return None
+
+
+def parse_spoken_date(text: str, today: date = None) -> Optional[str]:
+    """
+    Parse a transcribed date.
+
+    Args:
+        text: What the user said
+        today: Reference day for relative phrases and missing years
+
+    Returns:
+        "YYYY-MM-DD", or None if no date could be read
+    """
+    if not text:
+        return None
+    found = _parse(text.lower().strip(), today or date.today())
+    return found.isoformat() if found else None
+
+
+def parse_spoken_dates(texts: Iterable[str], today: date = None) -> List[Optional[str]]:
+    """parse_spoken_date over many answers; repeated answers are parsed once"""
+    today = today or date.today()
+    return [parse_spoken_date(text, today) for text in texts]
@@ -0,0 +1,34 @@
+import pytest
+
+from src.answer_classifier import (
+    CONFIDENCE, CONFLICT_CONFIDENCE, UNKNOWN, AnswerLabel, classify_answer, classify_answers,
+)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Yes", AnswerLabel("yes", CONFIDENCE["yes_strong"])),
+    ("that's correct", AnswerLabel("yes", CONFIDENCE["yes_weak"])),
+    ("Nope.", AnswerLabel("no", CONFIDENCE["negation"])),
+    ("I never did", AnswerLabel("no", CONFIDENCE["no_weak"])),
+    # An explicit negation outranks everything else
+    ("no, yes I mean", AnswerLabel("no", CONFLICT_CONFIDENCE)),
+    ("yeah, not sure", AnswerLabel("yes", CONFLICT_CONFIDENCE)),
+    # Cues only count as whole words
+    ("notable", UNKNOWN),
+    ("I'm not really nowhere", AnswerLabel("no", CONFIDENCE["no_weak"])),
+    ("", UNKNOWN),
+    (None, UNKNOWN),
+])
+def test_classify_answer(text, expected):
+    assert classify_answer(text) == expected
+
+
+def test_label_value_is_true_only_for_yes():
+    assert classify_answer("sure").value is True
+    assert classify_answer("no").value is False
+    assert UNKNOWN.value is False
+
+
+def test_classify_answers_matches_one_at_a_time():
+    texts = ["Yes", None, "nah", "I do", "", "right, but never", "maybe", "no\nyes"]
+    assert classify_answers(texts) == [classify_answer(text) for text in texts]
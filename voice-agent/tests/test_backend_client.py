@@ -0,0 +1,31 @@
+import asyncio
+
+from src.backend_client import BackendClient
+
+# Nothing listens here, so every push fails and waits out its retry backoff
+UNREACHABLE = "http://127.0.0.1:9"
+
+
+def test_drain_times_out_with_pushes_still_pending():
+    async def run():
+        client = BackendClient(UNREACHABLE, max_attempts=2, backoff=30)
+        client.submit("/voice-sessions", {"session_id": "a"})
+        drained = await client.drain(0.2)
+        pending = client.pending
+        await client.aclose()
+        return drained, pending, client.pending
+
+    assert asyncio.run(run()) == (False, 1, 0)
+
+
+def test_drain_returns_once_pushes_are_settled():
+    async def run():
+        client = BackendClient(UNREACHABLE, max_attempts=1)
+        done = client.submit("/voice-sessions", {"session_id": "a"})
+        drained = await client.drain(10)
+        result = await done
+        await client.aclose()
+        return drained, client.pending, result
+
+    assert asyncio.run(run()) == (True, 0, None)
+    assert asyncio.run(BackendClient(UNREACHABLE).drain(0)) is True
@@ -0,0 +1,95 @@
+import json
+import os
+import time
+import zipfile
+from datetime import datetime, timezone
+
+import pytest
+
+from src.session_export import SessionExporter, session_row
+
+SESSION = {
+    "started_at": "2025-01-01T10:00:00Z",
+    "ended_at": "2025-01-01T10:05:00Z",
+    "turns": [
+        {"role": "assistant", "text": "What type of conviction?"},
+        {"role": "user", "text": "misdemeanor"},
+        {"role": "assistant", "text": "When?"},
+        {"role": "user", "text": "May 14th 2021"},
+        {"role": "assistant", "text": "Did you complete probation?"},
+        {"role": "user", "text": "yes"},
+    ],
+    "extracted_facts": {"state": "CA", "charges": ["dui"], "case_numbers": [], "arrest_years": [2020]},
+}
+
+
+def write_session(session_dir, name, session=SESSION, eligibility=None, age_seconds=3600):
+    path = session_dir / name
+    path.write_text(json.dumps(session))
+    if eligibility is not None:
+        (session_dir / (name[:-len(".json")] + "_eligibility.json")).write_text(json.dumps(eligibility))
+    mtime = time.time() - age_seconds
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_session_row_flattens_answers_facts_and_verdict():
+    row = session_row("session_20250101_100000_room.json", SESSION, {"eligible": True, "confidence": 0.8}, 0)
+    assert row["room"] == "room"
+    assert row["started_at"] == datetime(2025, 1, 1, 10, tzinfo=timezone.utc)
+    assert row["duration_seconds"] == 300
+    assert (row["turns"], row["user_turns"], row["assistant_turns"]) == (6, 3, 3)
+    assert row["questions_answered"] == 3
+    assert row["completed"] is False
+    assert row["last_question"] == "terms_of_service_completed"
+    assert row["conviction_date"] == "2021-05-14"
+    assert row["terms_of_service_completed"] is True
+    assert row["other_convictions"] is None
+    assert (row["state"], row["charges"], row["arrest_years"]) == ("CA", ["dui"], [2020])
+    assert (row["eligible"], row["eligibility_confidence"], row["eligibility_checked"]) == (True, 0.8, True)
+
+
+def test_session_row_without_verdict_or_timestamps():
+    row = session_row("session_20250101_100000_room.json", {"turns": []}, None, 0)
+    assert row["started_at"] == datetime(2025, 1, 1, 10, tzinfo=timezone.utc)
+    assert row["ended_at"] is None
+    assert row["duration_seconds"] is None
+    assert row["eligibility_checked"] is False
+
+
+def test_run_exports_live_and_archived_sessions_once(tmp_path):
+    pytest.importorskip("pyarrow")
+    import pyarrow.dataset as ds
+
+    session_dir = tmp_path / "sessions"
+    session_dir.mkdir()
+    write_session(session_dir, "session_20250101_100000_a.json", eligibility={"eligible": False})
+    write_session(session_dir, "session_20250102_100000_fresh.json", age_seconds=0)
+    (session_dir / "archive").mkdir()
+    with zipfile.ZipFile(session_dir / "archive" / "sessions_2024-12-31_1.zip", "w") as zf:
+        zf.writestr("session_20241231_100000_b.json", json.dumps({**SESSION, "started_at": "2024-12-31T10:00:00Z"}))
+
+    exporter = SessionExporter(session_dir, tmp_path / "export", workers=1)
+    assert exporter.run() == {"exported": 2, "failed": 0, "parts": 2, "orphans_removed": 0}
+    assert exporter.run()["exported"] == 0
+
+    table = ds.dataset(tmp_path / "export" / "sessions", partitioning="hive").to_table()
+    assert sorted(table.column("session_id").to_pylist()) == [
+        "session_20241231_100000_b.json", "session_20250101_100000_a.json",
+    ]
+
+
+def test_run_removes_parts_left_by_a_crashed_run(tmp_path):
+    pytest.importorskip("pyarrow")
+
+    session_dir = tmp_path / "sessions"
+    session_dir.mkdir()
+    write_session(session_dir, "session_20250101_100000_a.json")
+    orphan = tmp_path / "export" / "sessions" / "date=2025-01-01" / "part-crashed.parquet"
+    orphan.parent.mkdir(parents=True)
+    orphan.write_bytes(b"PAR1")
+
+    result = SessionExporter(session_dir, tmp_path / "export", workers=1).run()
+    assert result["orphans_removed"] == 1
+    assert result["exported"] == 1
+    assert not orphan.exists()
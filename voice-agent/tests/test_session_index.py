@@ -0,0 +1,75 @@
+import os
+
+from src.session_index import SessionIndex, is_session_file, parse_session_filename
+
+
+def write_session(session_dir, name, body="{}", mtime=None):
+    path = session_dir / name
+    path.write_text(body)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_is_session_file_skips_companions():
+    assert is_session_file("session_20250101_120000_room.json")
+    assert not is_session_file("session_20250101_120000_room_qa.json")
+    assert not is_session_file("session_20250101_120000_room_eligibility.json")
+    assert not is_session_file("notes.json")
+
+
+def test_parse_session_filename_falls_back_to_mtime():
+    assert parse_session_filename("session_20250102_030405_room-a.json", 0) == {
+        "room": "room-a", "started_at": "2025-01-02T03:04:05Z",
+    }
+    assert parse_session_filename("session_manual.json", 86400) == {
+        "room": None, "started_at": "1970-01-02T00:00:00Z",
+    }
+
+
+def test_sync_reconciles_directory(tmp_path):
+    write_session(tmp_path, "session_20250101_100000_a.json")
+    write_session(tmp_path, "session_20250102_100000_b.json")
+    write_session(tmp_path, "session_20250102_100000_b_qa.json")
+    index = SessionIndex(tmp_path)
+
+    assert index.sync() == 2
+    latest = index.latest()
+    assert latest["filename"] == "session_20250102_100000_b.json"
+    assert latest["has_qa"] is True
+    assert index.get("session_20250101_100000_a.json")["has_qa"] is False
+
+    (tmp_path / "session_20250102_100000_b.json").unlink()
+    assert index.sync() == 1
+    assert index.latest()["filename"] == "session_20250101_100000_a.json"
+
+
+def test_record_follows_qa_file_to_its_session(tmp_path):
+    session = write_session(tmp_path, "session_20250101_100000_a.json")
+    index = SessionIndex(tmp_path)
+    index.record(session)
+    assert index.get(session.name)["has_qa"] is False
+
+    qa = write_session(tmp_path, "session_20250101_100000_a_qa.json")
+    index.record(qa)
+    assert index.get(session.name)["has_qa"] is True
+
+    session.unlink()
+    index.record(session)
+    assert index.get(session.name) is None
+
+
+def test_list_sessions_pages_newest_first_within_range(tmp_path):
+    for day in range(1, 6):
+        write_session(tmp_path, f"session_202501{day:02d}_120000_r{day}.json")
+    index = SessionIndex(tmp_path)
+    index.sync()
+
+    page = index.list_sessions(limit=2, offset=1)
+    assert page["total"] == 5
+    assert [s["room"] for s in page["sessions"]] == ["r4", "r3"]
+
+    # A bare "until" date covers that whole day
+    ranged = index.list_sessions(since="2025-01-02", until="2025-01-04")
+    assert ranged["total"] == 3
+    assert [s["room"] for s in ranged["sessions"]] == ["r4", "r3", "r2"]
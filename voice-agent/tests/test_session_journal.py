@@ -0,0 +1,75 @@
+import asyncio
+import json
+import os
+import time
+
+from src.session_journal import (
+    SessionJournal, compact_journal, recover_orphaned_journals, replay_journal,
+)
+
+
+def write_journal(path, records, tail=""):
+    path.write_text("".join(json.dumps(r) + "\n" for r in records) + tail)
+    return path
+
+
+RECORDS = [
+    {"type": "start", "started_at": "2025-01-01T10:00:00Z", "facts": {"state": None, "charges": []}},
+    {"type": "turn", "role": "assistant", "text": "Hi"},
+    {"type": "turn", "role": "user", "text": "I'm in CA"},
+    {"type": "facts", "update": {"state": "CA"}},
+    {"type": "answer", "key": "q1", "answer": "yes"},
+    {"type": "end", "ended_at": "2025-01-01T10:05:00Z"},
+]
+
+
+def test_replay_rebuilds_session_and_skips_cut_off_line(tmp_path):
+    path = write_journal(tmp_path / "session_x.jsonl", RECORDS, tail='{"type": "turn", "ro')
+    session = replay_journal(path)
+    assert session == {
+        "started_at": "2025-01-01T10:00:00Z",
+        "ended_at": "2025-01-01T10:05:00Z",
+        "turns": [{"role": "assistant", "text": "Hi"}, {"role": "user", "text": "I'm in CA"}],
+        "questions": {"q1": "yes"},
+        "extracted_facts": {"state": "CA", "charges": []},
+    }
+
+
+def test_compact_writes_json_and_removes_journal(tmp_path):
+    path = write_journal(tmp_path / "session_x.jsonl", RECORDS)
+    session = compact_journal(path)
+    assert not path.exists()
+    assert json.loads((tmp_path / "session_x.json").read_text()) == session
+
+
+def test_append_outside_event_loop_writes_immediately(tmp_path):
+    path = tmp_path / "session_x.jsonl"
+    journal = SessionJournal(path)
+    journal.append(RECORDS[0])
+    assert replay_journal(path)["started_at"] == "2025-01-01T10:00:00Z"
+
+
+def test_aclose_flushes_buffered_records(tmp_path):
+    path = tmp_path / "session_x.jsonl"
+
+    async def run():
+        journal = SessionJournal(path, flush_interval=60)
+        for record in RECORDS:
+            journal.append(record)
+        await journal.aclose()
+        assert journal.closed
+
+    asyncio.run(run())
+    assert replay_journal(path)["questions"] == {"q1": "yes"}
+
+
+def test_recover_skips_journals_still_being_written(tmp_path):
+    idle = write_journal(tmp_path / "session_old.jsonl", RECORDS)
+    old = time.time() - 3600
+    os.utime(idle, (old, old))
+    live = write_journal(tmp_path / "session_live.jsonl", RECORDS)
+
+    recovered = recover_orphaned_journals(tmp_path, idle_seconds=600)
+    assert recovered == [tmp_path / "session_old.json"]
+    assert live.exists()
+    assert not (tmp_path / "session_live.json").exists()
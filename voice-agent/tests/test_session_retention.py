@@ -0,0 +1,108 @@
+import os
+import time
+import zipfile
+
+import pytest
+
+from src.session_index import SessionIndex
+from src.session_retention import RetentionPolicy, SessionRetention
+
+HOUR = 3600
+
+
+def write_session(session_dir, name, age_seconds, companions=("_qa.json",)):
+    mtime = time.time() - age_seconds
+    paths = [session_dir / name]
+    paths += [session_dir / (name[:-len(".json")] + suffix) for suffix in companions]
+    for path in paths:
+        path.write_text(f'{{"file": "{path.name}"}}')
+        os.utime(path, (mtime, mtime))
+    return paths
+
+
+def bundles(retention):
+    return sorted(p.name for p in retention.archive_dir.iterdir())
+
+
+def test_archives_old_sessions_by_start_date(tmp_path):
+    old = write_session(tmp_path, "session_20250101_100000_a.json", 48 * HOUR)
+    write_session(tmp_path, "session_20250102_100000_b.json", 47 * HOUR)
+    fresh = write_session(tmp_path, "session_20250103_100000_c.json", 60)
+    retention = SessionRetention(tmp_path, RetentionPolicy(compress_after_hours=24))
+
+    assert retention.run_once() == {"archived_by_age": 2, "archived_by_cap": 0, "bundles_deleted": 0}
+    assert not any(path.exists() for path in old)
+    assert all(path.exists() for path in fresh)
+    assert [name[:19] for name in bundles(retention)] == ["sessions_2025-01-01", "sessions_2025-01-02"]
+    assert retention.read_archived("session_20250101_100000_a_qa.json") == \
+        b'{"file": "session_20250101_100000_a_qa.json"}'
+    assert retention.read_archived("session_20250103_100000_c.json") is None
+
+
+def test_later_passes_add_bundles_instead_of_rewriting(tmp_path):
+    retention = SessionRetention(tmp_path, RetentionPolicy(compress_after_hours=24))
+    write_session(tmp_path, "session_20250101_100000_a.json", 48 * HOUR)
+    retention.run_once()
+    first = bundles(retention)
+
+    write_session(tmp_path, "session_20250101_110000_b.json", 48 * HOUR)
+    retention.run_once()
+    assert len(bundles(retention)) == 2
+    assert set(first) < set(bundles(retention))
+    assert retention.read_archived("session_20250101_100000_a.json") is not None
+    assert retention.read_archived("session_20250101_110000_b.json") is not None
+
+
+def test_cap_archives_oldest_but_spares_young_sessions(tmp_path):
+    write_session(tmp_path, "session_20250101_100000_a.json", 3 * HOUR, companions=())
+    write_session(tmp_path, "session_20250101_110000_b.json", 2 * HOUR, companions=())
+    write_session(tmp_path, "session_20250101_120000_c.json", 10, companions=())
+    policy = RetentionPolicy(compress_after_hours=24, max_files=1, min_age_seconds=300)
+    retention = SessionRetention(tmp_path, policy)
+
+    assert retention.run_once()["archived_by_cap"] == 2
+    assert (tmp_path / "session_20250101_120000_c.json").exists()
+
+
+def test_failed_write_keeps_sources_and_existing_bundles(tmp_path, monkeypatch):
+    retention = SessionRetention(tmp_path, RetentionPolicy(compress_after_hours=24))
+    write_session(tmp_path, "session_20250101_100000_a.json", 48 * HOUR)
+    retention.run_once()
+    before = {p.name: p.read_bytes() for p in retention.archive_dir.iterdir()}
+
+    pending = write_session(tmp_path, "session_20250101_110000_b.json", 48 * HOUR)
+
+    def disk_full(*args, **kwargs):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(zipfile.ZipFile, "write", disk_full)
+    with pytest.raises(OSError):
+        retention.run_once()
+
+    assert all(path.exists() for path in pending)
+    assert {p.name: p.read_bytes() for p in retention.archive_dir.iterdir()} == before
+
+
+def test_partial_bundle_from_a_crash_is_discarded(tmp_path):
+    retention = SessionRetention(tmp_path, RetentionPolicy(compress_after_hours=24))
+    retention.archive_dir.mkdir()
+    (retention.archive_dir / "sessions_2025-01-01_20250102T000000000000.zip.tmp").write_bytes(b"PK")
+    pending = write_session(tmp_path, "session_20250101_100000_a.json", 48 * HOUR)
+
+    retention.run_once()
+    assert not any(name.endswith(".tmp") for name in bundles(retention))
+    assert not any(path.exists() for path in pending)
+    assert retention.read_archived("session_20250101_100000_a.json") is not None
+
+
+def test_trim_drops_oldest_bundles_and_updates_index(tmp_path):
+    index = SessionIndex(tmp_path)
+    retention = SessionRetention(tmp_path, RetentionPolicy(compress_after_hours=24, max_archive_mb=0), index=index)
+    write_session(tmp_path, "session_20250101_100000_a.json", 48 * HOUR)
+    index.sync()
+
+    result = retention.run_once()
+    assert result["archived_by_age"] == 1
+    assert result["bundles_deleted"] == 1
+    assert bundles(retention) == []
+    assert index.get("session_20250101_100000_a.json") is None
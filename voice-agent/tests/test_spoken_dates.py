@@ -0,0 +1,106 @@
+from datetime import date
+
+import pytest
+
+from src.spoken_dates import parse_spoken_date, parse_spoken_dates
+
+TODAY = date(2024, 6, 15)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("May 14th 2021", "2021-05-14"),
+    ("may fourteenth twenty twenty one", "2021-05-14"),
+    ("the tenth of March two thousand and sixteen", "2016-03-10"),
+    ("It was on the twenty-first of June, nineteen ninety nine.", "1999-06-21"),
+    ("september the second twenty oh nine", "2009-09-02"),
+    ("march fifth nineteen hundred and ninety", "1990-03-05"),
+    ("August 3rd '19", "2019-08-03"),
+    ("January of 2015", "2015-01-01"),
+    ("i think it was in 2016 around may 14th", "2016-05-14"),
+    ("5/14/21", "2021-05-14"),
+    ("14/05/2021", "2021-05-14"),
+    ("2021-05-14", "2021-05-14"),
+])
+def test_absolute_dates(text, expected):
+    assert parse_spoken_date(text, TODAY) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    # The year is read first, so its last word isn't taken for the day
+    ("two thousand twelve in april", "2012-04-01"),
+    ("twenty twelve in april", "2012-04-01"),
+    ("2012 the twelfth of april", "2012-04-12"),
+    ("june 2015 the fifteenth", "2015-06-15"),
+    ("june twenty fifteen the fifteenth", "2015-06-15"),
+    ("nineteen eighty the sixth of march", "1980-03-06"),
+    ("two thousand the twenty fifth of august", "2000-08-25"),
+])
+def test_year_before_or_between(text, expected):
+    assert parse_spoken_date(text, TODAY) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("nineteen oh five", "1905-01-01"),
+    ("It was in 2019", "2019-01-01"),
+    ("twenty nineteen", "2019-01-01"),
+    ("between 2015 and 2016", None),
+    ("two thousand dollars", None),
+])
+def test_year_alone_is_its_first_day(text, expected):
+    assert parse_spoken_date(text, TODAY) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    # A missing year is the most recent such date that isn't in the future
+    ("April first", "2024-04-01"),
+    ("the twelfth of december", "2023-12-12"),
+    ("yesterday", "2024-06-14"),
+    ("last month", "2024-05-15"),
+    ("three years ago", "2021-06-15"),
+    ("it was a year ago", "2023-06-15"),
+])
+def test_relative_to_today(text, expected):
+    assert parse_spoken_date(text, TODAY) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "february twenty ninth 2023",
+    "february twenty ninth twenty twenty three",
+    "april thirty first 2020",
+    "feb thirtieth twenty twenty",
+    # No year makes June 31st exist
+    "june thirty first",
+    # Neither 1986 nor the 6th of 1980 is guessed
+    "nineteen eighty sixth of march",
+    # Vague amounts
+    "a couple years ago",
+    "a couple of years ago",
+    "a few months ago",
+    "several years ago",
+])
+def test_impossible_or_vague_dates_give_none(text):
+    assert parse_spoken_date(text, TODAY) is None
+
+
+def test_leap_day_in_a_leap_year():
+    assert parse_spoken_date("february twenty ninth twenty twenty", TODAY) == "2020-02-29"
+
+
+@pytest.mark.parametrize("text, expected", [
+    # The year on its own, not May 2015
+    ("I may have been convicted in 2015", "2015-01-01"),
+    ("we had to march down to the courthouse", None),
+    ("I may have been convicted in march 2015", "2015-03-01"),
+])
+def test_month_words_need_a_day_or_year_next_to_them(text, expected):
+    assert parse_spoken_date(text, TODAY) == expected
+
+
+@pytest.mark.parametrize("text", ["", None, "I don't remember", "no"])
+def test_no_date(text):
+    assert parse_spoken_date(text, TODAY) is None
+
+
+def test_parse_many():
+    assert parse_spoken_dates(["May 14th 2021", "no", "May 14th 2021"], TODAY) == \
+        ["2021-05-14", None, "2021-05-14"]